@@ -1,9 +1,13 @@
 import os
+import sys
+import time
 import cv2
 import numpy as np
 import shutil
-import requests
-import json
+
+from uploader import Sender
+from edge_recognizer import EdgeRecognizer
+from lock_controller import control_lock
 
 # ==========================================================
 # ⚡ Lightweight Hybrid Image Quality Selector + Notify
@@ -15,92 +19,174 @@ UPLOAD_API_URL = "https://iot-lock-backend.onrender.com/upload/upload-image"
 DETECT_API_URL = "https://iot-lock-backend.onrender.com/api/notify/detect-visitor"
 API_KEY = "supersecret123"  # <-- your upload key
 OWNER_ID = 123  # <-- replace with actual owner ID
+DEVICE_API_URL = f"https://iot-lock-backend.onrender.com/api/device/{OWNER_ID}"
+
+# Camera ring buffer capture mode
+CAMERA_INDEX = 0
+CAPTURE_WIDTH = 640
+CAPTURE_HEIGHT = 480
+RING_SIZE = 12  # frames kept in memory (~2 s at 6 fps)
+JPEG_QUALITY = 90
 
 # ==========================================================
-# Quality Metric Functions
+# Streaming Quality Scorer
 # ==========================================================
 
-def focus_score(image):
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    return cv2.Laplacian(gray, cv2.CV_64F).var()
-
-def brightness_score(image):
-    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-    return np.mean(hsv[:, :, 2])
-
-def contrast_score(image):
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    return np.std(gray)
-
-def face_size_score(image):
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
-    faces = face_cascade.detectMultiScale(gray, 1.3, 5)
-    if len(faces) == 0:
-        return 0
-    (x, y, w, h) = max(faces, key=lambda b: b[2] * b[3])
-    return (w * h) / (image.shape[0] * image.shape[1])
-
-def hybrid_score(image):
-    f = focus_score(image)
-    b = brightness_score(image)
-    c = contrast_score(image)
-    fs = face_size_score(image)
-
-    metrics = np.array([f, b, c, fs])
-    metrics = np.nan_to_num(metrics)
-    normalized = (metrics - np.min(metrics)) / (np.ptp(metrics) + 1e-9)
-    weights = np.array([0.35, 0.15, 0.30, 0.20])
-    return np.dot(normalized, weights)
+# Loaded once; building a CascadeClassifier per frame costs more than scoring it
+FACE_CASCADE = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+
+# Frames are scored on a small grid, the metrics are relative so nothing is lost
+SCORE_SIZE = (320, 240)
+
+# focus, brightness, contrast, face size
+WEIGHTS = np.array([0.35, 0.15, 0.30, 0.20])
+
+# Absolute quality bar: the first frame clearing all of these ends the scan early
+GOOD_FOCUS = 150.0
+GOOD_BRIGHTNESS = (70.0, 200.0)
+GOOD_CONTRAST = 45.0
+GOOD_FACE_SIZE = 0.06
+
+
+def frame_metrics(image):
+    """Raw (focus, brightness, contrast, face size) of one frame with a single gray conversion"""
+    small = cv2.resize(image, SCORE_SIZE, interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    focus = cv2.Laplacian(gray, cv2.CV_64F).var()
+    brightness = small.max(axis=2).mean()  # HSV value channel, without the HSV conversion
+    contrast = gray.std()
+
+    faces = FACE_CASCADE.detectMultiScale(gray, 1.3, 5)
+    face_size = 0.0 if len(faces) == 0 else (faces[:, 2] * faces[:, 3]).max() / gray.size
+
+    return focus, brightness, contrast, face_size
+
+
+def clears_quality_bar(metrics):
+    focus, brightness, contrast, face_size = metrics
+    return (
+        focus >= GOOD_FOCUS
+        and GOOD_BRIGHTNESS[0] <= brightness <= GOOD_BRIGHTNESS[1]
+        and contrast >= GOOD_CONTRAST
+        and face_size >= GOOD_FACE_SIZE
+    )
+
+
+def normalized_scores(metrics):
+    """Min-max normalise each metric across the frame set and apply the weights"""
+    normalized = (metrics - metrics.min(axis=0)) / (np.ptp(metrics, axis=0) + 1e-9)
+    return normalized @ WEIGHTS
+
+
+class StreamingScorer:
+    """Collects per-frame metrics as frames arrive and ranks them across the whole set"""
+
+    def __init__(self, capacity=32):
+        self.metrics = np.zeros((capacity, 4))
+        self.keys = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key, image):
+        """Score one frame, returns True once a frame clears the quality bar"""
+        row = np.nan_to_num(frame_metrics(image))
+        if len(self.keys) == len(self.metrics):
+            self.metrics = np.resize(self.metrics, (2 * len(self.metrics), 4))
+        self.metrics[len(self.keys)] = row
+        self.keys.append(key)
+        return clears_quality_bar(row)
+
+    def scores(self):
+        """Hybrid score of every frame, each metric normalised across the frame set"""
+        return normalized_scores(self.metrics[:len(self.keys)])
+
+    def best(self):
+        """(key, score) of the best frame so far, or (None, -1) when empty"""
+        if not self.keys:
+            return None, -1
+        scores = self.scores()
+        index = int(np.argmax(scores))
+        return self.keys[index], float(scores[index])
 
 # ==========================================================
-# Upload Function
+# Camera Ring Buffer
 # ==========================================================
 
-def upload_image(filepath):
-    headers = {"x-api-key": API_KEY}
-    with open(filepath, "rb") as f:
-        files = {"file": (os.path.basename(filepath), f, "image/jpeg")}
-        try:
-            response = requests.post(UPLOAD_API_URL, headers=headers, files=files)
-            if response.status_code == 200:
-                data = response.json()
-                print(f"✅ Image uploaded: {data.get('url')}")
-                return data.get("url")  # Return the uploaded image URL
-            else:
-                print(f"❌ Upload failed ({response.status_code}): {response.text}")
-                return None
-        except Exception as e:
-            print(f"❌ Error uploading: {e}")
-            return None
+class FrameRing:
+    """Preallocated in-memory ring of the last N camera frames, scored as they arrive"""
+
+    def __init__(self, size=RING_SIZE, height=CAPTURE_HEIGHT, width=CAPTURE_WIDTH):
+        self.frames = np.empty((size, height, width, 3), dtype=np.uint8)
+        self.metrics = np.zeros((size, 4))
+        self.head = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def reset(self):
+        """Forget the frames of the previous burst, the buffer itself is kept"""
+        self.head = 0
+        self.count = 0
+
+    def capture(self, camera):
+        """Read the next camera frame straight into the ring, returns (slot, good_enough)"""
+        slot = self.head
+        buffer = self.frames[slot]
+        ok, frame = camera.read(buffer)
+        if not ok:
+            return None, False
+        if frame.shape != buffer.shape:
+            cv2.resize(frame, (buffer.shape[1], buffer.shape[0]), dst=buffer)
+
+        row = np.nan_to_num(frame_metrics(buffer))
+        self.metrics[slot] = row
+        self.head = (slot + 1) % len(self.frames)
+        self.count = min(self.count + 1, len(self.frames))
+        return slot, clears_quality_bar(row)
+
+    def best(self):
+        """(slot, score) of the best frame currently held, or (None, -1) when empty"""
+        if self.count == 0:
+            return None, -1
+        scores = normalized_scores(self.metrics[:self.count])
+        slot = int(np.argmax(scores))
+        return slot, float(scores[slot])
+
+    def encode(self, slot):
+        """JPEG-encode one frame in memory"""
+        ok, encoded = cv2.imencode(".jpg", self.frames[slot], [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+        return encoded.tobytes() if ok else None
+
+
+def open_camera():
+    camera = cv2.VideoCapture(CAMERA_INDEX)
+    camera.set(cv2.CAP_PROP_FRAME_WIDTH, CAPTURE_WIDTH)
+    camera.set(cv2.CAP_PROP_FRAME_HEIGHT, CAPTURE_HEIGHT)
+    camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return camera
 
 # ==========================================================
-# Call Detect Visitor API
+# Upload + Detect (keep-alive session, retries, offline outbox)
 # ==========================================================
 
-def call_detect_api(image_url):
-    payload = {"images": [image_url]}  # <-- note the list
-    params = {"owner_id": OWNER_ID}
-    try:
-        response = requests.post(DETECT_API_URL, json=payload, params=params)
-        if response.status_code == 200:
-            print("📡 Visitor detection response:")
-            print(json.dumps(response.json(), indent=4))
-        else:
-            print(f"❌ Detection API failed ({response.status_code}): {response.text}")
-    except Exception as e:
-        print(f"❌ Error calling detection API: {e}")
-
+def build_clients():
+    """(sender, edge recognizer), built at start-up: they open the outbox and load the model"""
+    sender = Sender(UPLOAD_API_URL, DETECT_API_URL, API_KEY, OWNER_ID, recognised_url=f"{DEVICE_API_URL}/recognised")
+    return sender, EdgeRecognizer(sender.session, DEVICE_API_URL, API_KEY)
 
 # ==========================================================
 # Main Function
 # ==========================================================
 
-def select_best_image():
+def select_best_image(sender):
     os.makedirs(SELECT_DIR, exist_ok=True)
-    best_score, best_filename = -1, None
+    scorer = StreamingScorer()
+    early = None
 
-    for filename in os.listdir(IMAGE_DIR):
+    for filename in sorted(os.listdir(IMAGE_DIR)):
         if not filename.lower().endswith((".jpg", ".jpeg", ".png")):
             continue
 
@@ -109,30 +195,86 @@ def select_best_image():
         if img is None:
             continue
 
-        score = hybrid_score(img)
-        print(f"{filename}: {score:.4f}")
+        if scorer.add(filename, img):
+            print(f"⚡ {filename} clears the quality bar, stopping early")
+            early = filename
+            break
 
-        if score > best_score:
-            best_score = score
-            best_filename = filename
+    best_filename, best_score = scorer.best()
+    if best_filename:
+        for filename, score in zip(scorer.keys, scorer.scores()):
+            print(f"{filename}: {score:.4f}")
 
     if best_filename:
+        if early:
+            # Relative scores can rank another frame first, the one that cleared the bar wins
+            best_filename = early
+            best_score = float(scorer.scores()[scorer.keys.index(early)])
         selected_path = os.path.join(SELECT_DIR, best_filename)
         shutil.copy(os.path.join(IMAGE_DIR, best_filename), selected_path)
         print(f"\n✅ Best image selected: {best_filename} (score={best_score:.4f})")
         print(f"📁 Saved to: {selected_path}")
 
-        # Upload the image
-        uploaded_url = upload_image(selected_path)
-        if uploaded_url:
-            # Call detect visitor API with uploaded URL
-            call_detect_api(uploaded_url)
+        # Upload the image and call the detect visitor API with its URL
+        with open(selected_path, "rb") as f:
+            sender.send_event(f.read(), best_filename)
     else:
         print("❌ No valid images found.")
 
+def capture_best_image(camera, sender, edge, ring=None, max_frames=RING_SIZE):
+    """Capture up to max_frames into the ring buffer and upload the best one from memory"""
+    # An empty ring is falsy (__len__), so test for None to keep the preallocated one
+    if ring is None:
+        ring = FrameRing()
+    ring.reset()
+    best_slot = None
+    for _ in range(max_frames):
+        slot, good_enough = ring.capture(camera)
+        if good_enough:
+            # Send the frame that cleared the bar, re-ranking with relative scores could pick another
+            print(f"⚡ Frame in slot {slot} clears the quality bar, stopping early")
+            best_slot = slot
+            break
+
+    if best_slot is None:
+        best_slot, best_score = ring.best()
+        if best_slot is None:
+            print("❌ No frames captured.")
+            return None
+        print(f"\n✅ Best frame selected: slot {best_slot} (score={best_score:.4f})")
+
+    jpeg = ring.encode(best_slot)
+    if jpeg is None:
+        print("❌ Failed to encode frame.")
+        return None
+
+    # Known faces skip server recognition, but every visit is still reported to the owner
+    match = edge.recognise(ring.frames[best_slot])
+    report = None
+    if match:
+        print(f"🧠 Recognised {match['name']} on-device (confidence={match['confidence']:.1f})")
+        if match["auto_unlock"]:
+            # The owner opted in for this visitor, don't wait for a slow uplink
+            control_lock(1)
+        report = {"visitor_id": match["visitor_id"], "confidence": match["confidence"], "unlocked": match["auto_unlock"]}
+
+    return sender.send_event(jpeg, f"capture_{int(time.time())}_{best_slot}.jpg", match=report)
+
 # ==========================================================
 # Run
 # ==========================================================
 
+def main():
+    sender, edge = build_clients()
+    if "--camera" in sys.argv:
+        camera = open_camera()
+        try:
+            capture_best_image(camera, sender, edge)
+        finally:
+            camera.release()
+    else:
+        select_best_image(sender)
+
+
 if __name__ == "__main__":
-    select_best_image()
+    main()
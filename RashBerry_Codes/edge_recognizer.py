@@ -0,0 +1,155 @@
+import gzip
+import json
+import os
+import cv2
+
+# ==========================================================
+# 🧠 On-Device Recognition (synced per-owner LBPH models)
+# ==========================================================
+# Keeps a local copy of the owner's edge model: one small LBPH model per
+# visitor the owner enrolled, plus a manifest listing them with their ETags.
+# A sync is one conditional request for the manifest (an empty 304 while
+# nothing changed); after that only the visitor models whose ETag changed are
+# downloaded, and models of visitors no longer listed are deleted.
+#
+# A match is only a hint: the frame is still reported to the server, which
+# records the visit and notifies the owner. The lock is opened on-device
+# only for visitors the owner enrolled with auto_unlock.
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model")
+MANIFEST_PATH = os.path.join(MODEL_DIR, "manifest.json")
+SYNC_TIMEOUT = (5, 60)
+
+
+def _model_path(visitor_id):
+    return os.path.join(MODEL_DIR, f"visitor_{visitor_id}.yml")
+
+
+class EdgeRecognizer:
+    def __init__(self, session, base_url, api_key):
+        self.session = session
+        self.manifest_url = f"{base_url}/model"
+        self.visitor_url = f"{base_url}/model/visitors"
+        self.api_key = api_key
+        self.manifest = None
+        self.recognizers = []  # (visitor entry from the manifest, LBPH recognizer)
+        self.cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+        self._load()
+
+    @property
+    def available(self):
+        return bool(self.recognizers)
+
+    def _read_manifest(self):
+        if not os.path.exists(MANIFEST_PATH):
+            return None
+        with open(MANIFEST_PATH) as f:
+            return json.load(f)
+
+    def _load(self):
+        self.manifest = self._read_manifest()
+        self.recognizers = []
+        if not hasattr(cv2, "face"):
+            print("⚠️  opencv-contrib not installed, on-device recognition disabled")
+            return
+        if self.manifest is None:
+            return
+        for visitor in self.manifest["visitors"]:
+            path = _model_path(visitor["visitor_id"])
+            if not os.path.exists(path):
+                continue
+            recognizer = cv2.face.LBPHFaceRecognizer_create()
+            recognizer.read(path)
+            self.recognizers.append((visitor, recognizer))
+        print(f"🧠 Edge model v{self.manifest['version']} loaded ({len(self.recognizers)} people)")
+
+    def _clear(self):
+        """The owner has no trained model (any more), forget the local copy"""
+        if self.manifest is None:
+            return
+        for visitor in self.manifest["visitors"]:
+            if os.path.exists(_model_path(visitor["visitor_id"])):
+                os.remove(_model_path(visitor["visitor_id"]))
+        os.remove(MANIFEST_PATH)
+        self._load()
+
+    def _download(self, visitor):
+        response = self.session.get(
+            f"{self.visitor_url}/{visitor['visitor_id']}",
+            headers={"x-api-key": self.api_key},
+            timeout=SYNC_TIMEOUT
+        )
+        if response.status_code != 200 or response.headers.get("ETag") != visitor["etag"]:
+            # Retrained since the manifest was fetched, pick it up next sync
+            return False
+        with open(_model_path(visitor["visitor_id"]), "wb") as f:
+            f.write(gzip.decompress(response.content))
+        return True
+
+    def sync(self):
+        """Fetch the manifest if it changed, then only the visitor models that changed"""
+        headers = {"x-api-key": self.api_key}
+        if self.manifest is not None:
+            headers["If-None-Match"] = self.manifest["etag"]
+        try:
+            response = self.session.get(self.manifest_url, headers=headers, timeout=SYNC_TIMEOUT)
+            if response.status_code == 304:
+                return False
+            if response.status_code == 404:
+                self._clear()
+                return False
+            if response.status_code != 200:
+                print(f"❌ Model sync failed ({response.status_code})")
+                return False
+
+            manifest = response.json()
+            os.makedirs(MODEL_DIR, exist_ok=True)
+            current = {v["visitor_id"]: v["etag"] for v in (self.manifest or {}).get("visitors", [])}
+            downloaded = 0
+            for visitor in manifest["visitors"]:
+                path = _model_path(visitor["visitor_id"])
+                if current.get(visitor["visitor_id"]) == visitor["etag"] and os.path.exists(path):
+                    continue
+                if not self._download(visitor):
+                    return False
+                downloaded += 1
+
+            listed = {v["visitor_id"] for v in manifest["visitors"]}
+            for visitor_id in set(current) - listed:
+                if os.path.exists(_model_path(visitor_id)):
+                    os.remove(_model_path(visitor_id))
+
+            with open(MANIFEST_PATH, "w") as f:
+                json.dump(manifest, f)
+            print(f"🧠 Edge model synced ({downloaded} of {len(manifest['visitors'])} models downloaded)")
+        except Exception as e:
+            print(f"❌ Model sync error: {e}")
+            return False
+
+        self._load()
+        return True
+
+    def recognise(self, image):
+        """Return the closest enrolled visitor when the local models are confident, otherwise None
+
+        The match is the manifest entry (visitor_id, name, auto_unlock) plus its confidence.
+        """
+        if not self.available:
+            return None
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        faces = self.cascade.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=8, minSize=(80, 80))
+        if len(faces) == 0:
+            return None
+
+        x, y, w, h = faces[0]
+        face = gray[y:y+h, x:x+w]
+        best, best_confidence = None, None
+        # LBPH is nearest-neighbour: the closest visitor model is the combined model's answer
+        for visitor, recognizer in self.recognizers:
+            _, confidence = recognizer.predict(face)
+            if best_confidence is None or confidence < best_confidence:
+                best, best_confidence = visitor, confidence
+
+        if best_confidence < self.manifest["confidence_threshold"]:
+            return {**best, "confidence": best_confidence}
+        return None
@@ -1,7 +1,16 @@
-import requests
+import os
+import socket
 import time
+import requests
+
+SERVER_URL = "https://iot-lock-backend.onrender.com/api/lock"
+API_KEY = "supersecret123"  # <-- your upload key
+OWNER_ID = 123  # <-- replace with actual owner ID
+DEVICE_ID = socket.gethostname()
 
-RENDER_URL = "https://iot-lock-api.onrender.com/lock"
+LONG_POLL_SECONDS = 25  # server holds the request open until a command arrives
+# Last executed command, survives restarts; next to the script so it doesn't depend on the working directory
+SEQ_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "last_seq.txt")
 
 
 def control_lock(value):
@@ -12,43 +21,65 @@ def control_lock(value):
         print("🔒 LOCKING (simulated)")
 
 
+def load_last_seq():
+    if os.path.exists(SEQ_FILE):
+        with open(SEQ_FILE) as f:
+            return int(f.read().strip() or 0)
+    return 0
+
+
+def save_last_seq(seq):
+    with open(SEQ_FILE, "w") as f:
+        f.write(str(seq))
+
+
 def poll_server():
-    """Check server every 2 seconds for new commands"""
-    last_value = None
+    """Long-poll the server for commands over one keep-alive session and acknowledge them"""
+    session = requests.Session()
+    session.headers["x-api-key"] = API_KEY
+    commands_url = f"{SERVER_URL}/{OWNER_ID}/devices/{DEVICE_ID}/commands"
+    ack_url = f"{SERVER_URL}/{OWNER_ID}/devices/{DEVICE_ID}/ack"
+    last_seq = load_last_seq()
 
     print("⏳ Waiting for commands...")
 
     while True:
         try:
-            response = requests.get(RENDER_URL, timeout=5)
-            data = response.json()
-            value = data.get('value')
-
-            # Only act if value changed
-            if value is not None and value != last_value:
-                print(f"\n✅ NEW COMMAND RECEIVED: {value}")
-                control_lock(value)
-                last_value = value
-
-                # Clear the value on server
-                requests.post(f"{RENDER_URL}/clear")
+            response = session.get(
+                commands_url,
+                params={"after": last_seq, "timeout": LONG_POLL_SECONDS},
+                timeout=LONG_POLL_SECONDS + 10
+            )
+            response.raise_for_status()
+            commands = response.json().get("commands", [])
+
+            for command in commands:
+                # Redelivered commands (e.g. after a lost ack) are skipped
+                if command["seq"] <= last_seq:
+                    continue
+                print(f"\n✅ NEW COMMAND RECEIVED: {command['action']} (seq {command['seq']})")
+                control_lock(command["value"])
+                last_seq = command["seq"]
+                save_last_seq(last_seq)
+
+            if commands:
+                session.post(ack_url, json={"seq": last_seq}, timeout=5)
             else:
-                print(".", end="", flush=True)  # Show it's polling
+                print(".", end="", flush=True)  # Show it's waiting
 
         except Exception as e:
             print(f"\n❌ Error: {e}")
-
-        time.sleep(2)  # Poll every 2 seconds
+            time.sleep(2)  # Back off before reconnecting
 
 
 if __name__ == '__main__':
     print("\n" + "=" * 50)
     print("🔌 Lock Controller Starting (TEST MODE)")
-    print(f"📡 Polling: {RENDER_URL}")
+    print(f"📡 Listening: {SERVER_URL}/{OWNER_ID}/devices/{DEVICE_ID}")
     print("💡 Press Ctrl+C to stop")
     print("=" * 50 + "\n")
 
     try:
         poll_server()
     except KeyboardInterrupt:
-        print("\n\n👋 Shutting down...")
\ No newline at end of file
+        print("\n\n👋 Shutting down...")
@@ -0,0 +1,101 @@
+import time
+import cv2
+import numpy as np
+
+from Light_Weight_Image_Selector import FrameRing, open_camera, capture_best_image, build_clients
+
+# ==========================================================
+# 👀 Motion-Gated Capture Trigger
+# ==========================================================
+# Watches a tiny grayscale copy of the camera feed and only arms the burst
+# capture + face scoring when something actually moves in front of the door.
+
+MOTION_SIZE = (160, 120)      # frames are differenced at this size
+BACKGROUND_ALPHA = 0.05       # running-average learning rate
+PIXEL_THRESHOLD = 25          # per-pixel change that counts as "moved"
+MOTION_FRACTION = 0.02        # share of moved pixels that counts as motion
+ARM_FRAMES = 3                # consecutive motion frames before arming
+IDLE_FPS = 4                  # sampling rate while nothing happens
+COOLDOWN_SECONDS = 15         # quiet time after an event before re-arming
+DRAIN_INTERVAL = 60           # seconds between outbox flush attempts while idle
+MODEL_SYNC_INTERVAL = 3600    # seconds between edge model checks (304 when unchanged)
+
+# ==========================================================
+# Motion Detector
+# ==========================================================
+
+class MotionDetector:
+    """Running-average background subtraction on downscaled grayscale frames"""
+
+    def __init__(self):
+        self.background = None
+        self.hits = 0
+
+    def reset(self):
+        self.background = None
+        self.hits = 0
+
+    def update(self, frame):
+        """Feed one frame, returns True when motion has persisted for ARM_FRAMES frames"""
+        small = cv2.resize(frame, MOTION_SIZE, interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+
+        if self.background is None:
+            self.background = gray.astype(np.float32)
+            return False
+
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self.background))
+        moved = np.count_nonzero(diff > PIXEL_THRESHOLD) / diff.size
+        cv2.accumulateWeighted(gray, self.background, BACKGROUND_ALPHA)
+
+        self.hits = self.hits + 1 if moved >= MOTION_FRACTION else 0
+        return self.hits >= ARM_FRAMES
+
+# ==========================================================
+# Main Loop
+# ==========================================================
+
+def watch():
+    sender, edge = build_clients()
+    camera = open_camera()
+    detector = MotionDetector()
+    ring = FrameRing()
+    interval = 1.0 / IDLE_FPS
+    last_drain = time.monotonic()
+    edge.sync()
+    last_sync = time.monotonic()
+
+    print("👀 Watching for motion...")
+    try:
+        while True:
+            started = time.monotonic()
+            if started - last_sync >= MODEL_SYNC_INTERVAL:
+                edge.sync()
+                last_sync = time.monotonic()
+                continue
+
+            if started - last_drain >= DRAIN_INTERVAL:
+                if sender.pending():
+                    sender.drain()
+                last_drain = time.monotonic()
+                continue
+
+            ok, frame = camera.read()
+            if ok and detector.update(frame):
+                print("\n🚶 Motion detected, capturing burst")
+                capture_best_image(camera, sender, edge, ring)
+                time.sleep(COOLDOWN_SECONDS)
+                # The scene changed while we were busy, relearn it
+                detector.reset()
+                continue
+
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+    finally:
+        camera.release()
+
+
+if __name__ == "__main__":
+    try:
+        watch()
+    except KeyboardInterrupt:
+        print("\n\n👋 Shutting down...")
@@ -0,0 +1,210 @@
+import json
+import os
+import sqlite3
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+# ==========================================================
+# 📮 Keep-Alive Sender + Offline Outbox
+# ==========================================================
+# One persistent requests.Session (HTTP keep-alive) for every call to the
+# backend, bounded retries with exponential backoff, and a small SQLite
+# outbox so a doorbell event survives a network blip and is sent once
+# connectivity returns.
+#
+# Frames the Pi recognised itself go to the recognised endpoint instead of
+# detect, with the visitor id of the match, so the server still records the
+# visit and notifies the owner.
+#
+# Detect (and recognised) calls are not idempotent (each one records a
+# visit and pushes a notification), so they are only retried when the
+# connection was never established. A timeout or error status after the
+# request went out is not resent or queued, the server may already have
+# handled it.
+
+OUTBOX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "outbox.db")
+MAX_ATTEMPTS = 4              # per request, before the event goes to the outbox
+BACKOFF_SECONDS = 0.5         # 0.5, 1, 2 ... between attempts
+MAX_PENDING = 200             # oldest events are dropped beyond this
+UPLOAD_TIMEOUT = (5, 30)      # (connect, read) seconds
+DETECT_TIMEOUT = (5, 20)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class DeliveryUncertain(Exception):
+    """The request went out but no answer came back, it may have been processed"""
+
+
+def never_sent(error):
+    """True when the connection failed before any of the request reached the server"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(error, requests.ConnectionError) and isinstance(reason, NewConnectionError)
+
+
+class Sender:
+    def __init__(self, upload_url, detect_url, api_key, owner_id, recognised_url=None, outbox_path=OUTBOX_PATH):
+        self.upload_url = upload_url
+        self.detect_url = detect_url
+        self.recognised_url = recognised_url
+        self.api_key = api_key
+        self.owner_id = owner_id
+
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+
+        self.outbox_path = outbox_path
+        self._db = None
+
+    @property
+    def db(self):
+        """The outbox, opened on first use rather than at import"""
+        if self._db is None:
+            self._db = sqlite3.connect(self.outbox_path)
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    filename TEXT NOT NULL,
+                    jpeg BLOB,
+                    image_url TEXT,
+                    match TEXT,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(outbox)")]
+            if "match" not in columns:  # outbox created before on-device matches were reported
+                self._db.execute("ALTER TABLE outbox ADD COLUMN match TEXT")
+            self._db.commit()
+        return self._db
+
+    # ------------------------------------------------------
+    # HTTP
+    # ------------------------------------------------------
+
+    def _post(self, url, idempotent=True, **kwargs):
+        """POST with bounded retries, returns the response or None when the network is down
+
+        Non-idempotent requests are only retried while the connection can't
+        be opened; a failure after that raises DeliveryUncertain.
+        """
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                response = self.session.post(url, **kwargs)
+                if response.status_code not in RETRY_STATUSES or not idempotent:
+                    return response
+                print(f"⚠️  {url} returned {response.status_code}, retrying")
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if not idempotent and not never_sent(e):
+                    raise DeliveryUncertain(e.__class__.__name__) from e
+                print(f"⚠️  Network error ({e.__class__.__name__}), retrying")
+            if attempt < MAX_ATTEMPTS - 1:
+                time.sleep(BACKOFF_SECONDS * (2 ** attempt))
+        return None
+
+    # ------------------------------------------------------
+    # Outbox
+    # ------------------------------------------------------
+
+    def _enqueue(self, filename, jpeg=None, image_url=None, match=None):
+        self.db.execute(
+            "INSERT INTO outbox (filename, jpeg, image_url, match, created_at) VALUES (?, ?, ?, ?, ?)",
+            (filename, jpeg, image_url, json.dumps(match) if match else None, time.time())
+        )
+        self.db.execute(
+            "DELETE FROM outbox WHERE id NOT IN (SELECT id FROM outbox ORDER BY id DESC LIMIT ?)",
+            (MAX_PENDING,)
+        )
+        self.db.commit()
+        print(f"📥 Queued {filename} for later ({self.pending()} pending)")
+
+    def pending(self):
+        return self.db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def _deliver(self, filename, jpeg=None, image_url=None, match=None):
+        """Run upload + detect, returns (state, image_url)
+
+        state is "sent", "rejected", "offline" or "uncertain" (detect went out
+        but got no reply); only "offline" events are kept for another try.
+
+        A half-sent event keeps its image URL so the frame is not uploaded twice.
+        An on-device match ({"visitor_id", "unlocked", "confidence"}) is
+        reported to the recognised endpoint instead of detect.
+        """
+        if image_url is None:
+            response = self._post(
+                self.upload_url,
+                headers={"x-api-key": self.api_key},
+                files={"file": (filename, jpeg, "image/jpeg")},
+                timeout=UPLOAD_TIMEOUT
+            )
+            if response is None:
+                return "offline", None
+            if response.status_code != 200:
+                print(f"❌ Upload failed ({response.status_code}): {response.text}")
+                return "rejected", None
+            image_url = response.json().get("url")
+            print(f"✅ Image uploaded: {image_url}")
+
+        if match is not None:
+            request = {
+                "url": self.recognised_url,
+                "json": {**match, "image_url": image_url},
+                "headers": {"x-api-key": self.api_key}
+            }
+        else:
+            request = {
+                "url": self.detect_url,
+                "json": {"image_url": image_url},  # matches the server's DetectRequest
+                "params": {"owner_id": self.owner_id}
+            }
+        try:
+            response = self._post(idempotent=False, timeout=DETECT_TIMEOUT, **request)
+        except DeliveryUncertain as e:
+            # Resending could record the visit and notify the owner twice
+            print(f"⚠️  No answer from detection API ({e}), not resending")
+            return "uncertain", image_url
+        if response is None:
+            return "offline", image_url
+        if response.status_code != 200:
+            print(f"❌ Detection API failed ({response.status_code}): {response.text}")
+            return "rejected", image_url
+        print("📡 Visitor detection response:")
+        print(json.dumps(response.json(), indent=4))
+        return "sent", image_url
+
+    def drain(self):
+        """Send queued events oldest-first, stops as soon as the network is down again"""
+        rows = self.db.execute("SELECT id, filename, jpeg, image_url, match FROM outbox ORDER BY id").fetchall()
+        sent = 0
+        for row_id, filename, jpeg, image_url, match in rows:
+            state, image_url = self._deliver(filename, jpeg, image_url, json.loads(match) if match else None)
+            if state == "offline":
+                if image_url is not None:
+                    self.db.execute(
+                        "UPDATE outbox SET image_url = ?, jpeg = NULL WHERE id = ?", (image_url, row_id)
+                    )
+                    self.db.commit()
+                break
+            # Sent, rejected by the server or possibly delivered: don't resend
+            self.db.execute("DELETE FROM outbox WHERE id = ?", (row_id,))
+            self.db.commit()
+            sent += state == "sent"
+        if sent:
+            print(f"📤 Sent {sent} queued event(s)")
+        return sent
+
+    def send_event(self, jpeg, filename, match=None):
+        """Deliver a new doorbell event first, queueing it when the network is unavailable"""
+        state, image_url = self._deliver(filename, jpeg=jpeg, match=match)
+        if state == "offline":
+            self._enqueue(filename, jpeg=None if image_url else jpeg, image_url=image_url, match=match)
+        else:
+            # We're online again, flush anything left over from earlier outages
+            self.drain()
+        return image_url
@@ -0,0 +1,54 @@
+# app/api/routes_dashboard.py
+import asyncio
+import hashlib
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Header, Response
+from app.core.responses import FastJSONResponse, dumps, etag_matches
+from app.db.crud import (
+    get_visit_statistics,
+    get_recent_activity,
+    get_visits_by_owner,
+    get_device_tokens_by_owner
+)
+from app.api.routes_notify import notification_summary
+
+router = APIRouter()
+
+# What the app shows on open
+RECENT_LIMIT = 10
+PENDING_LIMIT = 20
+# Clients may reuse a dashboard this long, then revalidate with If-None-Match
+DASHBOARD_MAX_AGE_SECONDS = 5
+
+@router.get("/{owner_id}")
+async def get_dashboard(owner_id: int, if_none_match: Optional[str] = Header(None)):
+    """Everything the app needs on open (statistics, recent, pending, notification setup) in one call"""
+    try:
+        # Independent reads on separate pool connections: latency is the
+        # slowest query instead of the sum of four round trips
+        stats, recent, (pending, pending_cursor), device_tokens = await asyncio.gather(
+            get_visit_statistics(owner_id),
+            get_recent_activity(owner_id, RECENT_LIMIT),
+            get_visits_by_owner(owner_id, limit=PENDING_LIMIT, status="pending"),
+            get_device_tokens_by_owner(owner_id)
+        )
+        body = dumps({
+            "status": "success",
+            "owner_id": owner_id,
+            "statistics": stats,
+            "recent_visits": recent,
+            "pending": {
+                "count": len(pending),
+                "next_cursor": pending_cursor,
+                "visits": pending
+            },
+            "notifications": notification_summary(device_tokens)
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={DASHBOARD_MAX_AGE_SECONDS}"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return FastJSONResponse(body, headers=headers)
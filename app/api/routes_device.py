@@ -1,13 +1,26 @@
 # app/api/routes_device.py
-from fastapi import APIRouter, HTTPException
+import asyncpg
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Header, Depends
+from fastapi.responses import Response, JSONResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 from datetime import datetime
+from app.api.routes_uploads import require_api_key
+from app.api.routes_auth import get_current_user
+from app.api.routes_notify import send_notifications_to_owner
+from app.ml import model_store
+from app.core.responses import etag_matches
+from app.realtime import visit_events
 from app.db.crud import (
     register_device_token,
     unregister_device_token,
     get_device_tokens_by_owner,
-    get_owner_by_id
+    get_owner_by_id,
+    create_visit,
+    get_edge_visitors,
+    get_edge_visitor,
+    enroll_edge_visitor,
+    unenroll_edge_visitor
 )
 
 router = APIRouter()
@@ -31,6 +44,15 @@ class DeviceStatusResponse(BaseModel):
     message: str
     device: Optional[Dict[str, Any]] = None
 
+class EdgeMatchRequest(BaseModel):
+    visitor_id: int
+    image_url: str
+    confidence: Optional[float] = None
+    unlocked: bool = False  # the device already opened the lock (auto_unlock visitors only)
+
+class EdgeEnrolmentRequest(BaseModel):
+    auto_unlock: bool = False  # open without the owner's approval on a confident match
+
 # =========================
 # Routes
 # =========================
@@ -103,6 +125,143 @@ async def get_owner_devices(owner_id: int):
         ]
     }
 
+def _model_headers(etag: str, version: Optional[int] = None) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if version is not None:
+        headers["X-Model-Version"] = str(version)
+    return headers
+
+@router.get("/{owner_id}/model")
+async def get_edge_model(
+    owner_id: int,
+    if_none_match: Optional[str] = Header(None),
+    api_key: str = Depends(require_api_key)
+):
+    """Manifest of the owner's edge model: one entry (and ETag) per enrolled, trained visitor
+
+    304 while the device copy is current; a device then downloads only the
+    visitor models whose ETag changed.
+    """
+    manifest = await model_store.get_owner_manifest(owner_id)
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="No trained model for this owner")
+    headers = _model_headers(manifest["etag"], manifest["version"])
+    if etag_matches(if_none_match, manifest["etag"]):
+        return Response(status_code=304, headers=headers)
+    
+    return JSONResponse(manifest, headers=headers)
+
+@router.get("/{owner_id}/model/visitors/{visitor_id}")
+async def get_edge_visitor_model(
+    owner_id: int,
+    visitor_id: int,
+    if_none_match: Optional[str] = Header(None),
+    api_key: str = Depends(require_api_key)
+):
+    """Gzipped LBPH model of one of the owner's enrolled visitors"""
+    model = await model_store.get_visitor_model(owner_id, visitor_id)
+    if model is None:
+        raise HTTPException(status_code=404, detail="No trained model for this visitor")
+    if etag_matches(if_none_match, model["etag"]):
+        return Response(status_code=304, headers=_model_headers(model["etag"]))
+    
+    return Response(
+        content=model["model_gz"],
+        media_type="application/gzip",
+        headers=_model_headers(model["etag"])
+    )
+
+@router.post("/{owner_id}/recognised")
+async def report_edge_match(
+    owner_id: int,
+    match: EdgeMatchRequest,
+    background_tasks: BackgroundTasks,
+    api_key: str = Depends(require_api_key)
+):
+    """Record a visit the lock recognised on-device and notify the owner
+
+    The visit waits for the owner's decision unless the device opened the
+    lock, which it only does for visitors the owner enrolled with auto_unlock.
+    """
+    enrolment = await get_edge_visitor(owner_id, match.visitor_id)
+    if not enrolment:
+        raise HTTPException(status_code=404, detail="Visitor not enrolled for this owner")
+    if match.unlocked and not enrolment["auto_unlock"]:
+        # A stale manifest on the device; the door did open, so record it as such
+        print(f"Device of owner {owner_id} unlocked for visitor {match.visitor_id} without auto_unlock")
+
+    visit = await create_visit(
+        visitor_id=match.visitor_id,
+        owner_id=owner_id,
+        image_url=match.image_url,
+        status="granted" if match.unlocked else "pending",
+        detected_label="Known"
+    )
+    await visit_events.publish_visit_created(visit)
+
+    name = enrolment["name"] or "A known visitor"
+    background_tasks.add_task(
+        send_notifications_to_owner,
+        owner_id=owner_id,
+        title=f"🚪 {name} is at the door",
+        body="Let in automatically" if match.unlocked else "Open the app to accept or reject the entry request.",
+        data={
+            "visit_id": str(visit["id"]),
+            "visitor_name": enrolment["name"] or "",
+            "image_url": match.image_url,
+            "detected_label": "Known",
+            "timestamp": visit["timestamp"].isoformat() if visit.get("timestamp") else "",
+            "action": "new_visit",
+            "screen": "VisitDetails"
+        }
+    )
+
+    return {
+        "status": "success",
+        "visit_id": visit["id"],
+        "visit_status": visit["status"],
+        "visitor_id": match.visitor_id,
+        "owner_id": owner_id
+    }
+
+def _require_owner(owner_id: int, current_user_id: int):
+    if current_user_id != owner_id:
+        raise HTTPException(status_code=403, detail="Not allowed to change this owner's settings")
+
+@router.get("/{owner_id}/edge-visitors")
+async def list_edge_visitors(owner_id: int, current_user_id: int = Depends(get_current_user)):
+    """Visitors the owner's lock recognises on-device"""
+    _require_owner(owner_id, current_user_id)
+    visitors = await get_edge_visitors(owner_id)
+    return {"status": "success", "owner_id": owner_id, "visitors": visitors}
+
+@router.put("/{owner_id}/edge-visitors/{visitor_id}")
+async def enroll_visitor_on_lock(
+    owner_id: int,
+    visitor_id: int,
+    enrolment: EdgeEnrolmentRequest,
+    current_user_id: int = Depends(get_current_user)
+):
+    """Enrol a visitor for on-device recognition (their model is trained by the scheduler)"""
+    _require_owner(owner_id, current_user_id)
+    try:
+        row = await enroll_edge_visitor(owner_id, visitor_id, enrolment.auto_unlock)
+    except asyncpg.ForeignKeyViolationError:
+        raise HTTPException(status_code=404, detail="Visitor not found")
+    return {"status": "success", "enrolment": row}
+
+@router.delete("/{owner_id}/edge-visitors/{visitor_id}")
+async def unenroll_visitor_from_lock(
+    owner_id: int,
+    visitor_id: int,
+    current_user_id: int = Depends(get_current_user)
+):
+    """Stop recognising a visitor on the owner's lock (dropped at the device's next sync)"""
+    _require_owner(owner_id, current_user_id)
+    if not await unenroll_edge_visitor(owner_id, visitor_id):
+        raise HTTPException(status_code=404, detail="Visitor not enrolled for this owner")
+    return {"status": "success", "message": "Visitor removed from on-device recognition"}
+
 @router.get("/health")
 async def device_health_check():
     """Health check endpoint for device management"""
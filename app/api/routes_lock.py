@@ -0,0 +1,117 @@
+# app/api/routes_lock.py
+import asyncio
+import os
+from fastapi import APIRouter, HTTPException, Depends, Query, WebSocket
+from pydantic import BaseModel
+from typing import Optional
+from app.api.routes_auth import get_current_user
+from app.api.routes_uploads import require_api_key
+from app.realtime import visit_events
+from app.realtime.lock_commands import hub, LOCK_ACTIONS
+
+router = APIRouter()
+
+# Long-poll requests are held at most this long (keep below proxy idle timeouts)
+MAX_LONG_POLL_SECONDS = 55
+# Keep-alive interval for idle WebSocket streams
+WS_PING_SECONDS = 30
+
+# Pydantic models
+class LockCommandRequest(BaseModel):
+    action: str  # unlock, lock
+
+class AckRequest(BaseModel):
+    seq: int
+
+@router.post("/{owner_id}/command")
+async def send_lock_command(
+    owner_id: int,
+    command_data: LockCommandRequest,
+    current_user_id: int = Depends(get_current_user)
+):
+    """Send a lock/unlock command to all locks of an owner (mobile app)"""
+    if current_user_id != owner_id:
+        raise HTTPException(status_code=403, detail="Not allowed to control this lock")
+    if command_data.action not in LOCK_ACTIONS:
+        raise HTTPException(status_code=400, detail="Action must be 'unlock' or 'lock'")
+
+    command = await visit_events.publish_lock_command(owner_id, command_data.action)
+    return {
+        "status": "success",
+        "owner_id": owner_id,
+        "command": command
+    }
+
+@router.get("/{owner_id}/devices/{device_id}/commands")
+async def poll_lock_commands(
+    owner_id: int,
+    device_id: str,
+    after: Optional[int] = Query(None, description="Last sequence number the device executed"),
+    timeout: int = Query(25, ge=0, le=MAX_LONG_POLL_SECONDS),
+    api_key: str = Depends(require_api_key)
+):
+    """Long-poll for lock commands (fallback for devices without WebSocket support)"""
+    commands = await hub.log(owner_id).wait(device_id, after, timeout)
+    return {
+        "status": "success",
+        "owner_id": owner_id,
+        "device_id": device_id,
+        "commands": commands
+    }
+
+@router.post("/{owner_id}/devices/{device_id}/ack")
+async def ack_lock_command(
+    owner_id: int,
+    device_id: str,
+    ack_data: AckRequest,
+    api_key: str = Depends(require_api_key)
+):
+    """Acknowledge every command up to and including seq"""
+    acked = hub.log(owner_id).ack(device_id, ack_data.seq)
+    return {
+        "status": "success",
+        "device_id": device_id,
+        "acked_seq": acked
+    }
+
+async def _receive_acks(websocket: WebSocket, owner_id: int, device_id: str):
+    log = hub.log(owner_id)
+    while True:
+        message = await websocket.receive_json()
+        if isinstance(message, dict) and "ack" in message:
+            log.ack(device_id, int(message["ack"]))
+
+async def _send_commands(websocket: WebSocket, owner_id: int, device_id: str, after: Optional[int]):
+    log = hub.log(owner_id)
+    cursor = after
+    while True:
+        commands = await log.wait(device_id, cursor, WS_PING_SECONDS)
+        if not commands:
+            await websocket.send_json({"type": "ping"})
+            continue
+        for command in commands:
+            await websocket.send_json({"type": "command", **command})
+        # Unacknowledged commands are re-sent on reconnect, not on this stream
+        cursor = commands[-1]["seq"]
+
+@router.websocket("/{owner_id}/devices/{device_id}/ws")
+async def lock_command_stream(websocket: WebSocket, owner_id: int, device_id: str, after: Optional[int] = None):
+    """Push lock commands to a device as they are issued; the device replies {"ack": seq}"""
+    expected = os.getenv("API_KEY")
+    if not expected or websocket.headers.get("x-api-key") != expected:
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    tasks = [
+        asyncio.create_task(_receive_acks(websocket, owner_id, device_id)),
+        asyncio.create_task(_send_commands(websocket, owner_id, device_id, after))
+    ]
+    try:
+        # Either side ending (normally a WebSocketDisconnect) closes the stream
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.exception()
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -1,17 +1,26 @@
 # app/api/routes_notify.py
-from fastapi import APIRouter, HTTPException, BackgroundTasks , Query
+from fastapi import APIRouter, HTTPException, BackgroundTasks , Query, UploadFile, File, Depends
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
+import asyncio
 import httpx
 import json
 import numpy as np
 import os
-import psycopg2
-from psycopg2.extras import RealDictCursor
 import requests
 import cv2
 from datetime import datetime
-from app.db.crud import get_device_tokens_by_owner, get_visit_by_id, remove_invalid_tokens
+from app.db.crud import (
+    get_device_tokens_by_owner,
+    get_visit_by_id,
+    remove_invalid_tokens,
+    get_visitor_by_name,
+    create_visit
+)
+from app.api.routes_uploads import require_api_key, store_image_bytes
+from app.ml import frame_quality
+from app.realtime import visit_events
+from app.notifications.receipts import record_tickets
 
 router = APIRouter()
 
@@ -85,6 +94,7 @@ async def send_notifications_to_owner(owner_id: int, title: str, body: str, data
         
         results = []
         invalid_tokens = []
+        tickets = []
         
         for device in device_tokens:
             expo_token = device.get("expo_push_token")
@@ -108,10 +118,14 @@ async def send_notifications_to_owner(owner_id: int, title: str, body: str, data
             # Check for invalid tokens
             if result.get("success") == 0 and "DeviceNotRegistered" in str(result.get("error", "")):
                 invalid_tokens.append(expo_token)
+            elif result.get("id"):
+                tickets.append((result["id"], expo_token))
         
         # Remove invalid tokens
         if invalid_tokens:
             await remove_invalid_tokens(invalid_tokens)
+        # Delivery failures only show up in receipts, checked later by the scheduler
+        await record_tickets(tickets)
         
         return {
             "total_sent": len(device_tokens),
@@ -233,6 +247,21 @@ async def send_test_notification(owner_id: int):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def notification_summary(device_tokens: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Notification setup of an owner's devices, without full push tokens"""
+    return {
+        "notifications_enabled": len(device_tokens) > 0,
+        "registered_devices": len(device_tokens),
+        "devices": [
+            {
+                "platform": device["platform"],
+                "device_name": device.get("device_name", "Unknown Device"),
+                "token_preview": device["expo_push_token"][:30] + "..." if device.get("expo_push_token") else None
+            }
+            for device in device_tokens
+        ]
+    }
+
 @router.get("/status/{owner_id}")
 async def get_notification_status(owner_id: int):
     """Get notification setup status for an owner"""
@@ -242,16 +271,7 @@ async def get_notification_status(owner_id: int):
         return {
             "status": "success",
             "owner_id": owner_id,
-            "notifications_enabled": len(device_tokens) > 0,
-            "registered_devices": len(device_tokens),
-            "devices": [
-                {
-                    "platform": device["platform"],
-                    "device_name": device.get("device_name", "Unknown Device"),
-                    "token_preview": device["expo_push_token"][:30] + "..." if device.get("expo_push_token") else None
-                }
-                for device in device_tokens
-            ]
+            **notification_summary(device_tokens)
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -322,60 +342,33 @@ people = np.load(people_path, allow_pickle=True)
 face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
 
 CONFIDENCE_THRESHOLD = 60
+
+# Burst uploads: frames per request and how many of the best-scored frames
+# are passed through the (comparatively expensive) recognizer
+MAX_BURST_FRAMES = 16
+BURST_TOP_K = 3
 NOTIFICATION_ENDPOINT = "https://iot-lock-backend.onrender.com/api/notify/raspberry-pi/visitor-detected"
 
-# ======================
-# Database connection
-# ======================
-DB_HOST = "aws-1-ap-south-1.pooler.supabase.com"
-DB_PORT = "6543"
-DB_NAME = "postgres"
-DB_USER = "postgres.nqurgqrqauaxboujobca"
-DB_PASS = "Iot@12345"
-
-def get_visitor_id(visitor_name: str) -> int:
-    """Fetch visitor_id from DB using visitor_name."""
-    try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASS
-        )
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        cur.execute("SELECT id FROM visitors WHERE name = %s LIMIT 1", (visitor_name,))
-        row = cur.fetchone()
-        cur.close()
-        conn.close()
-        if row:
-            return row["id"]
-        else:
-            return 0
-    except Exception as e:
-        print(f"DB error: {e}")
-        return 0
+def recognize_face(gray: np.ndarray) -> Tuple[str, str, Optional[float]]:
+    """Run face detection + LBPH recognition, returns (visitor_name, detected_label, confidence)"""
+    faces = face_cascade.detectMultiScale(
+        gray,
+        scaleFactor=1.2,
+        minNeighbors=8,
+        minSize=(80, 80)
+    )
 
-def insert_visit(visitor_id: int, owner_id: int, image_url: str):
-    """Insert a visit record into visits table."""
-    try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASS
-        )
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO visits (visitor_id, owner_id, image_url)
-            VALUES (%s, %s, %s)
-        """, (visitor_id if visitor_id != 0 else None, owner_id, image_url))
-        conn.commit()
-        cur.close()
-        conn.close()
-    except Exception as e:
-        print(f"Failed to insert visit record: {e}")
+    if len(faces) == 0:
+        return "No face detected", "Unknown", None
+
+    # Take the first detected face
+    x, y, w, h = faces[0]
+    face_roi = gray[y:y+h, x:x+w]
+    label, confidence = recognizer.predict(face_roi)
+
+    if confidence < CONFIDENCE_THRESHOLD:
+        return people[label].replace("_", " "), "Known", confidence
+    return "Unknown", "Unknown", confidence
 
 # ======================
 # Request model
@@ -383,17 +376,20 @@ def insert_visit(visitor_id: int, owner_id: int, image_url: str):
 class DetectRequest(BaseModel):
     image_url: str  # Single S3 URL
 
+# Devices send their owner_id; the owner visits were recorded for before they did
+DEFAULT_DETECT_OWNER_ID = 12
+
 # ======================
 # Endpoint
 # ======================
 @router.post("/detect-visitor")
 async def detect_visitor(
-    req: DetectRequest
+    req: DetectRequest,
+    owner_id: int = Query(DEFAULT_DETECT_OWNER_ID)
 ):
     visitor_name = "Unknown"
     detected_label = "Unknown"
     visitor_id = 0
-    owner_id = 12
     try:
         # Download image
         img_data = requests.get(req.image_url, timeout=10).content
@@ -401,31 +397,11 @@ async def detect_visitor(
         frame = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
 
-        # Detect faces
-        faces = face_cascade.detectMultiScale(
-            gray,
-            scaleFactor=1.2,
-            minNeighbors=8,
-            minSize=(80, 80)
-        )
-
-        if len(faces) > 0:
-            # Take the first detected face
-            x, y, w, h = faces[0]
-            face_roi = gray[y:y+h, x:x+w]
-            label, confidence = recognizer.predict(face_roi)
-
-            if confidence < CONFIDENCE_THRESHOLD:
-                visitor_name = people[label].replace("_", " ")
-                detected_label = "Known"
-                visitor_id = get_visitor_id(visitor_name)
-            else:
-                visitor_name = "Unknown"
-                detected_label = "Unknown"
-                visitor_id = 0
+        visitor_name, detected_label, _ = recognize_face(gray)
+        if detected_label == "Known":
+            visitor = await get_visitor_by_name(visitor_name)
+            visitor_id = visitor["id"] if visitor else 0
         else:
-            visitor_name = "No face detected"
-            detected_label = "Unknown"
             visitor_id = 0
 
     except Exception as e:
@@ -442,8 +418,17 @@ async def detect_visitor(
         "visitor name": visitor_name
     }
 
-    # Insert into visits table
-    insert_visit(visitor_id, owner_id, req.image_url)
+    # Insert into visits table (through crud, so cached visit lists are invalidated)
+    try:
+        visit = await create_visit(
+            visitor_id=visitor_id or None,
+            owner_id=owner_id,
+            image_url=req.image_url,
+            detected_label=detected_label
+        )
+        await visit_events.publish_visit_created(visit)
+    except Exception as e:
+        print(f"Failed to insert visit record: {e}")
 
     # Send notification
     try:
@@ -452,4 +437,115 @@ async def detect_visitor(
     except Exception as e:
         print(f"Failed to send visitor notification: {e}")
 
-    return payload
\ No newline at end of file
+    return payload
+
+
+# ======================
+# Burst endpoint
+# ======================
+def select_burst_frame(frames: List[np.ndarray], top_k: int) -> Dict[str, Any]:
+    """Score a burst in one pass and run recognition on the top-k frames only"""
+    order, scores = frame_quality.rank_frames(frames)
+
+    selected = int(order[0])
+    visitor_name, detected_label, best_confidence = "No face detected", "Unknown", None
+    for index in order[:top_k]:
+        gray = cv2.cvtColor(frames[index], cv2.COLOR_BGR2GRAY)
+        name, label, confidence = recognize_face(gray)
+        if confidence is None:
+            continue
+        # Prefer a recognised frame, then the most confident match, otherwise quality order
+        better = (
+            best_confidence is None
+            or (label == "Known" and detected_label != "Known")
+            or (label == "Known" == detected_label and confidence < best_confidence)
+        )
+        if better:
+            selected = int(index)
+            visitor_name, detected_label, best_confidence = name, label, confidence
+        if detected_label == "Known" and index == order[0]:
+            break
+
+    return {
+        "selected": selected,
+        "visitor_name": visitor_name,
+        "detected_label": detected_label,
+        "confidence": best_confidence,
+        "scores": [round(float(score), 4) for score in scores]
+    }
+
+@router.post("/detect-visitor/burst")
+async def detect_visitor_burst(
+    background_tasks: BackgroundTasks,
+    owner_id: int = Query(...),
+    files: List[UploadFile] = File(...),
+    top_k: int = Query(BURST_TOP_K, ge=1, le=MAX_BURST_FRAMES),
+    api_key: str = Depends(require_api_key)
+):
+    """Accept a burst of frames, pick the best one server-side and record a single visit"""
+    if len(files) > MAX_BURST_FRAMES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BURST_FRAMES} frames per burst")
+
+    blobs = [await f.read() for f in files]
+    frames = await asyncio.to_thread(frame_quality.decode_frames, blobs)
+    valid = [i for i, frame in enumerate(frames) if frame is not None]
+    if not valid:
+        raise HTTPException(status_code=400, detail="No decodable image frames in burst")
+
+    try:
+        result = await asyncio.to_thread(select_burst_frame, [frames[i] for i in valid], top_k)
+        selected = valid[result["selected"]]
+
+        # Only the winning frame is stored, as it was uploaded (no re-encode)
+        selected_file = files[selected]
+        ext = os.path.splitext(selected_file.filename or "")[1] or ".jpg"
+        image_url = await store_image_bytes(
+            blobs[selected],
+            ext=ext,
+            content_type=selected_file.content_type or "image/jpeg"
+        )
+
+        visitor_id = None
+        if result["detected_label"] == "Known":
+            visitor = await get_visitor_by_name(result["visitor_name"])
+            visitor_id = visitor["id"] if visitor else None
+
+        visit = await create_visit(
+            visitor_id=visitor_id,
+            owner_id=owner_id,
+            image_url=image_url,
+            status="pending",
+            detected_label=result["detected_label"]
+        )
+        await visit_events.publish_visit_created(visit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    background_tasks.add_task(
+        send_notifications_to_owner,
+        owner_id=owner_id,
+        title="🚪 Someone's at the Door!",
+        body=f"{result['visitor_name']} detected at your door",
+        data={
+            "visit_id": str(visit["id"]),
+            "visitor_name": result["visitor_name"],
+            "image_url": image_url,
+            "detected_label": result["detected_label"],
+            "timestamp": visit["timestamp"].isoformat() if visit.get("timestamp") else "",
+            "action": "new_visit",
+            "screen": "VisitDetails"
+        }
+    )
+
+    return {
+        "status": "success",
+        "visit_id": visit["id"],
+        "visitor_id": visitor_id,
+        "owner_id": owner_id,
+        "image_url": image_url,
+        "detected_label": result["detected_label"],
+        "visitor_name": result["visitor_name"],
+        "selected_frame": selected,
+        "frames_received": len(files),
+        "scores": result["scores"]
+    }
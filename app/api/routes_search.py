@@ -0,0 +1,67 @@
+# app/api/routes_search.py
+from fastapi import APIRouter, HTTPException, Depends, Query
+from typing import Optional
+from app.api.routes_auth import get_current_user
+from app.db.pagination import InvalidCursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.db.search import search_visitors, search_visits, SEARCH_MODES, MIN_QUERY_LENGTH
+
+router = APIRouter()
+
+
+def _check_search(owner_id: int, current_user_id: int, mode: str):
+    if current_user_id != owner_id:
+        raise HTTPException(status_code=403, detail="Not allowed to search this owner's visits")
+    if mode not in SEARCH_MODES:
+        raise HTTPException(status_code=400, detail=f"Mode must be one of: {', '.join(SEARCH_MODES)}")
+
+@router.get("/{owner_id}/visitors")
+async def search_owner_visitors(
+    owner_id: int,
+    q: str = Query(..., min_length=MIN_QUERY_LENGTH, max_length=100),
+    mode: str = "fuzzy",
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user_id: int = Depends(get_current_user)
+):
+    """Search visitors who have visited this owner by name (prefix or fuzzy)"""
+    _check_search(owner_id, current_user_id, mode)
+    try:
+        visitors, next_cursor = await search_visitors(owner_id, q, mode=mode, limit=limit, cursor=cursor)
+        return {
+            "status": "success",
+            "owner_id": owner_id,
+            "query": q,
+            "count": len(visitors),
+            "next_cursor": next_cursor,
+            "visitors": visitors
+        }
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{owner_id}/visits")
+async def search_owner_visits(
+    owner_id: int,
+    q: str = Query(..., min_length=MIN_QUERY_LENGTH, max_length=100),
+    mode: str = "fuzzy",
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user_id: int = Depends(get_current_user)
+):
+    """Search an owner's visits by detected label or visitor name (prefix or fuzzy)"""
+    _check_search(owner_id, current_user_id, mode)
+    try:
+        visits, next_cursor = await search_visits(owner_id, q, mode=mode, limit=limit, cursor=cursor)
+        return {
+            "status": "success",
+            "owner_id": owner_id,
+            "query": q,
+            "count": len(visits),
+            "next_cursor": next_cursor,
+            "visits": visits
+        }
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -28,6 +28,25 @@ def require_api_key(x_api_key: str = Header(...)):
     return x_api_key
 
 
+async def store_image_bytes(data: bytes, ext: str = ".jpg", content_type: str = "image/jpeg") -> str:
+    """Upload already-encoded image bytes to S3 and return the permanent URL"""
+    bucket = os.environ.get("S3_BUCKET_NAME")
+    region = os.environ.get("AWS_DEFAULT_REGION")
+    if not bucket or not region:
+        raise RuntimeError("S3_BUCKET_NAME or AWS_DEFAULT_REGION not configured")
+
+    timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+    key = f"uploads/{timestamp}_{uuid.uuid4().hex}{ext}"
+    await asyncio.to_thread(
+        s3_client.put_object,
+        Bucket=bucket,
+        Key=key,
+        Body=data,
+        ContentType=content_type
+    )
+    return f"https://{bucket}.s3.{region}.amazonaws.com/{key}"
+
+
 @router.post("/upload-image")
 async def upload_image(file: UploadFile = File(...), api_key: str = Depends(require_api_key)):
     """
@@ -2,6 +2,7 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional, List
+from app.core.responses import FastJSONResponse
 from app.db.crud import (
     create_visitor,
     get_visitor_by_id,
@@ -60,11 +61,11 @@ async def get_all_visitors_list():
     """Get all visitors"""
     try:
         visitors = await get_all_visitors()
-        return {
+        return FastJSONResponse({
             "status": "success",
             "total_visitors": len(visitors),
             "visitors": visitors
-        }
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -72,17 +73,13 @@ async def get_all_visitors_list():
 async def update_visitor_details(visitor_id: int, visitor_data: UpdateVisitorRequest):
     """Update visitor information"""
     try:
-        # Check if visitor exists
-        existing_visitor = await get_visitor_by_id(visitor_id)
-        if not existing_visitor:
-            raise HTTPException(status_code=404, detail="Visitor not found")
-        
-        # Update visitor
         updated_visitor = await update_visitor(
             visitor_id=visitor_id,
             name=visitor_data.name,
             profile_image_url=visitor_data.profile_image_url
         )
+        if not updated_visitor:
+            raise HTTPException(status_code=404, detail="Visitor not found")
         
         return {
             "status": "success",
@@ -1,18 +1,41 @@
 # app/api/routes_visits.py
-from fastapi import APIRouter, HTTPException, Query, UploadFile, File
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+import orjson
+from fastapi import APIRouter, HTTPException, Query, UploadFile, File, WebSocket, WebSocketDisconnect, Request, Depends
 from pydantic import BaseModel
 from typing import Optional, List
 from app.db.crud import (
-    get_visits_by_owner, 
+    get_visits_by_owner_json,
     create_visit, 
     update_visit_status, 
     get_visit_by_id,
-    get_pending_visits_by_owner,
+    get_visit_status,
     get_visit_statistics,
+    get_daily_visit_statistics,
     get_recent_activity,
+    get_retention_policy,
+    set_retention_policy,
     create_visitor,
     get_visitor_by_id
 )
+from app.db.pagination import InvalidCursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.db import bulk_visits
+from app.db.analytics import visit_analytics, BUCKET_SIZES, DEFAULT_BUCKET_COUNT, MAX_BUCKETS
+from app.api.routes_uploads import require_api_key
+from app.core.responses import FastJSONResponse, splice_json
+from app.api.routes_auth import verify_token, get_current_user
+from app.realtime import visit_events
+from app.realtime.visit_feed import hub as feed_hub, RESYNC
+
+# Upper bound for how long a device may park a status wait request
+MAX_WAIT_SECONDS = 55
+# Keep-alive interval for idle visit feed connections
+FEED_PING_SECONDS = 30
+# Longest date range served by the daily statistics endpoint
+MAX_STATISTICS_DAYS = 366
+# Most rows accepted by one bulk ingestion request
+MAX_BULK_ROWS = 100_000
 
 router = APIRouter()
 
@@ -28,36 +51,63 @@ class UpdateVisitStatusRequest(BaseModel):
     visit_id: int
     status: str  # pending, granted, denied
 
+class RetentionPolicyRequest(BaseModel):
+    retention_days: Optional[int] = None  # None keeps visits until they are archived
+
 class VisitResponse(BaseModel):
     status: str
     message: str
     visit: Optional[dict] = None
 
+VISIT_STATUSES = ["pending", "granted", "denied"]
+
 @router.get("/{owner_id}")
-async def fetch_visits(owner_id: int):
-    """Get all visits for a specific owner"""
+async def fetch_visits(
+    owner_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None
+):
+    """Get visits for a specific owner, newest first (pass next_cursor back for the next page)"""
     try:
-        visits = await get_visits_by_owner(owner_id)
-        return {
+        if status and status not in VISIT_STATUSES:
+            raise HTTPException(status_code=400, detail="Status must be 'pending', 'granted', or 'denied'")
+        
+        visits_json, count, next_cursor = await get_visits_by_owner_json(
+            owner_id, limit=limit, cursor=cursor, status=status
+        )
+        return FastJSONResponse(splice_json({
             "status": "success",
             "owner_id": owner_id,
-            "total_visits": len(visits),
-            "visits": visits
-        }
+            "count": count,
+            "next_cursor": next_cursor
+        }, "visits", visits_json))
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{owner_id}/pending")
-async def fetch_pending_visits(owner_id: int):
-    """Get pending visits for a specific owner"""
+async def fetch_pending_visits(
+    owner_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+):
+    """Get pending visits for a specific owner, newest first"""
     try:
-        visits = await get_pending_visits_by_owner(owner_id)
-        return {
+        visits_json, count, next_cursor = await get_visits_by_owner_json(
+            owner_id, limit=limit, cursor=cursor, status="pending"
+        )
+        return FastJSONResponse(splice_json({
             "status": "success",
             "owner_id": owner_id,
-            "pending_visits": len(visits),
-            "visits": visits
-        }
+            "pending_visits": count,
+            "next_cursor": next_cursor
+        }, "visits", visits_json))
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -74,19 +124,144 @@ async def get_visit_stats(owner_id: int):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/{owner_id}/statistics/daily")
+async def get_daily_visit_stats(owner_id: int, start: Optional[date] = None, end: Optional[date] = None):
+    """Get per-day visit counts for charts (UTC dates, defaults to the last 30 days)"""
+    try:
+        end = end or datetime.now(timezone.utc).date()
+        start = start or end - timedelta(days=29)
+        if start > end:
+            raise HTTPException(status_code=400, detail="start must not be after end")
+        if (end - start).days >= MAX_STATISTICS_DAYS:
+            raise HTTPException(status_code=400, detail=f"Range is limited to {MAX_STATISTICS_DAYS} days")
+        
+        days = await get_daily_visit_statistics(owner_id, start, end)
+        return {
+            "status": "success",
+            "owner_id": owner_id,
+            "start": start,
+            "end": end,
+            "days": days
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{owner_id}/analytics")
+async def get_visit_analytics(
+    owner_id: int,
+    bucket: str = "day",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    """Visit counts per hour/day/week (UTC) with known/unknown split and median response time"""
+    if bucket not in BUCKET_SIZES:
+        raise HTTPException(status_code=400, detail=f"Bucket must be one of: {', '.join(BUCKET_SIZES)}")
+    try:
+        end = end or datetime.now(timezone.utc)
+        start = start or end - BUCKET_SIZES[bucket] * DEFAULT_BUCKET_COUNT[bucket]
+        # Query strings without an offset are taken as UTC
+        if end.tzinfo is None:
+            end = end.replace(tzinfo=timezone.utc)
+        if start.tzinfo is None:
+            start = start.replace(tzinfo=timezone.utc)
+        if start >= end:
+            raise HTTPException(status_code=400, detail="start must be before end")
+        if (end - start) / BUCKET_SIZES[bucket] > MAX_BUCKETS:
+            raise HTTPException(status_code=400, detail=f"Range is limited to {MAX_BUCKETS} buckets")
+
+        buckets = await visit_analytics(owner_id, bucket, start, end)
+        return {
+            "status": "success",
+            "owner_id": owner_id,
+            "bucket": bucket,
+            "start": buckets[0]["bucket_start"] if buckets else start,
+            "end": end,
+            "buckets": buckets
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{owner_id}/retention")
+async def fetch_retention_policy(owner_id: int, current_user_id: int = Depends(get_current_user)):
+    """Get how long an owner's visits are kept"""
+    if current_user_id != owner_id:
+        raise HTTPException(status_code=403, detail="Not allowed to view this owner's settings")
+    try:
+        return {
+            "status": "success",
+            "owner_id": owner_id,
+            "retention_days": await get_retention_policy(owner_id)
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.put("/{owner_id}/retention")
+async def update_retention_policy(
+    owner_id: int,
+    policy: RetentionPolicyRequest,
+    current_user_id: int = Depends(get_current_user)
+):
+    """Set how long an owner's visits are kept (older visits are deleted by the retention job)"""
+    if current_user_id != owner_id:
+        raise HTTPException(status_code=403, detail="Not allowed to change this owner's settings")
+    if policy.retention_days is not None and policy.retention_days < 1:
+        raise HTTPException(status_code=400, detail="retention_days must be at least 1")
+    try:
+        return {
+            "status": "success",
+            "owner_id": owner_id,
+            "retention_days": await set_retention_policy(owner_id, policy.retention_days)
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/{owner_id}/recent")
 async def get_recent_visits(owner_id: int, limit: int = Query(10, ge=1, le=50)):
     """Get recent visit activity for an owner"""
     try:
         visits = await get_recent_activity(owner_id, limit)
-        return {
+        return FastJSONResponse({
             "status": "success",
             "owner_id": owner_id,
             "recent_visits": visits
-        }
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.websocket("/{owner_id}/feed")
+async def visit_feed(websocket: WebSocket, owner_id: int, token: str, cursor: Optional[str] = None):
+    """Push visit.created / visit.status_changed events for an owner (mobile app)
+
+    Reconnect with ?cursor=<last cursor seen> to get missed events replayed;
+    a {"type": "resync"} message means the app should refetch over REST.
+    """
+    if verify_token(token) != owner_id:
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    subscriber, replay = feed_hub.subscribe(owner_id, cursor)
+    try:
+        for event in (replay if replay is not None else [RESYNC]):
+            await websocket.send_json(event)
+        while True:
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), FEED_PING_SECONDS)
+            except asyncio.TimeoutError:
+                event = {"type": "ping"}
+            # A closed client surfaces here as a send error, no reader task needed
+            await websocket.send_json(event)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"Visit feed for owner {owner_id} closed on error: {e}")
+    finally:
+        feed_hub.unsubscribe(subscriber)
+
 @router.post("/create", response_model=VisitResponse)
 async def create_new_visit(visit_data: CreateVisitRequest):
     """Create a new visit (called by IoT device)"""
@@ -106,6 +281,7 @@ async def create_new_visit(visit_data: CreateVisitRequest):
             status="pending",
             detected_label=visit_data.detected_label
         )
+        await visit_events.publish_visit_created(visit)
         
         return VisitResponse(
             status="success",
@@ -115,12 +291,80 @@ async def create_new_visit(visit_data: CreateVisitRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _too_many_rows():
+    return HTTPException(status_code=413, detail=f"At most {MAX_BULK_ROWS} rows per request")
+
+async def _ndjson_items(request: Request):
+    """Decode an NDJSON body line by line as it streams in, stopping once it passes MAX_BULK_ROWS"""
+    buffer = b""
+    index = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                if index == MAX_BULK_ROWS:
+                    raise _too_many_rows()
+                yield index, _decode(line)
+                index += 1
+    if buffer.strip():
+        if index == MAX_BULK_ROWS:
+            raise _too_many_rows()
+        yield index, _decode(buffer)
+
+def _decode(line: bytes):
+    try:
+        return orjson.loads(line)
+    except orjson.JSONDecodeError as e:
+        return ValueError(f"invalid JSON: {e}")
+
+@router.post("/bulk")
+async def bulk_create_visits(request: Request, api_key: str = Depends(require_api_key)):
+    """Ingest many visits at once (NDJSON or a JSON array), e.g. backfill from an offline device
+
+    Imported visits aren't sent to the visit feed one by one; each affected
+    owner's feed gets a single {"type": "resync"} instead.
+    """
+    try:
+        content_type = request.headers.get("content-type", "")
+        if "ndjson" in content_type or "jsonlines" in content_type:
+            items = [item async for item in _ndjson_items(request)]
+        else:
+            try:
+                body = orjson.loads(await request.body())
+            except orjson.JSONDecodeError as e:
+                raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
+            if not isinstance(body, list):
+                raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+            items = list(enumerate(body))
+
+        if len(items) > MAX_BULK_ROWS:
+            raise _too_many_rows()
+
+        rows, errors = bulk_visits.prepare_rows(items)
+        inserted, load_errors = await bulk_visits.ingest_visits(rows)
+        failed = {error["row"] for error in load_errors}
+        for owner_id in {row.owner_id for row in rows if row.index not in failed}:
+            await visit_events.publish_resync(owner_id)
+        errors = sorted(errors + load_errors, key=lambda e: e["row"])
+        return {
+            "status": "success",
+            "received": len(items),
+            "inserted": inserted,
+            "failed": len(errors),
+            "errors": errors
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.put("/status", response_model=VisitResponse)
 async def update_status(status_data: UpdateVisitStatusRequest):
     """Update visit status (approve/deny access)"""
     try:
         # Validate status
-        if status_data.status not in ["pending", "granted", "denied"]:
+        if status_data.status not in VISIT_STATUSES:
             raise HTTPException(
                 status_code=400, 
                 detail="Status must be 'pending', 'granted', or 'denied'"
@@ -132,6 +376,10 @@ async def update_status(status_data: UpdateVisitStatusRequest):
         if not updated_visit:
             raise HTTPException(status_code=404, detail="Visit not found")
         
+        if status_data.status == "granted":
+            await visit_events.publish_lock_command(updated_visit["owner_id"], "unlock", visit_id=updated_visit["id"])
+        await visit_events.publish_status_change(updated_visit)
+        
         return VisitResponse(
             status="success",
             message=f"Visit status updated to {status_data.status}",
@@ -169,6 +417,10 @@ async def approve_visit(visit_id: int):
         if not updated_visit:
             raise HTTPException(status_code=404, detail="Visit not found")
         
+        # Push the unlock straight to the owner's locks
+        await visit_events.publish_lock_command(updated_visit["owner_id"], "unlock", visit_id=visit_id)
+        await visit_events.publish_status_change(updated_visit)
+        
         return {
             "status": "success",
             "message": "Visit approved",
@@ -188,6 +440,8 @@ async def deny_visit(visit_id: int):
         if not updated_visit:
             raise HTTPException(status_code=404, detail="Visit not found")
         
+        await visit_events.publish_status_change(updated_visit)
+        
         return {
             "status": "success",
             "message": "Visit denied",
@@ -203,16 +457,45 @@ async def deny_visit(visit_id: int):
 async def check_visit_status(visit_id: int):
     """Check if a visit has been approved/denied (for IoT device polling)"""
     try:
-        visit = await get_visit_by_id(visit_id)
+        visit_status = await get_visit_status(visit_id)
         
-        if not visit:
+        if not visit_status:
             raise HTTPException(status_code=404, detail="Visit not found")
         
         return {
             "status": "success",
             "visit_id": visit_id,
-            "visit_status": visit["status"],
-            "can_unlock": visit["status"] == "granted"
+            "visit_status": visit_status,
+            "can_unlock": visit_status == "granted"
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/status/{visit_id}/wait")
+async def wait_visit_status(visit_id: int, timeout: int = Query(25, ge=0, le=MAX_WAIT_SECONDS)):
+    """Hold the request until the visit leaves 'pending' or the timeout expires (for IoT device)"""
+    try:
+        async with visit_events.watch_visit(visit_id) as changed:
+            visit_status = await get_visit_status(visit_id)
+            
+            if not visit_status:
+                raise HTTPException(status_code=404, detail="Visit not found")
+            
+            if visit_status == "pending":
+                try:
+                    event = await asyncio.wait_for(asyncio.shield(changed), timeout)
+                    visit_status = event["status"]
+                except asyncio.TimeoutError:
+                    pass
+        
+        return {
+            "status": "success",
+            "visit_id": visit_id,
+            "visit_status": visit_status,
+            "can_unlock": visit_status == "granted",
+            "timed_out": visit_status == "pending"
         }
     except HTTPException:
         raise
@@ -0,0 +1,214 @@
+# app/core/cache.py
+import asyncio
+import functools
+import os
+import pickle
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List
+from app.core import metrics
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Redis is optional, the in-process store is the default
+    aioredis = None
+
+# =========================
+# Read Cache
+# =========================
+# Async TTL cache for hot CRUD reads. Each entry belongs to one or more
+# groups (e.g. "visit:42", "owner-visits:7"). Writes bump a group's version
+# instead of hunting down keys, so every entry built from the old version
+# simply stops being read. Concurrent misses on the same key share one
+# database query.
+#
+# Entries live in process memory (LRU, CACHE_MAX_ENTRIES). Set
+# CACHE_REDIS_URL to share them between workers; Redis then evicts by its
+# own maxmemory-policy. Cached values are shared, treat them as read-only.
+#
+# A group's version is forgotten once it hasn't been bumped for
+# CACHE_VERSION_TTL_SECONDS. No entry lives longer than that, so anything
+# built under an older version has expired by then and the version can
+# safely start again from 0.
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "1") == "1"
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "30"))
+CACHE_VERSION_TTL_SECONDS = float(os.getenv("CACHE_VERSION_TTL_SECONDS", "86400"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+CACHE_KEY_PREFIX = "iotlock:cache:"
+
+MISSING = object()
+
+lookups = metrics.counter("cache_requests_total", "Cache lookups by cache name and result")
+
+
+class MemoryBackend:
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, version_ttl: float = CACHE_VERSION_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.version_ttl = version_ttl
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # group -> (version, bumped_at), least recently bumped first
+        self.versions: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def get(self, key: str) -> Any:
+        entry = self.entries.get(key)
+        if entry is None:
+            return MISSING
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            return MISSING
+        self.entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: float):
+        self.entries[key] = (time.monotonic() + ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def _version(self, group: str, now: float) -> int:
+        entry = self.versions.get(group)
+        if entry is None or entry[1] + self.version_ttl < now:
+            return 0
+        return entry[0]
+
+    async def versions_of(self, groups: List[str]) -> List[int]:
+        now = time.monotonic()
+        return [self._version(group, now) for group in groups]
+
+    async def bump(self, groups: List[str]):
+        now = time.monotonic()
+        for group in groups:
+            self.versions[group] = (self._version(group, now) + 1, now)
+            self.versions.move_to_end(group)
+        # e.g. one "visit:{id}" group per decided visit would otherwise pile up forever
+        while self.versions:
+            _, bumped_at = next(iter(self.versions.values()))
+            if bumped_at + self.version_ttl >= now:
+                break
+            self.versions.popitem(last=False)
+
+
+class RedisBackend:
+    def __init__(self, url: str):
+        self.client = aioredis.from_url(url)
+
+    async def get(self, key: str) -> Any:
+        raw = await self.client.get(CACHE_KEY_PREFIX + key)
+        return MISSING if raw is None else pickle.loads(raw)
+
+    async def set(self, key: str, value: Any, ttl: float):
+        await self.client.set(CACHE_KEY_PREFIX + key, pickle.dumps(value), px=int(ttl * 1000))
+
+    async def versions_of(self, groups: List[str]) -> List[int]:
+        values = await self.client.mget([f"{CACHE_KEY_PREFIX}v:{group}" for group in groups])
+        return [int(value) if value else 0 for value in values]
+
+    async def bump(self, groups: List[str]):
+        async with self.client.pipeline(transaction=False) as pipe:
+            for group in groups:
+                pipe.incr(f"{CACHE_KEY_PREFIX}v:{group}")
+                pipe.pexpire(f"{CACHE_KEY_PREFIX}v:{group}", int(CACHE_VERSION_TTL_SECONDS * 1000))
+            await pipe.execute()
+
+
+class Cache:
+    def __init__(self, backend):
+        self.backend = backend
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def get_or_load(self, name: str, key: str, groups: List[str], ttl: float,
+                          loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for key, or run loader once for all concurrent callers"""
+        ttl = min(ttl, CACHE_VERSION_TTL_SECONDS)
+        try:
+            versions = await self.backend.versions_of(groups)
+            key = f"{key}|{','.join(map(str, versions))}"
+            value = await self.backend.get(key)
+        except Exception as e:
+            # The cache must never take a read down with it
+            print(f"Cache unavailable, reading through: {e}")
+            lookups.inc(cache=name, result="error")
+            return await loader()
+
+        if value is not MISSING:
+            lookups.inc(cache=name, result="hit")
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            lookups.inc(cache=name, result="collapsed")
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise  # this caller was cancelled
+                # The caller running the shared load was cancelled, not us
+                return await loader()
+
+        lookups.inc(cache=name, result="miss")
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # waiters re-raise it; don't warn when there are none
+            raise
+        except BaseException:
+            # Cancelled (a BaseException): collapsed waiters must not wait forever
+            future.cancel()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        future.set_result(value)
+
+        try:
+            await self.backend.set(key, value, ttl)
+        except Exception as e:
+            print(f"Cache write failed: {e}")
+        return value
+
+    async def invalidate(self, *groups: str):
+        try:
+            await self.backend.bump(list(groups))
+        except Exception as e:
+            print(f"Cache invalidation failed for {', '.join(groups)}: {e}")
+
+    def cached(self, name: str, groups: Callable[..., List[str]], ttl: float = CACHE_TTL_SECONDS):
+        """Decorate an async read; groups(*args, **kwargs) names what invalidates an entry"""
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                if not CACHE_ENABLED:
+                    return await func(*args, **kwargs)
+                key = f"{name}:{args!r}:{sorted(kwargs.items())!r}"
+                return await self.get_or_load(
+                    name, key, groups(*args, **kwargs), ttl, lambda: func(*args, **kwargs)
+                )
+            wrapper.uncached = func
+            return wrapper
+        return decorator
+
+
+def _hit_ratios() -> Dict[metrics.Labels, float]:
+    totals: Dict[str, List[float]] = {}
+    for key, count in lookups.values.items():
+        labels = dict(key)
+        hits_and_total = totals.setdefault(labels["cache"], [0.0, 0.0])
+        hits_and_total[1] += count
+        if labels["result"] in ("hit", "collapsed"):
+            hits_and_total[0] += count
+    return {
+        metrics.labels(cache=name): hits / total
+        for name, (hits, total) in totals.items() if total
+    }
+
+
+metrics.gauge("cache_hit_ratio", "Share of cache lookups served without a database query", _hit_ratios)
+
+if CACHE_REDIS_URL and aioredis is None:
+    print("CACHE_REDIS_URL is set but the redis package is not installed, using the in-process cache")
+
+cache = Cache(RedisBackend(CACHE_REDIS_URL) if CACHE_REDIS_URL and aioredis else MemoryBackend())
@@ -0,0 +1,77 @@
+# app/core/jobs.py
+import os
+from app.core.cache import cache, RedisBackend, CACHE_TTL_SECONDS
+from app.core.scheduler import Scheduler
+from app.db import crud, partitions
+from app.ml import model_store
+from app.notifications.receipts import reconcile_receipts
+
+# =========================
+# Scheduled Maintenance Jobs
+# =========================
+HOUR = 3600
+DAY = 24 * HOUR
+
+TOKEN_CLEANUP_DAYS = int(os.getenv("TOKEN_CLEANUP_DAYS", "30"))
+CACHE_WARM_OWNERS = int(os.getenv("CACHE_WARM_OWNERS", "50"))
+# Each run repeats the uncached busiest-owners query, so not every few seconds
+CACHE_WARM_INTERVAL_SECONDS = float(os.getenv("CACHE_WARM_INTERVAL_SECONDS", "600"))
+RECENT_ACTIVITY_DEFAULT_LIMIT = 10  # the /recent endpoint's default page
+
+
+async def cleanup_tokens():
+    removed = await crud.cleanup_inactive_tokens(TOKEN_CLEANUP_DAYS)
+    if removed:
+        print(f"Removed {removed} device tokens inactive for {TOKEN_CLEANUP_DAYS}+ days")
+
+
+async def compact_rollups():
+    removed = await crud.compact_visit_daily_stats()
+    if removed:
+        print(f"Compacted {removed} empty visit_daily_stats rows")
+
+
+async def warm_cache():
+    """Preload what the app fetches on open for the busiest owners"""
+    await crud.get_all_visitors()
+    for owner_id in await crud.get_active_owner_ids(limit=CACHE_WARM_OWNERS):
+        await crud.get_recent_activity(owner_id, RECENT_ACTIVITY_DEFAULT_LIMIT)
+
+
+async def reconcile_push_receipts():
+    counts = await reconcile_receipts()
+    if counts["checked"] or counts["expired"]:
+        print(f"Push receipts: {counts}")
+
+
+async def ensure_partitions():
+    await partitions.ensure_visit_partitions()
+
+
+async def apply_retention():
+    deleted = await partitions.apply_retention_policies()
+    if deleted:
+        print(f"Retention removed {sum(deleted.values())} visits across {len(deleted)} owners")
+
+
+async def archive_partitions():
+    await partitions.archive_expired_partitions()
+
+
+async def train_edge_models():
+    trained = await model_store.train_pending_models()
+    if trained:
+        print(f"Trained edge models for {len(trained)} visitors")
+
+
+def register_jobs(scheduler: Scheduler):
+    scheduler.add("cleanup_inactive_tokens", DAY, cleanup_tokens)
+    scheduler.add("compact_visit_rollups", DAY, compact_rollups)
+    # An in-process cache has to be warmed in every worker; a shared Redis once
+    scheduler.add("warm_cache", max(CACHE_WARM_INTERVAL_SECONDS, CACHE_TTL_SECONDS), warm_cache,
+                  leader_only=isinstance(cache.backend, RedisBackend))
+    scheduler.add("reconcile_push_receipts", 15 * 60, reconcile_push_receipts)
+    scheduler.add("ensure_visit_partitions", DAY, ensure_partitions)
+    scheduler.add("apply_retention_policies", 6 * HOUR, apply_retention)
+    scheduler.add("archive_visit_partitions", DAY, archive_partitions)
+    scheduler.add("train_edge_models", HOUR, train_edge_models)
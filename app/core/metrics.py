@@ -0,0 +1,73 @@
+# app/core/metrics.py
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+# =========================
+# In-process Metrics
+# =========================
+# Tiny registry of gauges and counters rendered in the Prometheus text
+# format at /metrics. Gauges are read through a callback when scraped, so
+# components only register how to read their current state.
+
+Labels = Tuple[Tuple[str, str], ...]
+GaugeValue = Optional[Union[float, Dict[Labels, float]]]
+
+_gauges: Dict[str, Tuple[str, Callable[[], GaugeValue]]] = {}
+_counters: Dict[str, "Counter"] = {}
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, **label_values: str):
+        key = labels(**label_values)
+        self.values[key] = self.values.get(key, 0.0) + amount
+
+    def get(self, **label_values: str) -> float:
+        return self.values.get(labels(**label_values), 0.0)
+
+
+def labels(**values: str) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in values.items()))
+
+
+def gauge(name: str, help_text: str, callback: Callable[[], GaugeValue]):
+    """Register a gauge read from callback() (a number, or {labels(...): number}; None to skip it)"""
+    _gauges[name] = (help_text, callback)
+
+
+def counter(name: str, help_text: str) -> Counter:
+    if name not in _counters:
+        _counters[name] = Counter(name, help_text)
+    return _counters[name]
+
+
+def _format(name: str, key: Labels, value: float) -> str:
+    if not key:
+        return f"{name} {value}"
+    rendered = ",".join(f'{k}="{v}"' for k, v in key)
+    return f"{name}{{{rendered}}} {value}"
+
+
+def render_prometheus() -> str:
+    lines: List[str] = []
+    for name, (help_text, callback) in sorted(_gauges.items()):
+        try:
+            value = callback()
+        except Exception:
+            continue
+        if value is None:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        if isinstance(value, dict):
+            lines.extend(_format(name, key, v) for key, v in value.items())
+        else:
+            lines.append(_format(name, (), value))
+    for name, metric in sorted(_counters.items()):
+        lines.append(f"# HELP {name} {metric.help}")
+        lines.append(f"# TYPE {name} counter")
+        lines.extend(_format(name, key, v) for key, v in metric.values.items())
+    return "\n".join(lines) + "\n"
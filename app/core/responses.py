@@ -0,0 +1,48 @@
+# app/core/responses.py
+from decimal import Decimal
+from typing import Any, Dict, Optional, Union
+import asyncpg
+import orjson
+from fastapi.responses import Response
+
+# =========================
+# Fast JSON Responses
+# =========================
+# Returning one of these from a route skips FastAPI's jsonable_encoder pass:
+# content is serialised once, straight to bytes, by orjson (which handles
+# datetimes natively). Lists built by Postgres with json_agg are spliced in
+# as-is and never parsed or materialised in Python.
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, asyncpg.Record):
+        return dict(obj)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+
+def splice_json(envelope: Dict[str, Any], key: str, raw_json: Union[str, bytes]) -> bytes:
+    """Serialise envelope with key set to an already-encoded JSON value (embedded, not re-parsed)"""
+    return dumps({**envelope, key: orjson.Fragment(raw_json)})
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True when an If-None-Match header already names etag (the client copy is current)"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
@@ -0,0 +1,179 @@
+# app/core/scheduler.py
+import asyncio
+import os
+import random
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+from app.core import metrics
+from app.db.init_db import get_pool
+
+# =========================
+# Maintenance Scheduler
+# =========================
+# Runs periodic jobs inside the API process, so no external cron is needed.
+# A worker runs a leader-only job after claiming it in scheduler_runs with
+# one statement: the claim succeeds only when the last run finished more
+# than an interval ago and no other worker holds an unexpired lease. The job
+# then runs with no connection or transaction held (it takes its own from
+# the pool), and the result is recorded in a second short statement. With
+# several workers or nodes the job still runs once per interval. The lease
+# is short and renewed by a heartbeat while the job runs, so a worker that
+# dies mid-run only blocks the job for one lease, whatever its interval.
+# The claim's start time identifies it: a worker that lost its lease can't
+# renew or finish the run another worker took over. Jobs that act on
+# process-local state (e.g. the in-memory cache) run on every worker.
+# Timers are jittered so workers don't line up.
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") == "1"
+SCHEDULER_JITTER = float(os.getenv("SCHEDULER_JITTER", "0.1"))  # +/- share of the interval
+SCHEDULER_LEASE_SECONDS = float(os.getenv("SCHEDULER_LEASE_SECONDS", "120"))  # renewed every third
+
+CLAIM_RUN = """
+    INSERT INTO scheduler_runs (job, last_started_at, lease_until)
+    VALUES ($1, clock_timestamp(), clock_timestamp() + make_interval(secs => $3))
+    ON CONFLICT (job) DO UPDATE SET
+        last_started_at = EXCLUDED.last_started_at,
+        lease_until = EXCLUDED.lease_until
+    WHERE (scheduler_runs.lease_until IS NULL OR scheduler_runs.lease_until < clock_timestamp())
+      AND (scheduler_runs.last_finished_at IS NULL
+           OR scheduler_runs.last_finished_at <= clock_timestamp() - make_interval(secs => $2))
+    RETURNING last_started_at
+"""
+
+RENEW_LEASE = """
+    UPDATE scheduler_runs SET lease_until = clock_timestamp() + make_interval(secs => $3)
+    WHERE job = $1 AND last_started_at = $2 AND lease_until IS NOT NULL
+    RETURNING job
+"""
+
+RELEASE_RUN = """
+    UPDATE scheduler_runs SET lease_until = NULL
+    WHERE job = $1 AND last_started_at = $2
+"""
+
+FINISH_RUN = """
+    UPDATE scheduler_runs SET
+        last_finished_at = clock_timestamp(),
+        last_duration_ms = $3::float8 * 1000,
+        last_error = $4,
+        lease_until = NULL
+    WHERE job = $1 AND last_started_at = $2
+"""
+
+runs = metrics.counter("scheduler_job_runs_total", "Scheduled job runs by job and result")
+run_seconds = metrics.counter("scheduler_job_duration_seconds_total", "Time spent running scheduled jobs")
+
+
+class Job:
+    def __init__(self, name: str, interval: float, func: Callable[[], Awaitable], leader_only: bool = True):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.leader_only = leader_only
+        self.last_duration: Optional[float] = None
+
+
+class Scheduler:
+    def __init__(self, jitter: float = SCHEDULER_JITTER, lease: float = SCHEDULER_LEASE_SECONDS):
+        self.jitter = jitter
+        self.lease = lease
+        self.jobs: Dict[str, Job] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def add(self, name: str, interval: float, func: Callable[[], Awaitable], leader_only: bool = True):
+        self.jobs[name] = Job(name, interval, func, leader_only)
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._loop(job)) for job in self.jobs.values()]
+        if self.jobs:
+            print(f"Scheduler started: {', '.join(self.jobs)}")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _jittered(self, seconds: float) -> float:
+        return seconds * (1 + random.uniform(-self.jitter, self.jitter))
+
+    async def _loop(self, job: Job):
+        # Spread the first runs so a restart doesn't fire every job at once
+        await asyncio.sleep(random.uniform(0, min(job.interval, 60)))
+        while True:
+            await self.run_once(job)
+            await asyncio.sleep(self._jittered(job.interval))
+
+    async def run_once(self, job: Job) -> str:
+        """Run a job now (subject to leadership), returns ok / error / skipped"""
+        try:
+            if job.leader_only:
+                result = await self._run_as_leader(job)
+            else:
+                result = await self._timed(job)
+        except Exception as e:
+            print(f"Scheduled job {job.name} failed: {e}")
+            result = "error"
+        runs.inc(job=job.name, result=result)
+        return result
+
+    async def _timed(self, job: Job) -> str:
+        started = time.perf_counter()
+        try:
+            await job.func()
+        finally:
+            job.last_duration = time.perf_counter() - started
+            run_seconds.inc(job.last_duration, job=job.name)
+        return "ok"
+
+    async def _renew_lease(self, job: Job, claimed_at):
+        """Heartbeat for a claimed run, every third of the lease"""
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                pool = await get_pool()
+                async with pool.acquire() as conn:
+                    renewed = await conn.fetchval(RENEW_LEASE, job.name, claimed_at, self.lease)
+            except Exception as e:
+                print(f"Scheduled job {job.name} lease renewal failed: {e}")
+                continue
+            if not renewed:
+                print(f"Scheduled job {job.name} lost its lease")
+                return
+
+    async def _run_as_leader(self, job: Job) -> str:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            claimed_at = await conn.fetchval(CLAIM_RUN, job.name, job.interval * (1 - self.jitter), self.lease)
+        if claimed_at is None:
+            return "skipped"
+
+        heartbeat = asyncio.get_running_loop().create_task(self._renew_lease(job, claimed_at))
+        error = None
+        try:
+            await self._timed(job)
+        except asyncio.CancelledError:
+            # Shutting down mid-run: let another worker pick the job up right away
+            heartbeat.cancel()
+            async with pool.acquire() as conn:
+                await conn.execute(RELEASE_RUN, job.name, claimed_at)
+            raise
+        except Exception as e:
+            error = str(e)
+        finally:
+            heartbeat.cancel()
+        async with pool.acquire() as conn:
+            await conn.execute(FINISH_RUN, job.name, claimed_at, job.last_duration, error)
+        if error:
+            print(f"Scheduled job {job.name} failed: {error}")
+            return "error"
+        return "ok"
+
+
+scheduler = Scheduler()
+
+metrics.gauge(
+    "scheduler_job_last_duration_seconds", "Duration of each job's last run in this process",
+    lambda: {metrics.labels(job=job.name): job.last_duration
+             for job in scheduler.jobs.values() if job.last_duration is not None}
+)
@@ -0,0 +1,147 @@
+# app/db/analytics.py
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+from app.core.cache import cache
+from .init_db import get_read_pool
+
+# =========================
+# Visit Analytics
+# =========================
+# Visit counts per hour / day / week (UTC), with the known / unknown split
+# and the median time from a visit arriving to the owner deciding it.
+# Buckets that have already closed only change when an older visit is
+# decided or deleted, so they're cached under the owner's "owner-history"
+# group in fixed chunks of CHUNK_BUCKETS buckets, aligned to CHUNK_ANCHOR.
+# A chunk's key doesn't depend on the requested range, so it stays cached as
+# the window moves on. Only the chunk holding the open bucket is queried on
+# every request; running totals are computed over the merged rows.
+BUCKET_SIZES = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+}
+DEFAULT_BUCKET_COUNT = {"hour": 48, "day": 30, "week": 12}
+MAX_BUCKETS = 1000
+ANALYTICS_CACHE_TTL_SECONDS = float(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", "3600"))
+CHUNK_BUCKETS = 24
+CHUNK_ANCHOR = datetime(2001, 1, 1, tzinfo=timezone.utc)  # a Monday, so week chunks start on one
+
+
+def bucket_floor(moment: datetime, bucket: str) -> datetime:
+    """Start of the UTC bucket containing moment (weeks start on Monday, like date_trunc)"""
+    moment = moment.astimezone(timezone.utc)
+    if bucket == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def bucket_ceil(moment: datetime, bucket: str) -> datetime:
+    floor = bucket_floor(moment, bucket)
+    return floor if floor == moment else floor + BUCKET_SIZES[bucket]
+
+
+def chunk_floor(moment: datetime, bucket: str) -> datetime:
+    """Start of the cache chunk containing moment"""
+    span = BUCKET_SIZES[bucket] * CHUNK_BUCKETS
+    return CHUNK_ANCHOR + (moment - CHUNK_ANCHOR) // span * span
+
+
+def in_cached_history(moment: datetime) -> bool:
+    """True when a visit at moment may be in a cached chunk (for any bucket size)"""
+    now = datetime.now(timezone.utc)
+    return any(moment < chunk_floor(now, bucket) for bucket in BUCKET_SIZES)
+
+
+def merge_buckets(parts: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Concatenate consecutive bucket rows, filling in the running total and change per bucket"""
+    buckets, previous = [], None
+    for part in parts:
+        for row in part:
+            row = dict(row)
+            row["cumulative_visits"] = (previous["cumulative_visits"] if previous else 0) + row["total_visits"]
+            row["change_from_previous"] = row["total_visits"] - previous["total_visits"] if previous else None
+            buckets.append(row)
+            previous = row
+    return buckets
+
+
+async def _query_buckets(owner_id: int, bucket: str, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+    """Every bucket in [start, end) including empty ones; start and end are bucket-aligned"""
+    if start >= end:
+        return []
+    pool = await get_read_pool(owner_id)
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            WITH buckets AS (
+                SELECT gs AT TIME ZONE 'UTC' as bucket_start
+                FROM generate_series(
+                    $3::timestamptz AT TIME ZONE 'UTC',
+                    ($4::timestamptz AT TIME ZONE 'UTC') - $5::interval,
+                    $5::interval
+                ) gs
+            ),
+            counts AS (
+                SELECT
+                    date_trunc($2, v.timestamp, 'UTC') as bucket_start,
+                    COUNT(*) as total_visits,
+                    COUNT(*) FILTER (WHERE v.visitor_id IS NOT NULL) as known_visits,
+                    COUNT(*) FILTER (WHERE v.visitor_id IS NULL) as unknown_visits,
+                    COUNT(*) FILTER (WHERE v.status = 'pending') as pending_visits,
+                    COUNT(*) FILTER (WHERE v.status = 'granted') as granted_visits,
+                    COUNT(*) FILTER (WHERE v.status = 'denied') as denied_visits,
+                    percentile_cont(0.5) WITHIN GROUP (
+                        ORDER BY EXTRACT(EPOCH FROM v.decided_at - v.timestamp)::float8
+                    ) FILTER (WHERE v.decided_at IS NOT NULL) as median_response_seconds
+                FROM visits v
+                WHERE v.owner_id = $1 AND v.timestamp >= $3 AND v.timestamp < $4
+                GROUP BY 1
+            )
+            SELECT
+                b.bucket_start,
+                COALESCE(c.total_visits, 0) as total_visits,
+                COALESCE(c.known_visits, 0) as known_visits,
+                COALESCE(c.unknown_visits, 0) as unknown_visits,
+                COALESCE(c.pending_visits, 0) as pending_visits,
+                COALESCE(c.granted_visits, 0) as granted_visits,
+                COALESCE(c.denied_visits, 0) as denied_visits,
+                c.median_response_seconds
+            FROM buckets b
+            LEFT JOIN counts c ON c.bucket_start = b.bucket_start
+            ORDER BY b.bucket_start
+            """,
+            owner_id, bucket, start, end, BUCKET_SIZES[bucket]
+        )
+    return [dict(row) for row in rows]
+
+
+async def _closed_chunk(owner_id: int, bucket: str, chunk_start: datetime) -> List[Dict[str, Any]]:
+    chunk_end = chunk_start + BUCKET_SIZES[bucket] * CHUNK_BUCKETS
+    return await cache.get_or_load(
+        "visit_analytics",
+        f"visit_analytics:{owner_id}:{bucket}:{chunk_start.isoformat()}",
+        [f"owner-history:{owner_id}"],
+        ANALYTICS_CACHE_TTL_SECONDS,
+        lambda: _query_buckets(owner_id, bucket, chunk_start, chunk_end)
+    )
+
+
+async def visit_analytics(owner_id: int, bucket: str, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+    """Bucketed visit analytics for [start, end), widened to whole buckets"""
+    start, end = bucket_floor(start, bucket), bucket_ceil(end, bucket)
+    open_chunk = chunk_floor(bucket_floor(datetime.now(timezone.utc), bucket), bucket)
+    live_start = max(start, min(end, open_chunk))
+
+    parts = []
+    chunk_start = chunk_floor(start, bucket)
+    while chunk_start < live_start:
+        rows = await _closed_chunk(owner_id, bucket, chunk_start)
+        parts.append([row for row in rows if start <= row["bucket_start"] < live_start])
+        chunk_start += BUCKET_SIZES[bucket] * CHUNK_BUCKETS
+    # The chunk holding the open bucket is always fresh
+    parts.append(await _query_buckets(owner_id, bucket, live_start, end))
+    return merge_buckets(parts)
@@ -0,0 +1,90 @@
+# app/db/bench_statements.py
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Awaitable, Callable, Dict, List, Tuple
+from app.db import crud, init_db
+
+# =========================
+# Statement Mode Benchmark
+# =========================
+# Times the read-only CRUD functions against the configured database once
+# per statement mode, e.g.
+#
+#   python -m app.db.bench_statements --owner-id 1 --visit-id 10
+#
+# "direct" only works against a direct Postgres URL, not through pgbouncer.
+
+
+def _cases(args) -> List[Tuple[str, Callable[[], Awaitable]]]:
+    cases = [
+        ("get_owner_by_id", lambda: crud.get_owner_by_id(args.owner_id)),
+        ("get_visits_by_owner", lambda: crud.get_visits_by_owner(args.owner_id)),
+        ("get_pending_visits_by_owner", lambda: crud.get_pending_visits_by_owner(args.owner_id)),
+        ("get_recent_activity", lambda: crud.get_recent_activity(args.owner_id)),
+        ("get_visit_statistics", lambda: crud.get_visit_statistics(args.owner_id)),
+        ("get_device_tokens_by_owner", lambda: crud.get_device_tokens_by_owner(args.owner_id)),
+    ]
+    if args.visit_id:
+        cases += [
+            ("get_visit_by_id", lambda: crud.get_visit_by_id(args.visit_id)),
+            ("get_visit_status", lambda: crud.get_visit_status(args.visit_id)),
+        ]
+    return cases
+
+
+async def _time_case(call: Callable[[], Awaitable], iterations: int, warmup: int) -> Dict[str, float]:
+    for _ in range(warmup):
+        await call()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await call()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {
+        "mean": statistics.fmean(samples),
+        "p50": statistics.median(samples),
+        "p95": statistics.quantiles(samples, n=20)[-1],
+    }
+
+
+async def run(args) -> Dict[str, Dict[str, Dict[str, float]]]:
+    results = {}
+    for mode in args.modes.split(","):
+        pool = await init_db.create_pool(mode)
+        # CRUD functions go through get_pool(), point it at this mode's pool
+        init_db.pool = pool
+        try:
+            results[mode] = {
+                name: await _time_case(call, args.iterations, args.warmup)
+                for name, call in _cases(args)
+            }
+        finally:
+            init_db.pool = None
+            await pool.close()
+    return results
+
+
+def _print(results: Dict[str, Dict[str, Dict[str, float]]]):
+    modes = list(results)
+    print(f"{'function':<30}" + "".join(f"{mode + ' p50/p95 ms':>26}" for mode in modes))
+    for name in results[modes[0]]:
+        row = "".join(
+            f"{results[mode][name]['p50']:>14.2f} / {results[mode][name]['p95']:>7.2f}  " for mode in modes
+        )
+        print(f"{name:<30}{row}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-query latency across statement modes")
+    parser.add_argument("--owner-id", type=int, required=True)
+    parser.add_argument("--visit-id", type=int)
+    parser.add_argument("--modes", default="pgbouncer,direct")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    _print(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+# app/db/bulk_visits.py
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from .init_db import get_pool, mark_write
+from . import partitions
+from app.core.cache import cache
+
+# =========================
+# Bulk Visit Ingestion
+# =========================
+# Backfills (devices coming back online, history imports) are validated in
+# Python, then loaded in one transaction: visitor names are resolved or
+# created in a single set-based statement, unknown owners / visitors are
+# reported per row, and the remaining rows are streamed in with COPY.
+VISIT_STATUSES = ("pending", "granted", "denied")
+COPY_COLUMNS = ["visitor_id", "owner_id", "image_url", "status", "detected_label", "timestamp"]
+
+RowError = Dict[str, Any]
+
+
+class _Row:
+    __slots__ = ("index", "visitor_id", "owner_id", "image_url", "status", "detected_label", "timestamp", "visitor_name")
+
+    def __init__(self, index, visitor_id, owner_id, image_url, status, detected_label, timestamp, visitor_name):
+        self.index = index
+        self.visitor_id = visitor_id
+        self.owner_id = owner_id
+        self.image_url = image_url
+        self.status = status
+        self.detected_label = detected_label
+        self.timestamp = timestamp
+        self.visitor_name = visitor_name
+
+    def record(self) -> tuple:
+        return (self.visitor_id, self.owner_id, self.image_url, self.status, self.detected_label, self.timestamp)
+
+
+def _optional_int(item: Dict[str, Any], key: str) -> Optional[int]:
+    value = item.get(key)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"{key} must be an integer")
+    return value
+
+
+def _optional_str(item: Dict[str, Any], key: str) -> Optional[str]:
+    value = item.get(key)
+    if value is not None and not isinstance(value, str):
+        raise ValueError(f"{key} must be a string")
+    return value or None
+
+
+def _timestamp(value: Any, received_at: datetime) -> datetime:
+    if value is None:
+        return received_at
+    if not isinstance(value, str):
+        raise ValueError("timestamp must be an ISO 8601 string")
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def validate_row(index: int, item: Any, received_at: datetime) -> _Row:
+    """Check one decoded row, raises ValueError with a message for the caller"""
+    if not isinstance(item, dict):
+        raise ValueError("row must be a JSON object")
+    owner_id = _optional_int(item, "owner_id")
+    if owner_id is None:
+        raise ValueError("owner_id is required")
+    image_url = _optional_str(item, "image_url")
+    if not image_url:
+        raise ValueError("image_url is required")
+    status = item.get("status") or "pending"
+    if status not in VISIT_STATUSES:
+        raise ValueError(f"status must be one of {', '.join(VISIT_STATUSES)}")
+    return _Row(
+        index=index,
+        visitor_id=_optional_int(item, "visitor_id"),
+        owner_id=owner_id,
+        image_url=image_url,
+        status=status,
+        detected_label=_optional_str(item, "detected_label"),
+        timestamp=_timestamp(item.get("timestamp"), received_at),
+        visitor_name=_optional_str(item, "visitor_name"),
+    )
+
+
+def prepare_rows(items: Iterable[Tuple[int, Any]]) -> Tuple[List[_Row], List[RowError]]:
+    """Validate (index, decoded item) pairs; items that failed to decode are passed as exceptions"""
+    received_at = datetime.now(timezone.utc)
+    rows, errors = [], []
+    for index, item in items:
+        if isinstance(item, Exception):
+            errors.append({"row": index, "error": str(item)})
+            continue
+        try:
+            rows.append(validate_row(index, item, received_at))
+        except ValueError as e:
+            errors.append({"row": index, "error": str(e)})
+    return rows, errors
+
+
+async def _resolve_visitor_names(conn, names: List[str]) -> Dict[str, int]:
+    """Map each name to its oldest visitor, creating visitors for unknown names, in one statement"""
+    rows = await conn.fetch(
+        """
+        WITH wanted AS (
+            SELECT DISTINCT unnest($1::text[]) AS name
+        ),
+        existing AS (
+            SELECT DISTINCT ON (v.name) v.id, v.name
+            FROM visitors v JOIN wanted w ON v.name = w.name
+            ORDER BY v.name, v.id
+        ),
+        created AS (
+            INSERT INTO visitors (name)
+            SELECT w.name FROM wanted w
+            WHERE NOT EXISTS (SELECT 1 FROM existing e WHERE e.name = w.name)
+            RETURNING id, name
+        )
+        SELECT id, name FROM existing
+        UNION ALL
+        SELECT id, name FROM created
+        """,
+        names
+    )
+    return {row["name"]: row["id"] for row in rows}
+
+
+async def ingest_visits(rows: List[_Row]) -> Tuple[int, List[RowError]]:
+    """Load validated rows in one transaction, returns (inserted, per-row errors)"""
+    errors: List[RowError] = []
+    if not rows:
+        return 0, errors
+
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            # Rows referencing owners or visitors that don't exist would abort
+            # the COPY, so drop them up front (and hold the owners meanwhile)
+            owner_ids = list({row.owner_id for row in rows})
+            known_owners = {
+                r["id"] for r in await conn.fetch(
+                    "SELECT id FROM owners WHERE id = ANY($1::int[]) FOR KEY SHARE", owner_ids
+                )
+            }
+            visitor_ids = list({row.visitor_id for row in rows if row.visitor_id is not None})
+            known_visitors = set()
+            if visitor_ids:
+                known_visitors = {
+                    r["id"] for r in await conn.fetch(
+                        "SELECT id FROM visitors WHERE id = ANY($1::int[]) FOR KEY SHARE", visitor_ids
+                    )
+                }
+
+            accepted = []
+            for row in rows:
+                if row.owner_id not in known_owners:
+                    errors.append({"row": row.index, "error": f"owner {row.owner_id} not found"})
+                elif row.visitor_id is not None and row.visitor_id not in known_visitors:
+                    errors.append({"row": row.index, "error": f"visitor {row.visitor_id} not found"})
+                else:
+                    accepted.append(row)
+
+            names = list({row.visitor_name for row in accepted if row.visitor_id is None and row.visitor_name})
+            if names:
+                visitor_by_name = await _resolve_visitor_names(conn, names)
+                for row in accepted:
+                    if row.visitor_id is None and row.visitor_name:
+                        row.visitor_id = visitor_by_name[row.visitor_name]
+
+            if accepted:
+                await partitions.ensure_partitions_for(conn, (row.timestamp for row in accepted))
+                await conn.copy_records_to_table(
+                    "visits",
+                    records=(row.record() for row in accepted),
+                    columns=COPY_COLUMNS
+                )
+
+    for owner_id in {row.owner_id for row in accepted}:
+        mark_write(owner_id)
+        await cache.invalidate(f"owner-visits:{owner_id}", f"owner-history:{owner_id}")
+    if names:
+        await cache.invalidate("visitors")
+    errors.sort(key=lambda e: e["row"])
+    return len(accepted), errors
@@ -1,9 +1,14 @@
 # app/db/crud.py
-from .init_db import get_pool
-from datetime import datetime
+from .init_db import get_pool, get_read_pool, mark_write
+from .pagination import encode_cursor, decode_cursor, DEFAULT_PAGE_SIZE
+from . import visit_batcher
+from .analytics import in_cached_history
+from app.core.cache import cache
+from datetime import datetime, date
+import asyncio
 import hashlib
 import secrets
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 
 # =========================
 # Utility Functions
@@ -25,19 +30,16 @@ def verify_password(password: str, hashed_password: str) -> bool:
 # Owners CRUD
 # =========================
 async def create_owner(name: str, email: str, password: str) -> Optional[Dict[str, Any]]:
-    """Create a new owner"""
+    """Create a new owner, returns None when the email is already registered"""
+    # PBKDF2 takes tens of milliseconds, keep it off the event loop
+    password_hash = await asyncio.get_running_loop().run_in_executor(None, hash_password, password)
     pool = await get_pool()
     async with pool.acquire() as conn:
-        # Check if email already exists
-        existing = await conn.fetchrow("SELECT id FROM owners WHERE email = $1", email)
-        if existing:
-            return None  # Email already exists
-        
-        password_hash = hash_password(password)
         row = await conn.fetchrow(
             """
             INSERT INTO owners (name, email, password_hash)
             VALUES ($1, $2, $3)
+            ON CONFLICT (email) DO NOTHING
             RETURNING id, name, email, created_at
             """,
             name, email, password_hash
@@ -69,20 +71,20 @@ async def authenticate_owner(email: str, password: str) -> Optional[Dict[str, An
         row = await conn.fetchrow(
             "SELECT * FROM owners WHERE email = $1", email
         )
-        if row and verify_password(password, row['password_hash']):
-            return {
-                'id': row['id'],
-                'name': row['name'],
-                'email': row['email'],
-                'created_at': row['created_at']
-            }
-        return None
+    if row and await asyncio.get_running_loop().run_in_executor(None, verify_password, password, row['password_hash']):
+        return {
+            'id': row['id'],
+            'name': row['name'],
+            'email': row['email'],
+            'created_at': row['created_at']
+        }
+    return None
 
 async def update_owner_password(owner_id: int, new_password: str) -> bool:
     """Update owner password"""
+    password_hash = await asyncio.get_running_loop().run_in_executor(None, hash_password, new_password)
     pool = await get_pool()
     async with pool.acquire() as conn:
-        password_hash = hash_password(new_password)
         result = await conn.execute(
             "UPDATE owners SET password_hash = $1 WHERE id = $2",
             password_hash, owner_id
@@ -104,8 +106,11 @@ async def create_visitor(name: Optional[str] = None, profile_image_url: Optional
             """,
             name, profile_image_url
         )
+        mark_write()
+        await cache.invalidate("visitors")
         return dict(row)
 
+@cache.cached("visitor", groups=lambda visitor_id: ["visitors"])
 async def get_visitor_by_id(visitor_id: int) -> Optional[Dict[str, Any]]:
     """Get visitor by ID"""
     pool = await get_pool()
@@ -115,89 +120,200 @@ async def get_visitor_by_id(visitor_id: int) -> Optional[Dict[str, Any]]:
         )
         return dict(row) if row else None
 
+async def get_visitor_by_name(name: str) -> Optional[Dict[str, Any]]:
+    """Get the first visitor with the given name"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            "SELECT * FROM visitors WHERE name = $1 ORDER BY id LIMIT 1", name
+        )
+        return dict(row) if row else None
+
+@cache.cached("visitors", groups=lambda: ["visitors"])
 async def get_all_visitors() -> List[Dict[str, Any]]:
     """Get all visitors"""
-    pool = await get_pool()
+    pool = await get_read_pool()
     async with pool.acquire() as conn:
         rows = await conn.fetch("SELECT * FROM visitors ORDER BY created_at DESC")
         return [dict(row) for row in rows]
 
 async def update_visitor(visitor_id: int, name: Optional[str] = None, profile_image_url: Optional[str] = None) -> Optional[Dict[str, Any]]:
-    """Update visitor information"""
+    """Update visitor information (None leaves a field unchanged), returns None if the visitor doesn't exist"""
     pool = await get_pool()
     async with pool.acquire() as conn:
-        # Build dynamic update query
-        updates = []
-        params = []
-        param_count = 1
-        
-        if name is not None:
-            updates.append(f"name = ${param_count}")
-            params.append(name)
-            param_count += 1
-        
-        if profile_image_url is not None:
-            updates.append(f"profile_image_url = ${param_count}")
-            params.append(profile_image_url)
-            param_count += 1
-        
-        if not updates:
-            return await get_visitor_by_id(visitor_id)
-        
-        params.append(visitor_id)
-        query = f"UPDATE visitors SET {', '.join(updates)} WHERE id = ${param_count} RETURNING *"
-        
-        row = await conn.fetchrow(query, *params)
+        row = await conn.fetchrow(
+            """
+            UPDATE visitors
+            SET name = COALESCE($2, name),
+                profile_image_url = COALESCE($3, profile_image_url)
+            WHERE id = $1
+            RETURNING *
+            """,
+            visitor_id, name, profile_image_url
+        )
+        if row:
+            mark_write()
+            # Visit reads embed the visitor's name and picture
+            await cache.invalidate("visitors")
         return dict(row) if row else None
 
 # =========================
 # Visits CRUD
 # =========================
-async def get_all_visits() -> List[Dict[str, Any]]:
-    """Get all visits with visitor and owner details"""
-    pool = await get_pool()
+async def _fetch_visit_page(
+    base_query: str,
+    conditions: List[str],
+    params: List[Any],
+    limit: int,
+    cursor: Optional[str],
+    owner_id: Optional[int] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Run a visit listing newest-first with keyset pagination on (timestamp, id)"""
+    if cursor:
+        last_timestamp, last_id = decode_cursor(cursor)
+        params = params + [last_timestamp, last_id]
+        conditions = conditions + [f"(v.timestamp, v.id) < (${len(params) - 1}, ${len(params)})"]
+    params = params + [limit + 1]
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f"{base_query} {where} ORDER BY v.timestamp DESC, v.id DESC LIMIT ${len(params)}"
+
+    pool = await get_read_pool(owner_id)
     async with pool.acquire() as conn:
-        rows = await conn.fetch(
-            """
-            SELECT v.*, vis.name as visitor_name, vis.profile_image_url, o.name as owner_name, o.email as owner_email
-            FROM visits v
-            LEFT JOIN visitors vis ON v.visitor_id = vis.id
-            LEFT JOIN owners o ON v.owner_id = o.id
-            ORDER BY v.timestamp DESC
-            """
+        rows = await conn.fetch(query, *params)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["timestamp"], rows[-1]["id"])
+    return [dict(row) for row in rows], next_cursor
+
+async def _fetch_visit_page_json(
+    base_query: str,
+    conditions: List[str],
+    params: List[Any],
+    limit: int,
+    cursor: Optional[str],
+    owner_id: Optional[int] = None
+) -> Tuple[str, int, Optional[str]]:
+    """Same page as _fetch_visit_page, serialised by Postgres (json_agg) into one JSON text
+
+    Returns (json_array_text, row_count, next_cursor) without building a dict per row.
+    """
+    if cursor:
+        last_timestamp, last_id = decode_cursor(cursor)
+        params = params + [last_timestamp, last_id]
+        conditions = conditions + [f"(v.timestamp, v.id) < (${len(params) - 1}, ${len(params)})"]
+    params = params + [limit + 1, limit]
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f"""
+        WITH fetched AS (
+            {base_query} {where}
+            ORDER BY v.timestamp DESC, v.id DESC
+            LIMIT ${len(params) - 1}
+        ),
+        page AS (
+            SELECT * FROM fetched ORDER BY timestamp DESC, id DESC LIMIT ${len(params)}
         )
-        return [dict(row) for row in rows]
+        SELECT
+            COALESCE(json_agg(page ORDER BY page.timestamp DESC, page.id DESC), '[]')::text as items,
+            COUNT(*) as row_count,
+            (SELECT COUNT(*) FROM fetched) > ${len(params)} as has_more,
+            (array_agg(page.timestamp ORDER BY page.timestamp, page.id))[1] as last_timestamp,
+            (array_agg(page.id ORDER BY page.timestamp, page.id))[1] as last_id
+        FROM page
+    """
 
-async def get_visits_by_owner(owner_id: int) -> List[Dict[str, Any]]:
-    """Get visits for a specific owner with visitor details"""
-    pool = await get_pool()
+    pool = await get_read_pool(owner_id)
     async with pool.acquire() as conn:
-        rows = await conn.fetch(
-            """
-            SELECT v.*, vis.name as visitor_name, vis.profile_image_url
-            FROM visits v
-            LEFT JOIN visitors vis ON v.visitor_id = vis.id
-            WHERE v.owner_id = $1
-            ORDER BY v.timestamp DESC
-            """,
-            owner_id
-        )
-        return [dict(row) for row in rows]
+        row = await conn.fetchrow(query, *params)
+
+    next_cursor = encode_cursor(row["last_timestamp"], row["last_id"]) if row["has_more"] else None
+    return row["items"], row["row_count"], next_cursor
+
+async def get_all_visits(
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Get a page of all visits with visitor and owner details, plus the next cursor"""
+    conditions, params = [], []
+    if status:
+        params.append(status)
+        conditions.append(f"v.status = ${len(params)}")
+    return await _fetch_visit_page(
+        """
+        SELECT v.*, vis.name as visitor_name, vis.profile_image_url, o.name as owner_name, o.email as owner_email
+        FROM visits v
+        LEFT JOIN visitors vis ON v.visitor_id = vis.id
+        LEFT JOIN owners o ON v.owner_id = o.id
+        """,
+        conditions, params, limit, cursor
+    )
+
+async def get_visits_by_owner(
+    owner_id: int,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Get a page of visits for a specific owner with visitor details, plus the next cursor"""
+    conditions, params = ["v.owner_id = $1"], [owner_id]
+    if status:
+        params.append(status)
+        conditions.append(f"v.status = ${len(params)}")
+    return await _fetch_visit_page(
+        """
+        SELECT v.*, vis.name as visitor_name, vis.profile_image_url
+        FROM visits v
+        LEFT JOIN visitors vis ON v.visitor_id = vis.id
+        """,
+        conditions, params, limit, cursor, owner_id
+    )
+
+async def get_visits_by_owner_json(
+    owner_id: int,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None
+) -> Tuple[str, int, Optional[str]]:
+    """Like get_visits_by_owner, but the page comes back as JSON text built by Postgres"""
+    conditions, params = ["v.owner_id = $1"], [owner_id]
+    if status:
+        params.append(status)
+        conditions.append(f"v.status = ${len(params)}")
+    return await _fetch_visit_page_json(
+        """
+        SELECT v.*, vis.name as visitor_name, vis.profile_image_url
+        FROM visits v
+        LEFT JOIN visitors vis ON v.visitor_id = vis.id
+        """,
+        conditions, params, limit, cursor, owner_id
+    )
 
 async def create_visit(visitor_id: Optional[int], owner_id: int, image_url: str, 
                       status: str = "pending", detected_label: Optional[str] = None) -> Dict[str, Any]:
-    """Create a new visit"""
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            """
-            INSERT INTO visits (visitor_id, owner_id, image_url, status, detected_label)
-            VALUES ($1, $2, $3, $4, $5)
-            RETURNING *
-            """,
-            visitor_id, owner_id, image_url, status, detected_label
-        )
-        return dict(row)
+    """Create a new visit (grouped with concurrent inserts when the visit batcher is running)"""
+    mark_write(owner_id)
+    visit = None
+    if visit_batcher.accepting():
+        try:
+            visit = await visit_batcher.submit((visitor_id, owner_id, image_url, status, detected_label))
+        except visit_batcher.BatcherStopped:
+            pass  # shutting down, write it directly
+    if visit is None:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            row = await conn.fetchrow(
+                """
+                INSERT INTO visits (visitor_id, owner_id, image_url, status, detected_label)
+                VALUES ($1, $2, $3, $4, $5)
+                RETURNING *
+                """,
+                visitor_id, owner_id, image_url, status, detected_label
+            )
+            visit = dict(row)
+    await cache.invalidate(f"owner-visits:{owner_id}")
+    return visit
 
 async def update_visit_status(visit_id: int, status: str) -> Optional[Dict[str, Any]]:
     """Update visit status (pending/granted/denied)"""
@@ -207,8 +323,16 @@ async def update_visit_status(visit_id: int, status: str) -> Optional[Dict[str,
             "UPDATE visits SET status = $1 WHERE id = $2 RETURNING *",
             status, visit_id
         )
+        if row:
+            mark_write(row["owner_id"])
+            groups = [f"visit:{visit_id}", f"owner-visits:{row['owner_id']}"]
+            if in_cached_history(row["timestamp"]):
+                # Deciding a recent visit leaves the cached analytics chunks untouched
+                groups.append(f"owner-history:{row['owner_id']}")
+            await cache.invalidate(*groups)
         return dict(row) if row else None
 
+@cache.cached("visit", groups=lambda visit_id: [f"visit:{visit_id}", "visitors"])
 async def get_visit_by_id(visit_id: int) -> Optional[Dict[str, Any]]:
     """Get visit by ID with visitor and owner details"""
     pool = await get_pool()
@@ -225,22 +349,110 @@ async def get_visit_by_id(visit_id: int) -> Optional[Dict[str, Any]]:
         )
         return dict(row) if row else None
 
-async def get_pending_visits_by_owner(owner_id: int) -> List[Dict[str, Any]]:
-    """Get pending visits for a specific owner"""
+async def get_visit_status(visit_id: int) -> Optional[str]:
+    """Get only the status of a visit (no joins, for device polling)"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        return await conn.fetchval(
+            "SELECT status FROM visits WHERE id = $1", visit_id
+        )
+
+async def get_pending_visits_by_owner(
+    owner_id: int,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Get a page of pending visits for a specific owner, plus the next cursor"""
+    return await get_visits_by_owner(owner_id, limit=limit, cursor=cursor, status="pending")
+
+async def get_retention_policy(owner_id: int) -> Optional[int]:
+    """Get an owner's visit retention in days (None keeps visits until they are archived)"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        return await conn.fetchval(
+            "SELECT retention_days FROM owner_retention_policies WHERE owner_id = $1", owner_id
+        )
+
+async def set_retention_policy(owner_id: int, retention_days: Optional[int]) -> Optional[int]:
+    """Set or clear (None) an owner's visit retention in days"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        if retention_days is None:
+            await conn.execute("DELETE FROM owner_retention_policies WHERE owner_id = $1", owner_id)
+            return None
+        return await conn.fetchval(
+            """
+            INSERT INTO owner_retention_policies (owner_id, retention_days)
+            VALUES ($1, $2)
+            ON CONFLICT (owner_id) DO UPDATE
+            SET retention_days = EXCLUDED.retention_days, updated_at = CURRENT_TIMESTAMP
+            RETURNING retention_days
+            """,
+            owner_id, retention_days
+        )
+
+# =========================
+# Edge Recognition CRUD
+# =========================
+async def get_edge_visitors(owner_id: int) -> List[Dict[str, Any]]:
+    """Visitors an owner has enrolled for on-device recognition, with their model status"""
     pool = await get_pool()
     async with pool.acquire() as conn:
         rows = await conn.fetch(
             """
-            SELECT v.*, vis.name as visitor_name, vis.profile_image_url
-            FROM visits v
-            LEFT JOIN visitors vis ON v.visitor_id = vis.id
-            WHERE v.owner_id = $1 AND v.status = 'pending'
-            ORDER BY v.timestamp DESC
+            SELECT e.visitor_id, v.name, e.auto_unlock, e.created_at,
+                   m.trained_at as model_trained_at, m.sample_count as model_samples
+            FROM owner_edge_visitors e
+            JOIN visitors v ON v.id = e.visitor_id
+            LEFT JOIN visitor_face_models m ON m.visitor_id = e.visitor_id
+            WHERE e.owner_id = $1
+            ORDER BY e.visitor_id
             """,
             owner_id
         )
         return [dict(row) for row in rows]
 
+async def get_edge_visitor(owner_id: int, visitor_id: int) -> Optional[Dict[str, Any]]:
+    """One enrolment (with the visitor's name), or None when the visitor isn't enrolled"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            """
+            SELECT e.visitor_id, v.name, e.auto_unlock
+            FROM owner_edge_visitors e
+            JOIN visitors v ON v.id = e.visitor_id
+            WHERE e.owner_id = $1 AND e.visitor_id = $2
+            """,
+            owner_id, visitor_id
+        )
+        return dict(row) if row else None
+
+async def enroll_edge_visitor(owner_id: int, visitor_id: int, auto_unlock: bool = False) -> Dict[str, Any]:
+    """Enrol a visitor for an owner's on-device recognition, or change auto_unlock"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            """
+            INSERT INTO owner_edge_visitors (owner_id, visitor_id, auto_unlock)
+            VALUES ($1, $2, $3)
+            ON CONFLICT (owner_id, visitor_id) DO UPDATE
+            SET auto_unlock = EXCLUDED.auto_unlock, updated_at = CURRENT_TIMESTAMP
+            RETURNING *
+            """,
+            owner_id, visitor_id, auto_unlock
+        )
+        return dict(row)
+
+async def unenroll_edge_visitor(owner_id: int, visitor_id: int) -> bool:
+    """Remove a visitor from an owner's on-device recognition"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        result = await conn.execute(
+            "DELETE FROM owner_edge_visitors WHERE owner_id = $1 AND visitor_id = $2",
+            owner_id, visitor_id
+        )
+        return result == "DELETE 1"
+
 # =========================
 # Device Tokens CRUD
 # =========================
@@ -254,38 +466,27 @@ async def register_device_token(
     """Register or update device token for push notifications"""
     pool = await get_pool()
     async with pool.acquire() as conn:
-        # Check if token already exists for this owner
-        existing = await conn.fetchrow(
-            "SELECT id FROM device_tokens WHERE owner_id = $1 AND expo_push_token = $2",
-            owner_id, expo_push_token
+        # uq_device_tokens_owner_token makes this a single atomic upsert
+        row = await conn.fetchrow(
+            """
+            INSERT INTO device_tokens (owner_id, expo_push_token, platform, device_name, app_version)
+            VALUES ($1, $2, $3, $4, $5)
+            ON CONFLICT (owner_id, expo_push_token) DO UPDATE
+            SET platform = EXCLUDED.platform,
+                device_name = EXCLUDED.device_name,
+                app_version = EXCLUDED.app_version,
+                is_active = TRUE,
+                updated_at = CURRENT_TIMESTAMP
+            RETURNING *
+            """,
+            owner_id, expo_push_token, platform, device_name, app_version
         )
-        
-        if existing:
-            # Update existing token
-            row = await conn.fetchrow(
-                """
-                UPDATE device_tokens 
-                SET platform = $1, device_name = $2, app_version = $3, 
-                    is_active = TRUE, updated_at = CURRENT_TIMESTAMP
-                WHERE id = $4 
-                RETURNING *
-                """,
-                platform, device_name, app_version, existing['id']
-            )
-        else:
-            # Create new token
-            row = await conn.fetchrow(
-                """
-                INSERT INTO device_tokens (owner_id, expo_push_token, platform, device_name, app_version)
-                VALUES ($1, $2, $3, $4, $5)
-                RETURNING *
-                """,
-                owner_id, expo_push_token, platform, device_name, app_version
-            )
+        mark_write(owner_id)
         return dict(row)
 
 async def unregister_device_token(owner_id: int, expo_push_token: str) -> bool:
     """Remove device token"""
+    mark_write(owner_id)
     pool = await get_pool()
     async with pool.acquire() as conn:
         result = await conn.execute(
@@ -296,7 +497,7 @@ async def unregister_device_token(owner_id: int, expo_push_token: str) -> bool:
 
 async def get_device_tokens_by_owner(owner_id: int) -> List[Dict[str, Any]]:
     """Get all device tokens for an owner"""
-    pool = await get_pool()
+    pool = await get_read_pool(owner_id)
     async with pool.acquire() as conn:
         rows = await conn.fetch(
             """
@@ -325,6 +526,7 @@ async def remove_invalid_tokens(invalid_tokens: List[str]) -> int:
 # Additional helper function for better token management
 async def deactivate_device_token(owner_id: int, expo_push_token: str) -> bool:
     """Mark device token as inactive instead of deleting (for better tracking)"""
+    mark_write(owner_id)
     pool = await get_pool()
     async with pool.acquire() as conn:
         result = await conn.execute(
@@ -340,7 +542,7 @@ async def deactivate_device_token(owner_id: int, expo_push_token: str) -> bool:
 # Helper function to get active token count for an owner
 async def get_active_device_count(owner_id: int) -> int:
     """Get count of active devices for an owner"""
-    pool = await get_pool()
+    pool = await get_read_pool(owner_id)
     async with pool.acquire() as conn:
         count = await conn.fetchval(
             "SELECT COUNT(*) FROM device_tokens WHERE owner_id = $1 AND is_active = TRUE",
@@ -357,7 +559,7 @@ async def cleanup_inactive_tokens(days_old: int = 30) -> int:
             """
             DELETE FROM device_tokens 
             WHERE is_active = FALSE 
-            AND updated_at < CURRENT_TIMESTAMP - INTERVAL '%s days'
+            AND updated_at < CURRENT_TIMESTAMP - make_interval(days => $1)
             """,
             days_old
         )
@@ -367,27 +569,79 @@ async def cleanup_inactive_tokens(days_old: int = 30) -> int:
 # Analytics and Statistics
 # =========================
 async def get_visit_statistics(owner_id: int) -> Dict[str, Any]:
-    """Get visit statistics for an owner"""
-    pool = await get_pool()
+    """Get visit statistics for an owner (from the per-day rollup, O(days) rows)"""
+    pool = await get_read_pool(owner_id)
     async with pool.acquire() as conn:
         stats = await conn.fetchrow(
             """
             SELECT 
-                COUNT(*) as total_visits,
-                COUNT(CASE WHEN status = 'pending' THEN 1 END) as pending_visits,
-                COUNT(CASE WHEN status = 'granted' THEN 1 END) as granted_visits,
-                COUNT(CASE WHEN status = 'denied' THEN 1 END) as denied_visits,
-                COUNT(CASE WHEN DATE(timestamp) = CURRENT_DATE THEN 1 END) as today_visits
-            FROM visits
+                COALESCE(SUM(total_visits), 0) as total_visits,
+                COALESCE(SUM(pending_visits), 0) as pending_visits,
+                COALESCE(SUM(granted_visits), 0) as granted_visits,
+                COALESCE(SUM(denied_visits), 0) as denied_visits,
+                COALESCE(SUM(total_visits) FILTER (
+                    WHERE day = (CURRENT_TIMESTAMP AT TIME ZONE 'UTC')::date
+                ), 0) as today_visits
+            FROM visit_daily_stats
             WHERE owner_id = $1
             """,
             owner_id
         )
         return dict(stats) if stats else {}
 
+async def compact_visit_daily_stats() -> int:
+    """Drop rollup rows that retention deletes brought back to all zeros"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        result = await conn.execute(
+            """
+            DELETE FROM visit_daily_stats
+            WHERE total_visits = 0 AND pending_visits = 0
+              AND granted_visits = 0 AND denied_visits = 0
+            """
+        )
+        return int(result.split()[-1]) if result.startswith("DELETE") else 0
+
+async def get_active_owner_ids(since_hours: int = 24, limit: int = 200) -> List[int]:
+    """Owners with visits in the last since_hours hours, busiest first"""
+    pool = await get_read_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            SELECT owner_id FROM visits
+            WHERE timestamp > CURRENT_TIMESTAMP - make_interval(hours => $1)
+            GROUP BY owner_id
+            ORDER BY COUNT(*) DESC
+            LIMIT $2
+            """,
+            since_hours, limit
+        )
+        return [row["owner_id"] for row in rows]
+
+async def get_daily_visit_statistics(owner_id: int, start: date, end: date) -> List[Dict[str, Any]]:
+    """Get per-day visit counts for an owner between two UTC dates (inclusive, zero-filled)"""
+    pool = await get_read_pool(owner_id)
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            SELECT 
+                d::date as day,
+                COALESCE(s.total_visits, 0) as total_visits,
+                COALESCE(s.pending_visits, 0) as pending_visits,
+                COALESCE(s.granted_visits, 0) as granted_visits,
+                COALESCE(s.denied_visits, 0) as denied_visits
+            FROM generate_series($2::date, $3::date, INTERVAL '1 day') d
+            LEFT JOIN visit_daily_stats s ON s.owner_id = $1 AND s.day = d::date
+            ORDER BY day
+            """,
+            owner_id, start, end
+        )
+        return [dict(row) for row in rows]
+
+@cache.cached("recent_activity", groups=lambda owner_id, limit=10: [f"owner-visits:{owner_id}", "visitors"])
 async def get_recent_activity(owner_id: int, limit: int = 10) -> List[Dict[str, Any]]:
     """Get recent visit activity for an owner"""
-    pool = await get_pool()
+    pool = await get_read_pool(owner_id)
     async with pool.acquire() as conn:
         rows = await conn.fetch(
             """
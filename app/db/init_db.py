@@ -1,24 +1,250 @@
+import asyncio
+import json
 import os
+import time
+from urllib.parse import urlparse
 import asyncpg
 from dotenv import load_dotenv
+from app.core import metrics
 
 load_dotenv()
 DATABASE_URL = os.getenv("SUPABASE_DB_URL")
 
-pool: asyncpg.pool.Pool = None
+# Pool sizing and connection recycling
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_MAX_IDLE_SECONDS = float(os.getenv("DB_POOL_MAX_IDLE_SECONDS", "300"))
+DB_POOL_MAX_LIFETIME_SECONDS = float(os.getenv("DB_POOL_MAX_LIFETIME_SECONDS", "1800"))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "10"))
+
+# Prepared statement strategy:
+#   direct     asyncpg statement cache on (connecting straight to Postgres)
+#   pgbouncer  cache off; named prepared statements break under transaction pooling
+#   auto       pgbouncer for pooler URLs (port 6543 or a "pooler" host), direct otherwise
+DB_STATEMENT_MODE = os.getenv("DB_STATEMENT_MODE", "auto")
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+STATEMENT_MODES = ("direct", "pgbouncer")
+PGBOUNCER_PORTS = {6432, 6543}
+
+# Optional read replica. Read-only CRUD goes there unless the replica lags
+# more than DB_REPLICA_MAX_LAG_SECONDS, or the owner being read wrote within
+# the last DB_READ_YOUR_WRITES_SECONDS (tracked per process).
+DATABASE_REPLICA_URL = os.getenv("SUPABASE_DB_REPLICA_URL")
+DB_REPLICA_POOL_MAX_SIZE = int(os.getenv("DB_REPLICA_POOL_MAX_SIZE", str(DB_POOL_MAX_SIZE)))
+DB_REPLICA_MAX_LAG_SECONDS = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", "5"))
+DB_REPLICA_LAG_CHECK_SECONDS = float(os.getenv("DB_REPLICA_LAG_CHECK_SECONDS", "2"))
+DB_READ_YOUR_WRITES_SECONDS = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "5"))
+
+
+def resolve_statement_mode(dsn: str, mode: str = DB_STATEMENT_MODE) -> str:
+    if mode in STATEMENT_MODES:
+        return mode
+    if mode != "auto":
+        raise ValueError(f"DB_STATEMENT_MODE must be one of auto, {', '.join(STATEMENT_MODES)}")
+    if not dsn:
+        return "pgbouncer"
+    parsed = urlparse(dsn)
+    if parsed.port in PGBOUNCER_PORTS or "pooler" in (parsed.hostname or ""):
+        return "pgbouncer"
+    return "direct"
+
+
+def statement_cache_options(mode: str) -> dict:
+    if mode == "direct":
+        return {"statement_cache_size": DB_STATEMENT_CACHE_SIZE}
+    return {"statement_cache_size": 0}
+
+
+class InstrumentedPool:
+    """asyncpg pool wrapper that counts requests waiting for a connection"""
+
+    def __init__(self, pool: asyncpg.pool.Pool):
+        self._pool = pool
+        self.waiting = 0
+
+    def acquire(self, *, timeout: float = DB_POOL_ACQUIRE_TIMEOUT):
+        return _Acquire(self, timeout)
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+
+class _Acquire:
+    def __init__(self, pool: InstrumentedPool, timeout: float):
+        self.pool = pool
+        self.timeout = timeout
+        self.conn = None
+
+    async def __aenter__(self):
+        started = time.perf_counter()
+        self.pool.waiting += 1
+        try:
+            self.conn = await self.pool._pool.acquire(timeout=self.timeout)
+        except asyncio.TimeoutError:
+            acquire_timeouts.inc()
+            raise
+        finally:
+            self.pool.waiting -= 1
+            acquire_wait.inc(time.perf_counter() - started)
+        return self.conn
+
+    async def __aexit__(self, *exc):
+        await self.pool._pool.release(self.conn)
+
+
+pool: InstrumentedPool = None
+replica_pool: InstrumentedPool = None
+replica_lag: float = float("inf")
+_pool_lock = asyncio.Lock()
+_recycle_task: asyncio.Task = None
+_lag_task: asyncio.Task = None
+# Read-your-writes pins: owner id (None = data shared across owners) -> monotonic deadline,
+# kept in deadline order
+_pinned_until: dict = {}
+
+acquire_wait = metrics.counter("db_pool_acquire_wait_seconds_total", "Time spent waiting for a pool connection")
+acquire_timeouts = metrics.counter("db_pool_acquire_timeouts_total", "Pool acquires that timed out")
+read_routing = metrics.counter("db_read_routing_total", "Read-only queries by the pool they were sent to")
+
+# Registered once and read at scrape time; skipped while the pool (or replica) isn't open
+metrics.gauge("db_pool_size", "Open connections in the pool", lambda: pool.get_size())
+metrics.gauge("db_pool_idle", "Idle connections in the pool", lambda: pool.get_idle_size())
+metrics.gauge("db_pool_acquired", "Connections checked out of the pool",
+              lambda: pool.get_size() - pool.get_idle_size())
+metrics.gauge("db_pool_waiters", "Requests waiting for a pool connection", lambda: pool.waiting)
+metrics.gauge("db_pool_max_size", "Configured pool maximum", lambda: pool.get_max_size())
+metrics.gauge("db_replica_pool_size", "Open connections in the replica pool", lambda: replica_pool.get_size())
+metrics.gauge("db_replica_pool_waiters", "Requests waiting for a replica connection", lambda: replica_pool.waiting)
+metrics.gauge("db_replica_lag_seconds", "Last measured replica replay lag",
+              lambda: replica_lag if replica_pool is not None else None)
+
+REPLICA_LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+async def _init_connection(conn):
+    """Per-connection setup: decode json/jsonb columns into Python objects"""
+    for type_name in ("json", "jsonb"):
+        await conn.set_type_codec(type_name, encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+
+async def _warm_up(new_pool: asyncpg.pool.Pool):
+    """Open and exercise min_size connections before the first request needs them"""
+    async def ping():
+        async with new_pool.acquire() as conn:
+            await conn.fetchval("SELECT 1")
+    await asyncio.gather(*(ping() for _ in range(DB_POOL_MIN_SIZE)))
+
+
+async def _recycle_connections():
+    """Replace every connection at least once per DB_POOL_MAX_LIFETIME_SECONDS"""
+    while True:
+        await asyncio.sleep(DB_POOL_MAX_LIFETIME_SECONDS)
+        for current in (pool, replica_pool):
+            if current is not None:
+                await current.expire_connections()
+
+
+async def _watch_replica_lag():
+    """Keep replica_lag fresh; an unreachable replica counts as infinitely behind"""
+    global replica_lag
+    while True:
+        try:
+            async with replica_pool.acquire() as conn:
+                replica_lag = float(await conn.fetchval(REPLICA_LAG_QUERY))
+        except Exception as e:
+            if replica_lag != float("inf"):
+                print(f"Replica lag check failed, reading from primary: {e}")
+            replica_lag = float("inf")
+        await asyncio.sleep(DB_REPLICA_LAG_CHECK_SECONDS)
+
+
+async def create_pool(statement_mode: str = None, dsn: str = None, max_size: int = None) -> InstrumentedPool:
+    """Create and warm a pool (init_db keeps the shared ones; benchmarks build their own)"""
+    dsn = dsn or DATABASE_URL
+    mode = resolve_statement_mode(dsn, statement_mode or DB_STATEMENT_MODE)
+    new_pool = await asyncpg.create_pool(
+        dsn,
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=max_size or DB_POOL_MAX_SIZE,
+        max_inactive_connection_lifetime=DB_POOL_MAX_IDLE_SECONDS,
+        init=_init_connection,
+        **statement_cache_options(mode)
+    )
+    await _warm_up(new_pool)
+    wrapped = InstrumentedPool(new_pool)
+    wrapped.statement_mode = mode
+    return wrapped
 
 async def init_db():
-    global pool
-    if pool is None:
-        pool = await asyncpg.create_pool(DATABASE_URL, max_size=10,statement_cache_size=0)
+    global pool, replica_pool, _recycle_task, _lag_task
+    async with _pool_lock:
+        if pool is not None:
+            return
+        pool = await create_pool()
+        print(f"Database pool ready ({pool.statement_mode} statement mode)")
+        if DATABASE_REPLICA_URL:
+            try:
+                replica_pool = await create_pool(dsn=DATABASE_REPLICA_URL, max_size=DB_REPLICA_POOL_MAX_SIZE)
+                _lag_task = asyncio.get_running_loop().create_task(_watch_replica_lag())
+                print("Replica pool ready")
+            except Exception as e:
+                print(f"Replica unavailable, all reads go to the primary: {e}")
+        if DB_POOL_MAX_LIFETIME_SECONDS > 0:
+            _recycle_task = asyncio.get_running_loop().create_task(_recycle_connections())
 
 async def get_pool():
     if pool is None:
         await init_db()
     return pool
 
+def mark_write(owner_id: int = None):
+    """Pin reads for owner_id (None: cross-owner data) to the primary for a short window"""
+    if replica_pool is None:
+        return
+    now = time.monotonic()
+    # Re-insert so the dict stays in deadline order, then drop the pins that ran out
+    _pinned_until.pop(owner_id, None)
+    _pinned_until[owner_id] = now + DB_READ_YOUR_WRITES_SECONDS
+    while True:
+        oldest = next(iter(_pinned_until))
+        if _pinned_until[oldest] > now:
+            break
+        del _pinned_until[oldest]
+
+def _read_target(owner_id: int = None) -> str:
+    if replica_pool is None:
+        return "primary"
+    if replica_lag > DB_REPLICA_MAX_LAG_SECONDS:
+        return "primary_lagging"
+    deadline = _pinned_until.get(owner_id)
+    if deadline is not None:
+        if time.monotonic() < deadline:
+            return "primary_pinned"
+        _pinned_until.pop(owner_id, None)
+    return "replica"
+
+async def get_read_pool(owner_id: int = None):
+    """Pool for read-only queries about owner_id: the replica when it's safe, otherwise the primary"""
+    primary = await get_pool()
+    target = _read_target(owner_id)
+    read_routing.inc(target=target)
+    return replica_pool if target == "replica" else primary
+
 async def close_pool():
-    global pool
+    global pool, replica_pool, _recycle_task, _lag_task
+    for task in (_recycle_task, _lag_task):
+        if task is not None:
+            task.cancel()
+    _recycle_task = _lag_task = None
+    if replica_pool is not None:
+        closing, replica_pool = replica_pool, None
+        await closing.close()
     if pool is not None:
-        await pool.close()
-        pool = None
\ No newline at end of file
+        closing, pool = pool, None
+        await closing.close()
@@ -0,0 +1,131 @@
+# app/db/migrate.py
+import asyncio
+import os
+import re
+import sys
+from typing import List, Tuple
+from .init_db import get_pool, close_pool
+
+# =========================
+# Schema Migrations
+# =========================
+# Numbered SQL files in migrations/ (0001_name.sql, 0002_name.sql, ...) are
+# applied in order, each in its own transaction, and recorded in
+# schema_migrations. A transaction-scoped advisory lock keeps concurrent
+# runners (several workers starting at once) from applying the same file
+# twice and works through pgbouncer.
+#
+#   python -m app.db.migrate          apply pending migrations
+#   python -m app.db.migrate status   list applied / pending migrations
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+MIGRATIONS_DIR = os.path.join(BASE_DIR, "migrations")
+MIGRATION_LOCK_ID = 4_211_730_001
+MIGRATION_FILE = re.compile(r"^(\d{4})_([\w-]+)\.sql$")
+
+# Indexes the hot queries rely on, checked at startup
+EXPECTED_INDEXES = [
+    "idx_visits_owner_timestamp",
+    "idx_visits_owner_pending",
+    "uq_device_tokens_owner_token",
+    "idx_device_tokens_owner_active",
+    "idx_visitors_name",
+    "idx_visitors_name_trgm",
+    "idx_visits_owner_label_trgm",
+    "idx_visits_visitor_owner",
+]
+
+
+def discover_migrations() -> List[Tuple[int, str, str]]:
+    """(version, name, path) of every migration file, ordered by version"""
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_DIR, filename)))
+    return sorted(migrations)
+
+
+async def _ensure_table(conn):
+    await conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+
+
+async def applied_versions() -> List[int]:
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        await _ensure_table(conn)
+        rows = await conn.fetch("SELECT version FROM schema_migrations ORDER BY version")
+        return [row["version"] for row in rows]
+
+
+async def migrate() -> List[str]:
+    """Apply every pending migration, returns the names applied"""
+    applied = []
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        await _ensure_table(conn)
+        for version, name, path in discover_migrations():
+            with open(path, encoding="utf-8") as f:
+                sql = f.read()
+            async with conn.transaction():
+                await conn.execute("SELECT pg_advisory_xact_lock($1)", MIGRATION_LOCK_ID)
+                done = await conn.fetchval("SELECT 1 FROM schema_migrations WHERE version = $1", version)
+                if done:
+                    continue
+                await conn.execute(sql)
+                await conn.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES ($1, $2)", version, name
+                )
+            print(f"Applied migration {version:04d}_{name}")
+            applied.append(f"{version:04d}_{name}")
+    return applied
+
+
+async def missing_indexes() -> List[str]:
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            "SELECT indexname FROM pg_indexes WHERE indexname = ANY($1::text[])", EXPECTED_INDEXES
+        )
+    present = {row["indexname"] for row in rows}
+    return [name for name in EXPECTED_INDEXES if name not in present]
+
+
+async def check_indexes():
+    """Warn at startup when performance indexes are missing (never blocks startup)"""
+    try:
+        missing = await missing_indexes()
+    except Exception as e:
+        print(f"Index check skipped: {e}")
+        return
+    if missing:
+        print(f"WARNING: missing database indexes {', '.join(missing)}; run `python -m app.db.migrate`")
+
+
+async def _status():
+    applied = set(await applied_versions())
+    for version, name, _ in discover_migrations():
+        print(f"{'applied' if version in applied else 'pending'}  {version:04d}_{name}")
+
+
+async def _main(argv: List[str]):
+    try:
+        if argv[:1] == ["status"]:
+            await _status()
+        else:
+            applied = await migrate()
+            if not applied:
+                print("Database is up to date")
+    finally:
+        await close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main(sys.argv[1:]))
@@ -0,0 +1,36 @@
+# app/db/pagination.py
+import base64
+import json
+from datetime import datetime
+from typing import Any, Tuple
+
+# =========================
+# Keyset Pagination
+# =========================
+# Pages are addressed by the (timestamp, id) of the last row already seen,
+# so fetching page N costs the same as fetching page 1. Cursors are opaque
+# to clients: URL-safe base64 of that pair.
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(sort_value: Any, row_id: int) -> str:
+    if isinstance(sort_value, datetime):
+        sort_value = {"ts": sort_value.isoformat()}
+    raw = json.dumps([sort_value, row_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        if isinstance(sort_value, dict):
+            sort_value = datetime.fromisoformat(sort_value["ts"])
+        return sort_value, int(row_id)
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor("Invalid pagination cursor")
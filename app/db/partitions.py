@@ -0,0 +1,217 @@
+# app/db/partitions.py
+import asyncio
+import gzip
+import os
+import sys
+import tempfile
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, List, Tuple
+import orjson
+from .init_db import get_pool, close_pool
+from app.core.cache import cache
+
+# =========================
+# Visit Partition Maintenance
+# =========================
+# visits is range-partitioned by UTC month (migration 0004). Three jobs
+# keep it bounded, run by the scheduler or by hand:
+#
+#   python -m app.db.partitions ensure      create upcoming monthly partitions
+#   python -m app.db.partitions retention   apply per-owner retention policies
+#   python -m app.db.partitions archive     archive + drop months past the archive horizon
+#
+# Archived months are written as gzip NDJSON to
+# s3://$S3_BUCKET_NAME/$VISIT_ARCHIVE_PREFIX/visits_pYYYYMM-<archived at>.ndjson.gz
+# before the partition is detached and dropped.
+#
+# Statistics (visit_daily_stats) count the visits still stored: retention
+# DELETEs are subtracted by the rollup triggers, and archiving subtracts the
+# dropped month's counts in the same transaction as the DROP.
+VISIT_PARTITION_MONTHS_AHEAD = int(os.getenv("VISIT_PARTITION_MONTHS_AHEAD", "3"))
+VISIT_ARCHIVE_AFTER_MONTHS = int(os.getenv("VISIT_ARCHIVE_AFTER_MONTHS", "12"))  # 0 keeps everything
+VISIT_ARCHIVE_PREFIX = os.getenv("VISIT_ARCHIVE_PREFIX", "archive/visits")
+ARCHIVE_FETCH_SIZE = 5000
+
+
+def _month_of(partition_name: str) -> date:
+    """visits_p202401 -> 2024-01-01"""
+    suffix = partition_name.rsplit("_p", 1)[1]
+    return date(int(suffix[:4]), int(suffix[4:]), 1)
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+async def ensure_visit_partitions(months_ahead: int = VISIT_PARTITION_MONTHS_AHEAD) -> List[str]:
+    """Make sure partitions exist from the current month to months_ahead months out"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            SELECT ensure_visit_partition(
+                (date_trunc('month', CURRENT_TIMESTAMP AT TIME ZONE 'UTC') + make_interval(months => m))::date
+            ) as name
+            FROM generate_series(0, $1) m
+            """,
+            months_ahead
+        )
+    return [row["name"] for row in rows]
+
+
+async def ensure_partitions_for(conn, timestamps: Iterable[datetime]):
+    """Create the monthly partitions covering timestamps (e.g. imported history) on conn
+
+    Without them old rows would land in visits_default, which is never archived.
+    """
+    months = sorted({moment.astimezone(timezone.utc).date().replace(day=1) for moment in timestamps})
+    if months:
+        await conn.execute("SELECT ensure_visit_partition(m) FROM unnest($1::date[]) m", months)
+
+
+async def list_visit_partitions() -> List[Tuple[str, date]]:
+    """Monthly partitions of visits, oldest first (the default partition is skipped)"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            SELECT c.relname as name
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'visits'::regclass
+              AND c.relname ~ '^visits_p[0-9]{6}$'
+            ORDER BY c.relname
+            """
+        )
+    return [(row["name"], _month_of(row["name"])) for row in rows]
+
+
+async def apply_retention_policies() -> Dict[int, int]:
+    """Delete visits older than each owner's retention window, returns {owner_id: deleted}"""
+    deleted = {}
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        policies = await conn.fetch("SELECT owner_id, retention_days FROM owner_retention_policies")
+        for policy in policies:
+            # Per owner so each DELETE uses idx_visits_owner_timestamp and
+            # prunes to the partitions before the cutoff
+            result = await conn.execute(
+                """
+                DELETE FROM visits
+                WHERE owner_id = $1
+                  AND timestamp < CURRENT_TIMESTAMP - make_interval(days => $2)
+                """,
+                policy["owner_id"], policy["retention_days"]
+            )
+            count = int(result.split()[-1]) if result.startswith("DELETE") else 0
+            if count:
+                deleted[policy["owner_id"]] = count
+                await cache.invalidate(
+                    f"owner-visits:{policy['owner_id']}", f"owner-history:{policy['owner_id']}"
+                )
+    return deleted
+
+
+async def _dump_partition(conn, name: str, out) -> int:
+    """Stream every row of a partition into out as gzip NDJSON"""
+    written = 0
+    with gzip.GzipFile(fileobj=out, mode="wb") as gz:
+        async with conn.transaction():
+            query = f'SELECT * FROM "{name}" ORDER BY timestamp, id'
+            async for row in conn.cursor(query, prefetch=ARCHIVE_FETCH_SIZE):
+                gz.write(orjson.dumps(dict(row)) + b"\n")
+                written += 1
+    return written
+
+
+async def archive_partition(name: str) -> str:
+    """Upload a partition as gzip NDJSON to S3, then detach and drop it; returns the object key"""
+    from app.api.routes_uploads import s3_client
+
+    bucket = os.environ.get("S3_BUCKET_NAME")
+    if not bucket:
+        raise RuntimeError("S3_BUCKET_NAME not configured")
+    # Timestamped: a month can be archived again after history is imported into it
+    archived_at = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    key = f"{VISIT_ARCHIVE_PREFIX}/{name}-{archived_at}.ndjson.gz"
+
+    pool = await get_pool()
+    with tempfile.TemporaryFile() as spool:
+        async with pool.acquire() as conn:
+            rows = await _dump_partition(conn, name, spool)
+        # No connection is held during the upload
+        spool.seek(0)
+        await asyncio.to_thread(
+            s3_client.upload_fileobj, spool, bucket, key,
+            ExtraArgs={"ContentType": "application/x-ndjson", "ContentEncoding": "gzip"}
+        )
+    # Only drop once the archive is safely stored
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute(f'ALTER TABLE visits DETACH PARTITION "{name}"')
+            # Detached, nothing can write to it any more; make sure it is what was uploaded
+            if await conn.fetchval(f'SELECT COUNT(*) FROM "{name}"') != rows:
+                raise RuntimeError(f"{name} changed while it was being archived, try again")
+            # DROP doesn't fire the rollup triggers, take the month out of the statistics here
+            owners = await conn.fetch(
+                f"""
+                UPDATE visit_daily_stats s SET
+                    total_visits = s.total_visits - a.total_visits,
+                    pending_visits = s.pending_visits - a.pending_visits,
+                    granted_visits = s.granted_visits - a.granted_visits,
+                    denied_visits = s.denied_visits - a.denied_visits
+                FROM (
+                    SELECT
+                        owner_id,
+                        (timestamp AT TIME ZONE 'UTC')::date as day,
+                        COUNT(*) as total_visits,
+                        COUNT(*) FILTER (WHERE status = 'pending') as pending_visits,
+                        COUNT(*) FILTER (WHERE status = 'granted') as granted_visits,
+                        COUNT(*) FILTER (WHERE status = 'denied') as denied_visits
+                    FROM "{name}"
+                    GROUP BY 1, 2
+                ) a
+                WHERE s.owner_id = a.owner_id AND s.day = a.day
+                RETURNING s.owner_id
+                """
+            )
+            await conn.execute(f'DROP TABLE "{name}"')
+    for owner_id in {row["owner_id"] for row in owners}:
+        await cache.invalidate(f"owner-visits:{owner_id}", f"owner-history:{owner_id}")
+    print(f"Archived {rows} visits from {name} to s3://{bucket}/{key}")
+    return key
+
+
+async def archive_expired_partitions(after_months: int = VISIT_ARCHIVE_AFTER_MONTHS) -> List[str]:
+    """Archive every monthly partition that ended more than after_months months ago"""
+    if after_months <= 0:
+        return []
+    current_month = datetime.now(timezone.utc).date().replace(day=1)
+    cutoff = _add_months(current_month, -after_months)
+    archived = []
+    for name, month in await list_visit_partitions():
+        if _add_months(month, 1) <= cutoff:
+            archived.append(await archive_partition(name))
+    return archived
+
+
+async def _main(argv: List[str]):
+    command = argv[0] if argv else "ensure"
+    try:
+        if command == "ensure":
+            print("Visit partitions: " + ", ".join(await ensure_visit_partitions()))
+        elif command == "retention":
+            deleted = await apply_retention_policies()
+            print(f"Retention removed {sum(deleted.values())} visits across {len(deleted)} owners")
+        elif command == "archive":
+            archived = await archive_expired_partitions()
+            print(f"Archived {len(archived)} partitions" if archived else "Nothing to archive")
+        else:
+            print("usage: python -m app.db.partitions [ensure|retention|archive]")
+    finally:
+        await close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main(sys.argv[1:]))
@@ -0,0 +1,128 @@
+# app/db/search.py
+from typing import Any, Dict, List, Optional, Tuple
+from .init_db import get_read_pool
+from .pagination import encode_cursor, decode_cursor, InvalidCursor, DEFAULT_PAGE_SIZE
+
+# =========================
+# Visitor / Visit Search
+# =========================
+# Case-insensitive search on visitor names and visit labels, served by the
+# pg_trgm GIN indexes from migration 0006. "prefix" only matches names that
+# start with the query; "fuzzy" also matches similar spellings (pg_trgm's
+# % operator, similarity >= pg_trgm.similarity_threshold, 0.3 by default).
+# Results are ranked: prefix matches first, then by trigram similarity.
+# Pages use the shared keyset cursors with the rank as sort value.
+SEARCH_MODES = ("prefix", "fuzzy")
+MIN_QUERY_LENGTH = 2
+
+
+def _like_prefix(query: str) -> str:
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "%"
+
+
+def _match(column: str, mode: str) -> str:
+    """WHERE clause for column; $2 is the lowercased query, $3 its LIKE prefix pattern"""
+    if mode == "prefix":
+        return f"{column} LIKE $3"
+    return f"({column} LIKE $3 OR {column} % $2)"
+
+
+def _rank(column: str) -> str:
+    return f"((CASE WHEN {column} LIKE $3 THEN 1 ELSE 0 END) + similarity({column}, $2))::float8"
+
+
+def _page(params: List[Any], limit: int, cursor: Optional[str]) -> Tuple[str, List[Any]]:
+    """Keyset condition on (rank, id) plus LIMIT, appended after the search params"""
+    condition = ""
+    if cursor:
+        last_rank, last_id = decode_cursor(cursor)
+        try:
+            last_rank = float(last_rank)
+        except (TypeError, ValueError):
+            # e.g. a visit listing cursor, whose sort value is a timestamp
+            raise InvalidCursor("Invalid pagination cursor")
+        params = params + [last_rank, last_id]
+        condition = f"WHERE (rank, id) < (${len(params) - 1}::float8, ${len(params)})"
+    params = params + [limit + 1]
+    return f"{condition} ORDER BY rank DESC, id DESC LIMIT ${len(params)}", params
+
+
+def _split_page(rows, limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["rank"], rows[-1]["id"])
+    return [dict(row) for row in rows], next_cursor
+
+
+async def search_visitors(
+    owner_id: int,
+    query: str,
+    mode: str = "fuzzy",
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Visitors who have visited owner_id and whose name matches query, best match first"""
+    normalized = query.strip().lower()
+    page, params = _page([owner_id, normalized, _like_prefix(normalized)], limit, cursor)
+    sql = f"""
+        SELECT * FROM (
+            SELECT vis.*, {_rank('lower(vis.name)')} as rank
+            FROM visitors vis
+            WHERE {_match('lower(vis.name)', mode)}
+              AND EXISTS (
+                  SELECT 1 FROM visits v WHERE v.visitor_id = vis.id AND v.owner_id = $1
+              )
+        ) matches
+        {page}
+    """
+    pool = await get_read_pool(owner_id)
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(sql, *params)
+    return _split_page(rows, limit)
+
+
+async def search_visits(
+    owner_id: int,
+    query: str,
+    mode: str = "fuzzy",
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Owner's visits whose detected label or visitor name matches query, best match first"""
+    normalized = query.strip().lower()
+    page, params = _page([owner_id, normalized, _like_prefix(normalized)], limit, cursor)
+    # Label and name matches come from separate indexes and are merged,
+    # a single OR across the join would fall back to scanning all visits
+    sql = f"""
+        WITH name_hits AS (
+            SELECT id as visitor_id, {_rank('lower(name)')} as rank
+            FROM visitors
+            WHERE {_match('lower(name)', mode)}
+        ),
+        hits AS (
+            SELECT id, timestamp, MAX(rank) as rank
+            FROM (
+                SELECT v.id, v.timestamp, {_rank('lower(v.detected_label)')} as rank
+                FROM visits v
+                WHERE v.owner_id = $1 AND {_match('lower(v.detected_label)', mode)}
+                UNION ALL
+                SELECT v.id, v.timestamp, n.rank
+                FROM name_hits n
+                JOIN visits v ON v.visitor_id = n.visitor_id AND v.owner_id = $1
+            ) candidates
+            GROUP BY id, timestamp
+        )
+        SELECT * FROM (
+            SELECT v.*, vis.name as visitor_name, vis.profile_image_url, h.rank
+            FROM hits h
+            JOIN visits v ON v.id = h.id AND v.timestamp = h.timestamp
+            LEFT JOIN visitors vis ON v.visitor_id = vis.id
+        ) matches
+        {page}
+    """
+    pool = await get_read_pool(owner_id)
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(sql, *params)
+    return _split_page(rows, limit)
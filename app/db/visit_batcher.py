@@ -0,0 +1,192 @@
+# app/db/visit_batcher.py
+import asyncio
+import os
+from typing import Any, Dict, List, Optional, Tuple
+from app.core import metrics
+from .init_db import get_pool
+
+# =========================
+# Visit Write-behind Batcher
+# =========================
+# Optional group commit for create_visit: calls arriving within a few
+# milliseconds of each other are written by one multi-row INSERT and each
+# caller still gets its own row back. Enable with VISIT_BATCH_ENABLED=1.
+# The queue is bounded, so producers wait instead of buffering without
+# limit, and everything queued (or waiting to be) is flushed on shutdown.
+VISIT_BATCH_ENABLED = os.getenv("VISIT_BATCH_ENABLED", "0") == "1"
+VISIT_BATCH_MAX_ROWS = int(os.getenv("VISIT_BATCH_MAX_ROWS", "100"))
+VISIT_BATCH_MAX_DELAY_MS = float(os.getenv("VISIT_BATCH_MAX_DELAY_MS", "5"))
+VISIT_BATCH_QUEUE_SIZE = int(os.getenv("VISIT_BATCH_QUEUE_SIZE", "1000"))
+
+VisitRecord = Tuple[Optional[int], int, str, str, Optional[str]]
+
+# Ids are drawn up front and joined back to the input ordinality, so each
+# caller is matched to its own row regardless of RETURNING order
+INSERT_BATCH = """
+    WITH input AS (
+        SELECT *
+        FROM unnest($1::int[], $2::int[], $3::text[], $4::text[], $5::text[])
+             WITH ORDINALITY AS t(visitor_id, owner_id, image_url, status, detected_label, ord)
+    ),
+    ids AS (
+        SELECT ord, nextval(pg_get_serial_sequence('visits', 'id')) AS id FROM input
+    ),
+    inserted AS (
+        INSERT INTO visits (id, visitor_id, owner_id, image_url, status, detected_label)
+        SELECT ids.id, input.visitor_id, input.owner_id, input.image_url, input.status, input.detected_label
+        FROM input JOIN ids USING (ord)
+        RETURNING *
+    )
+    SELECT ids.ord, inserted.*
+    FROM inserted JOIN ids ON ids.id = inserted.id
+"""
+
+INSERT_ONE = """
+    INSERT INTO visits (visitor_id, owner_id, image_url, status, detected_label)
+    VALUES ($1, $2, $3, $4, $5)
+    RETURNING *
+"""
+
+_STOP = object()
+
+
+class BatcherStopped(RuntimeError):
+    """Raised by submit() once the batcher is shutting down; write the row directly instead"""
+
+
+flushes = metrics.counter("visit_batch_flushes_total", "Multi-row visit INSERTs issued by the batcher")
+batched_rows = metrics.counter("visit_batch_rows_total", "Visits written through the batcher")
+
+
+class VisitBatcher:
+    def __init__(self, max_rows: int = VISIT_BATCH_MAX_ROWS, max_delay_ms: float = VISIT_BATCH_MAX_DELAY_MS,
+                 queue_size: int = VISIT_BATCH_QUEUE_SIZE):
+        self.max_rows = max_rows
+        self.max_delay = max_delay_ms / 1000
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.accepting = False
+        self._putting = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self.accepting = True
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop taking new rows and flush everything already queued"""
+        if self._task is None:
+            return
+        self.accepting = False
+        await self.queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def submit(self, record: VisitRecord) -> Dict[str, Any]:
+        if not self.accepting:
+            raise BatcherStopped("Visit batcher is not accepting rows")
+        future = asyncio.get_running_loop().create_future()
+        # Counted until the row is in the queue, so stop() waits for blocked producers
+        self._putting += 1
+        try:
+            await self.queue.put((record, future))
+        finally:
+            self._putting -= 1
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            first = await self.queue.get()
+            if first is _STOP:
+                break
+            batch = [first]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_rows:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+        # Producers blocked on a full queue when stop() was called only
+        # enqueue after a get wakes them and they get to run, so keep going
+        # until the queue is empty and nobody is still putting
+        while not self.queue.empty() or self._putting:
+            leftovers = []
+            while len(leftovers) < self.max_rows and not self.queue.empty():
+                item = self.queue.get_nowait()
+                if item is not _STOP:
+                    leftovers.append(item)
+            if leftovers:
+                await self._flush(leftovers)
+            else:
+                await asyncio.sleep(0)
+
+    async def _flush(self, batch: List[Tuple[VisitRecord, asyncio.Future]]):
+        columns = list(zip(*(record for record, _ in batch)))
+        try:
+            pool = await get_pool()
+            async with pool.acquire() as conn:
+                rows = await conn.fetch(INSERT_BATCH, *columns)
+        except Exception:
+            # One bad row (e.g. a missing owner) fails the whole statement;
+            # retry individually so only that caller sees the error
+            await self._flush_individually(batch)
+            return
+
+        flushes.inc()
+        batched_rows.inc(len(batch))
+        for row in rows:
+            visit = dict(row)
+            _, future = batch[visit.pop("ord") - 1]
+            if not future.done():
+                future.set_result(visit)
+
+    async def _flush_individually(self, batch: List[Tuple[VisitRecord, asyncio.Future]]):
+        pool = await get_pool()
+        for record, future in batch:
+            try:
+                async with pool.acquire() as conn:
+                    row = await conn.fetchrow(INSERT_ONE, *record)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            if not future.done():
+                future.set_result(dict(row))
+
+
+batcher: Optional[VisitBatcher] = None
+
+
+def accepting() -> bool:
+    return batcher is not None and batcher.accepting
+
+
+async def start():
+    global batcher
+    if VISIT_BATCH_ENABLED and batcher is None:
+        batcher = VisitBatcher()
+        batcher.start()
+        print(f"Visit batcher on (up to {VISIT_BATCH_MAX_ROWS} rows / {VISIT_BATCH_MAX_DELAY_MS} ms)")
+
+
+async def stop():
+    global batcher
+    if batcher is not None:
+        await batcher.stop()
+        batcher = None
+
+
+async def submit(record: VisitRecord) -> Dict[str, Any]:
+    if batcher is None:
+        raise BatcherStopped("Visit batcher is not running")
+    return await batcher.submit(record)
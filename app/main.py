@@ -1,18 +1,49 @@
 # app/main.py
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 # Import all route modules
 from app.api.routes_auth import router as auth_router
 from app.api.routes_visits import router as visits_router
 from app.api.routes_device import router as device_router
 from app.api.routes_notify import router as notify_router
 from app.api.routes_visitors import router as visitors_router
+from app.api.routes_lock import router as lock_router
+from app.api.routes_search import router as search_router
+from app.api.routes_dashboard import router as dashboard_router
 from app.api import routes_uploads as routes_uploads
+from app.realtime import visit_events
+from app.db.init_db import init_db, close_pool
+from app.db import visit_batcher
+from app.db.migrate import check_indexes
+from app.core.metrics import render_prometheus
+from app.core.scheduler import scheduler, SCHEDULER_ENABLED
+from app.core.jobs import register_jobs
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open and warm the pool before serving so the first requests don't pay for it
+    await init_db()
+    await check_indexes()
+    await visit_events.start_listener()
+    await visit_batcher.start()
+    if SCHEDULER_ENABLED:
+        register_jobs(scheduler)
+        scheduler.start()
+    yield
+    await scheduler.stop()
+    # Flush queued visits while the pool is still open
+    await visit_batcher.stop()
+    await visit_events.stop_listener()
+    await close_pool()
 
 
 app = FastAPI(
     title="IoT Lock API",
     description="API for IoT Lock system. Mobile app or Raspberry Pi can upload images and check status.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.include_router(routes_uploads.router, prefix="/upload", tags=["Upload Image"])
@@ -21,8 +52,17 @@ app.include_router(visits_router, prefix="/api/visits", tags=["Visits"])
 app.include_router(device_router, prefix="/api/device", tags=["Device Management"])
 app.include_router(notify_router, prefix="/api/notify", tags=["Notifications"])
 app.include_router(visitors_router, prefix="/api/visitors", tags=["Visitors"])
+app.include_router(lock_router, prefix="/api/lock", tags=["Lock Commands"])
+app.include_router(search_router, prefix="/api/search", tags=["Search"])
+app.include_router(dashboard_router, prefix="/api/dashboard", tags=["Dashboard"])
 
 
 @app.get("/")
 def read_root():
     return {"message": "FastAPI server is running on the port 8000"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    """Prometheus-format gauges and counters (pool usage, ...)"""
+    return render_prometheus()
@@ -0,0 +1,79 @@
+# app/ml/frame_quality.py
+import cv2
+import numpy as np
+from typing import List, Optional, Tuple
+
+# =========================
+# Burst Frame Scoring
+# =========================
+# Every frame of a burst is resized onto the same grid so focus, exposure
+# and contrast for the whole burst are computed as single array operations.
+# Face size still takes one cascade call per frame, OpenCV's detector has no
+# batched form.
+SCORE_WIDTH = 320
+SCORE_HEIGHT = 240
+
+# focus, exposure, contrast, face size
+METRIC_WEIGHTS = np.array([0.35, 0.15, 0.30, 0.20])
+
+# Exposure scores the mean brightness by its distance from mid-grey, so
+# blown-out frames lose out like dark ones
+EXPOSURE_TARGET = 128.0
+
+# BGR -> gray luma weights (same as cv2.COLOR_BGR2GRAY)
+GRAY_WEIGHTS = np.array([0.114, 0.587, 0.299], dtype=np.float32)
+
+face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+
+
+def decode_frames(blobs: List[bytes]) -> List[Optional[np.ndarray]]:
+    """Decode encoded image bytes into BGR frames (None when a blob cannot be decoded)"""
+    return [cv2.imdecode(np.frombuffer(blob, np.uint8), cv2.IMREAD_COLOR) for blob in blobs]
+
+
+def _largest_face_ratio(gray: np.ndarray) -> float:
+    """Area of the largest detected face relative to the frame area"""
+    faces = face_cascade.detectMultiScale(gray, 1.3, 5)
+    if len(faces) == 0:
+        return 0.0
+    areas = faces[:, 2] * faces[:, 3]
+    return float(areas.max()) / (gray.shape[0] * gray.shape[1])
+
+
+def frame_metrics(frames: List[np.ndarray]) -> np.ndarray:
+    """Raw (focus, exposure, contrast, face size) metrics for a burst, shape (N, 4)
+
+    Face size is detected frame by frame; the other metrics cover the whole stack at once.
+    """
+    small = np.stack([
+        cv2.resize(frame, (SCORE_WIDTH, SCORE_HEIGHT), interpolation=cv2.INTER_AREA)
+        for frame in frames
+    ])
+    gray = small.astype(np.float32) @ GRAY_WEIGHTS  # (N, H, W)
+
+    # 4-neighbour Laplacian over the whole stack at once
+    laplacian = (
+        gray[:, :-2, 1:-1] + gray[:, 2:, 1:-1] + gray[:, 1:-1, :-2] + gray[:, 1:-1, 2:]
+        - 4.0 * gray[:, 1:-1, 1:-1]
+    )
+    focus = laplacian.var(axis=(1, 2))
+    brightness = small.max(axis=3).mean(axis=(1, 2))  # HSV value channel
+    exposure = 1.0 - np.abs(brightness - EXPOSURE_TARGET) / EXPOSURE_TARGET
+    contrast = gray.std(axis=(1, 2))
+
+    gray_u8 = np.clip(gray, 0, 255).astype(np.uint8)
+    face_size = np.array([_largest_face_ratio(g) for g in gray_u8])
+
+    return np.nan_to_num(np.column_stack([focus, exposure, contrast, face_size]))
+
+
+def score_frames(metrics: np.ndarray) -> np.ndarray:
+    """Hybrid quality score per frame, each metric min-max normalised across the burst"""
+    normalized = (metrics - metrics.min(axis=0)) / (np.ptp(metrics, axis=0) + 1e-9)
+    return normalized @ METRIC_WEIGHTS
+
+
+def rank_frames(frames: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (order, scores): frame indices best-first and the score of every frame"""
+    scores = score_frames(frame_metrics(frames))
+    return np.argsort(-scores, kind="stable"), scores
@@ -0,0 +1,191 @@
+# app/ml/model_store.py
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+import cv2
+import numpy as np
+import requests
+from app.db.init_db import get_pool, close_pool
+
+# =========================
+# Edge Model Distribution
+# =========================
+# Per-owner models for on-device recognition. Every visitor an owner has
+# enrolled (owner_edge_visitors) gets their own small LBPH model, trained
+# from their profile images and stored in visitor_face_models. LBPH is a
+# nearest-neighbour match, so a device predicting with each of the owner's
+# visitor models and keeping the closest is the same as one combined model.
+#
+# Devices sync the owner's manifest with If-None-Match (304 while current)
+# and then download only the visitor models whose ETag changed: enrolling
+# one more person costs one small download, not the whole model.
+#
+#   python -m app.ml.model_store train [visitor_id ...]   train new / changed models now
+PROFILE_URL_SEPARATOR = "=@#*#@="  # several profile images share one column (see train_model.py)
+IMAGE_TIMEOUT = 10
+
+# Stricter than the server's threshold, the device acts on a match without a second opinion
+EDGE_CONFIDENCE_THRESHOLD = 50
+
+FACE_CASCADE = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+
+
+# =========================
+# Training
+# =========================
+def _face_rois(url: str) -> List[np.ndarray]:
+    try:
+        response = requests.get(url, timeout=IMAGE_TIMEOUT)
+    except requests.RequestException as e:
+        print(f"Failed to download {url}: {e}")
+        return []
+    if response.status_code != 200:
+        print(f"Failed to download ({response.status_code}): {url}")
+        return []
+    image = cv2.imdecode(np.frombuffer(response.content, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return []
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    faces = FACE_CASCADE.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=4)
+    return [gray[y:y+h, x:x+w] for (x, y, w, h) in faces]
+
+
+def train_face_model(profile_image_url: str) -> Optional[Tuple[bytes, int]]:
+    """Train an LBPH model on one visitor's profile images, returns (gzipped yml, samples) or None"""
+    features = []
+    for url in profile_image_url.split(PROFILE_URL_SEPARATOR):
+        if url.strip():
+            features.extend(_face_rois(url.strip()))
+    if not features:
+        return None
+
+    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    recognizer.train(features, np.zeros(len(features), dtype=np.int32))
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "model.yml")
+        recognizer.save(path)
+        with open(path, "rb") as f:
+            model = f.read()
+    return gzip.compress(model, compresslevel=9), len(features)
+
+
+async def train_pending_models(visitor_ids: Optional[List[int]] = None) -> List[int]:
+    """Train enrolled visitors without a model or whose profile images changed, returns the visitor ids"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            SELECT v.id, v.profile_image_url, md5(v.profile_image_url) as source_hash
+            FROM visitors v
+            LEFT JOIN visitor_face_models m ON m.visitor_id = v.id
+            WHERE v.profile_image_url IS NOT NULL
+              AND EXISTS (SELECT 1 FROM owner_edge_visitors e WHERE e.visitor_id = v.id)
+              AND (m.visitor_id IS NULL OR m.source_hash <> md5(v.profile_image_url))
+              AND ($1::int[] IS NULL OR v.id = ANY($1::int[]))
+            ORDER BY v.id
+            """,
+            visitor_ids
+        )
+
+    trained = []
+    for row in rows:
+        result = await asyncio.to_thread(train_face_model, row["profile_image_url"])
+        if result is None:
+            print(f"No usable face in the profile images of visitor {row['id']}, not trained")
+            continue
+        model_gz, samples = result
+        async with pool.acquire() as conn:
+            await conn.execute(
+                """
+                INSERT INTO visitor_face_models (visitor_id, model_gz, etag, sample_count, source_hash)
+                VALUES ($1, $2, $3, $4, $5)
+                ON CONFLICT (visitor_id) DO UPDATE
+                SET model_gz = EXCLUDED.model_gz,
+                    etag = EXCLUDED.etag,
+                    sample_count = EXCLUDED.sample_count,
+                    source_hash = EXCLUDED.source_hash,
+                    trained_at = CURRENT_TIMESTAMP
+                """,
+                row["id"], model_gz, f'"{hashlib.sha256(model_gz).hexdigest()[:32]}"',
+                samples, row["source_hash"]
+            )
+        trained.append(row["id"])
+    return trained
+
+
+# =========================
+# Distribution
+# =========================
+async def get_owner_manifest(owner_id: int) -> Optional[Dict[str, Any]]:
+    """The owner's trained visitor models and their ETags, or None until one is trained"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            SELECT e.visitor_id, v.name, e.auto_unlock, m.etag, m.trained_at
+            FROM owner_edge_visitors e
+            JOIN visitors v ON v.id = e.visitor_id
+            JOIN visitor_face_models m ON m.visitor_id = e.visitor_id
+            WHERE e.owner_id = $1
+            ORDER BY e.visitor_id
+            """,
+            owner_id
+        )
+    if not rows:
+        return None
+
+    visitors = [
+        {
+            "visitor_id": row["visitor_id"],
+            "name": row["name"],
+            "auto_unlock": row["auto_unlock"],
+            "etag": row["etag"]
+        }
+        for row in rows
+    ]
+    manifest = {
+        "owner_id": owner_id,
+        "version": int(max(row["trained_at"] for row in rows).timestamp()),
+        "confidence_threshold": EDGE_CONFIDENCE_THRESHOLD,
+        "visitors": visitors
+    }
+    digest = hashlib.sha256(json.dumps(manifest, sort_keys=True).encode("utf-8"))
+    manifest["etag"] = f'"{digest.hexdigest()[:32]}"'
+    return manifest
+
+
+async def get_visitor_model(owner_id: int, visitor_id: int) -> Optional[Dict[str, Any]]:
+    """A visitor's gzipped model and ETag, only when the owner has enrolled them"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            """
+            SELECT m.model_gz, m.etag
+            FROM owner_edge_visitors e
+            JOIN visitor_face_models m ON m.visitor_id = e.visitor_id
+            WHERE e.owner_id = $1 AND e.visitor_id = $2
+            """,
+            owner_id, visitor_id
+        )
+    return dict(row) if row else None
+
+
+async def _main(argv: List[str]):
+    command = argv[0] if argv else "train"
+    try:
+        if command == "train":
+            trained = await train_pending_models([int(arg) for arg in argv[1:]] or None)
+            print(f"Trained models for visitors: {trained}" if trained else "Every enrolled visitor is up to date")
+        else:
+            print("usage: python -m app.ml.model_store train [visitor_id ...]")
+    finally:
+        await close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main(sys.argv[1:]))
@@ -0,0 +1,86 @@
+# app/notifications/receipts.py
+from typing import Dict, List, Tuple
+import httpx
+from app.db.init_db import get_pool
+from app.db.crud import remove_invalid_tokens
+
+# =========================
+# Expo Push Receipts
+# =========================
+# A successful send only yields a ticket; whether Expo could deliver it is
+# reported later by the receipt. Tickets are stored when notifications go
+# out and reconciled by the scheduler: tokens whose receipts say
+# DeviceNotRegistered are removed, everything checked is forgotten.
+EXPO_RECEIPTS_URL = "https://exp.host/--/api/v2/push/getReceipts"
+RECEIPT_DELAY_MINUTES = 15   # receipts aren't ready before this
+RECEIPT_EXPIRY_HOURS = 24    # Expo drops receipts after a day
+RECEIPT_BATCH_SIZE = 1000    # Expo's limit of ids per request
+
+
+async def record_tickets(tickets: List[Tuple[str, str]]):
+    """Remember (ticket_id, expo_push_token) pairs until their receipts are checked"""
+    if not tickets:
+        return
+    ticket_ids, tokens = zip(*tickets)
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        await conn.execute(
+            """
+            INSERT INTO push_tickets (ticket_id, expo_push_token)
+            SELECT * FROM unnest($1::text[], $2::text[])
+            ON CONFLICT (ticket_id) DO NOTHING
+            """,
+            list(ticket_ids), list(tokens)
+        )
+
+
+async def _fetch_receipts(client: httpx.AsyncClient, ticket_ids: List[str]) -> Dict[str, Dict]:
+    response = await client.post(
+        EXPO_RECEIPTS_URL,
+        json={"ids": ticket_ids},
+        headers={"Accept": "application/json", "Content-Type": "application/json"}
+    )
+    response.raise_for_status()
+    return response.json().get("data", {})
+
+
+async def reconcile_receipts() -> Dict[str, int]:
+    """Check due tickets, drop unregistered tokens, returns counts for logging"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        expired = await conn.execute(
+            "DELETE FROM push_tickets WHERE created_at < CURRENT_TIMESTAMP - make_interval(hours => $1)",
+            RECEIPT_EXPIRY_HOURS
+        )
+        due = await conn.fetch(
+            """
+            SELECT ticket_id, expo_push_token FROM push_tickets
+            WHERE created_at < CURRENT_TIMESTAMP - make_interval(mins => $1)
+            ORDER BY created_at
+            """,
+            RECEIPT_DELAY_MINUTES
+        )
+
+    checked, invalid_tokens = [], set()
+    async with httpx.AsyncClient(timeout=30) as client:
+        for start in range(0, len(due), RECEIPT_BATCH_SIZE):
+            batch = due[start:start + RECEIPT_BATCH_SIZE]
+            receipts = await _fetch_receipts(client, [row["ticket_id"] for row in batch])
+            for row in batch:
+                receipt = receipts.get(row["ticket_id"])
+                if receipt is None:
+                    continue  # not ready yet, try again next run
+                checked.append(row["ticket_id"])
+                if receipt.get("status") == "error" and \
+                        receipt.get("details", {}).get("error") == "DeviceNotRegistered":
+                    invalid_tokens.add(row["expo_push_token"])
+
+    removed = await remove_invalid_tokens(list(invalid_tokens)) if invalid_tokens else 0
+    if checked:
+        async with pool.acquire() as conn:
+            await conn.execute("DELETE FROM push_tickets WHERE ticket_id = ANY($1::text[])", checked)
+    return {
+        "checked": len(checked),
+        "tokens_removed": removed,
+        "expired": int(expired.split()[-1]) if expired.startswith("DELETE") else 0,
+    }
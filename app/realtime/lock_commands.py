@@ -0,0 +1,97 @@
+# app/realtime/lock_commands.py
+import asyncio
+import time
+from collections import deque
+from typing import Dict, List, Optional, Any
+from app.db.init_db import get_pool
+
+# =========================
+# Lock Command Channel
+# =========================
+# Commands are kept per owner in a short in-memory log. Every lock device of
+# the owner reads the log from its own cursor and acknowledges what it has
+# executed, so a command is never lost between "read" and "clear" and a
+# reconnecting device gets anything it has not acknowledged yet.
+#
+# Sequence numbers come from a Postgres sequence, so they increase across
+# workers and restarts. New commands are relayed to every worker over the
+# visit event channel (see visit_events.publish_lock_command): a device
+# parked on any worker gets a command issued on any other.
+
+MAX_COMMANDS_PER_OWNER = 32
+COMMAND_TTL_SECONDS = 120  # an unlock older than this is stale, never deliver it
+
+LOCK_ACTIONS = {"unlock": 1, "lock": 0}
+
+
+class OwnerCommandLog:
+    """Sequence-numbered commands for one owner plus per-device acknowledgements"""
+
+    def __init__(self):
+        self.commands: deque = deque(maxlen=MAX_COMMANDS_PER_OWNER)
+        self.acked: Dict[str, int] = {}
+        self._signal: Optional[asyncio.Future] = None
+
+    def append(self, command: Dict[str, Any]):
+        self.commands.append(command)
+        if len(self.commands) > 1 and self.commands[-2]["seq"] > command["seq"]:
+            # Relayed from two workers out of order, keep the log in sequence order
+            self.commands = deque(sorted(self.commands, key=lambda c: c["seq"]), maxlen=MAX_COMMANDS_PER_OWNER)
+
+        if self._signal is not None and not self._signal.done():
+            self._signal.set_result(None)
+        self._signal = None
+
+    def pending(self, device_id: str, after: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Unexpired commands past both the device's cursor and its last acknowledgement"""
+        cursor = max(after or 0, self.acked.get(device_id, 0))
+        oldest = time.time() - COMMAND_TTL_SECONDS
+        return [c for c in self.commands if c["seq"] > cursor and c["issued_at"] >= oldest]
+
+    def ack(self, device_id: str, seq: int) -> int:
+        self.acked[device_id] = max(self.acked.get(device_id, 0), seq)
+        return self.acked[device_id]
+
+    async def wait(self, device_id: str, after: Optional[int], timeout: float) -> List[Dict[str, Any]]:
+        """Return pending commands, parking the caller until one arrives or the timeout expires"""
+        commands = self.pending(device_id, after)
+        if commands:
+            return commands
+
+        if self._signal is None:
+            self._signal = asyncio.get_running_loop().create_future()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._signal), timeout)
+        except asyncio.TimeoutError:
+            return []
+        return self.pending(device_id, after)
+
+
+class LockCommandHub:
+    def __init__(self):
+        self.logs: Dict[int, OwnerCommandLog] = {}
+
+    def log(self, owner_id: int) -> OwnerCommandLog:
+        if owner_id not in self.logs:
+            self.logs[owner_id] = OwnerCommandLog()
+        return self.logs[owner_id]
+
+    async def new_command(self, action: str, visit_id: Optional[int] = None) -> Dict[str, Any]:
+        """Number a command from the shared sequence (delivered through visit_events)"""
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            seq = await conn.fetchval("SELECT nextval('lock_command_seq')")
+        return {
+            "seq": seq,
+            "action": action,
+            "value": LOCK_ACTIONS[action],
+            "visit_id": visit_id,
+            "issued_at": time.time()
+        }
+
+    def deliver(self, owner_id: int, command: Dict[str, Any]):
+        """Queue a command for every lock of the owner on this worker and wake any parked device"""
+        self.log(owner_id).append(command)
+
+
+hub = LockCommandHub()
@@ -0,0 +1,157 @@
+# app/realtime/visit_events.py
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Any
+import asyncpg
+from dotenv import load_dotenv
+from fastapi.encoders import jsonable_encoder
+from app.db.init_db import get_pool
+from app.realtime.lock_commands import hub as lock_hub
+from app.realtime.visit_feed import hub as feed_hub
+
+load_dotenv()
+
+# =========================
+# Visit Events
+# =========================
+# visit.created and visit.status_changed events feed the per-owner visit
+# feed; status changes also wake requests waiting for a visit decision,
+# which park on one shared future per visit.
+#
+# With a single worker events are dispatched in-process. With several workers
+# set VISIT_EVENTS_DB_URL to a *direct* Postgres connection (LISTEN does not
+# work through a transaction pooler such as pgbouncer/Supabase :6543): events
+# are then published with pg_notify and every worker, including the sender,
+# dispatches them from its LISTEN connection.
+#
+# Lock commands ride the same channel, so an approval handled by one worker
+# reaches a lock whose connection is parked on another.
+VISIT_EVENTS_DB_URL = os.getenv("VISIT_EVENTS_DB_URL")
+CHANNEL = "visit_events"
+RECONNECT_SECONDS = 5
+
+# visit_id -> [future, number of parked requests]
+_waiters: Dict[int, List[Any]] = {}
+_listener: Optional[asyncpg.Connection] = None
+_reconnect_task: Optional[asyncio.Task] = None
+
+
+def _dispatch(event: Dict[str, Any]):
+    if event["type"] == "lock.command":
+        lock_hub.deliver(event["owner_id"], event["command"])
+        return
+    if event["type"] == "visit.status_changed" and event["status"] != "pending":
+        # Waiters only care about a decision, a visit set back to pending keeps them parked
+        entry = _waiters.pop(event["visit_id"], None)
+        if entry is not None and not entry[0].done():
+            entry[0].set_result(event)
+    feed_hub.publish(event)
+
+
+@asynccontextmanager
+async def watch_visit(visit_id: int):
+    """Yield a future resolved with the next status event for the visit
+
+    Register before reading the current status so a change in between is not missed.
+    """
+    entry = _waiters.get(visit_id)
+    if entry is None:
+        entry = _waiters[visit_id] = [asyncio.get_running_loop().create_future(), 0]
+    entry[1] += 1
+    try:
+        yield entry[0]
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0 and _waiters.get(visit_id) is entry:
+            del _waiters[visit_id]
+
+
+def _event(event_type: str, visit: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "type": event_type,
+        "visit_id": visit["id"],
+        "owner_id": visit["owner_id"],
+        "status": visit["status"],
+        "visit": jsonable_encoder(visit)
+    }
+
+
+async def _publish(event: Dict[str, Any]):
+    if _listener is None:
+        _dispatch(event)
+        return
+
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        await conn.execute("SELECT pg_notify($1, $2)", CHANNEL, json.dumps(event))
+
+
+async def publish_visit_created(visit: Dict[str, Any]):
+    """Announce a new visit to the owner's feed (on every worker when LISTEN is enabled)"""
+    await _publish(_event("visit.created", visit))
+
+
+async def publish_status_change(visit: Dict[str, Any]):
+    """Wake everything waiting on this visit and update the owner's feed"""
+    await _publish(_event("visit.status_changed", visit))
+
+
+async def publish_resync(owner_id: int):
+    """Tell the owner's feed clients to refetch, for changes too large to send as events (bulk imports)"""
+    await _publish({"type": "resync", "owner_id": owner_id})
+
+
+async def publish_lock_command(owner_id: int, action: str, visit_id: Optional[int] = None) -> Dict[str, Any]:
+    """Queue a command for every lock of the owner, whichever worker its device is connected to"""
+    command = await lock_hub.new_command(action, visit_id)
+    await _publish({"type": "lock.command", "owner_id": owner_id, "command": command})
+    return command
+
+
+# =========================
+# LISTEN connection
+# =========================
+def _on_notify(conn, pid, channel, payload):
+    try:
+        _dispatch(json.loads(payload))
+    except (ValueError, KeyError) as e:
+        print(f"Ignoring malformed visit event: {e}")
+
+
+def _on_terminate(conn):
+    global _listener, _reconnect_task
+    print("Visit event listener disconnected, falling back to in-process dispatch")
+    _listener = None
+    _reconnect_task = asyncio.get_running_loop().create_task(_reconnect())
+
+
+async def _reconnect():
+    while _listener is None:
+        await asyncio.sleep(RECONNECT_SECONDS)
+        try:
+            await start_listener()
+        except (OSError, asyncpg.PostgresError) as e:
+            print(f"Visit event listener reconnect failed: {e}")
+
+
+async def start_listener():
+    """Open the LISTEN connection when VISIT_EVENTS_DB_URL is configured"""
+    global _listener
+    if not VISIT_EVENTS_DB_URL or _listener is not None:
+        return
+    conn = await asyncpg.connect(VISIT_EVENTS_DB_URL)
+    await conn.add_listener(CHANNEL, _on_notify)
+    conn.add_termination_listener(_on_terminate)
+    _listener = conn
+
+
+async def stop_listener():
+    global _listener
+    if _reconnect_task is not None:
+        _reconnect_task.cancel()
+    if _listener is not None:
+        conn, _listener = _listener, None
+        conn.remove_termination_listener(_on_terminate)
+        await conn.close()
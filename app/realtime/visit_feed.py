@@ -0,0 +1,136 @@
+# app/realtime/visit_feed.py
+import asyncio
+import time
+import uuid
+from collections import deque
+from typing import Dict, List, Optional, Set, Tuple, Any
+
+# =========================
+# Per-owner Visit Feed
+# =========================
+# Fan-out hub for visit.created / visit.status_changed deltas. An idle
+# subscriber costs one small bounded queue; a subscriber that falls too far
+# behind is told to resync instead of buffering without limit.
+#
+# Every event gets a cursor. A reconnecting client sends the last cursor it
+# saw and gets the missed events replayed from a short per-owner history, or
+# a "resync" when the history no longer reaches back that far (then it
+# refetches through the REST endpoints).
+#
+# Cursors are "<worker id>:<sequence>" and only mean something to the worker
+# (process) that issued them. Each worker numbers the events it dispatches
+# on its own, so a cursor from another worker or an earlier process always
+# gets a resync rather than a replay that could silently skip events.
+#
+# An owner's history is dropped once they have had no subscribers and no
+# events for HISTORY_IDLE_SECONDS; cursors from before that get a resync.
+
+SUBSCRIBER_QUEUE_SIZE = 100
+HISTORY_PER_OWNER = 200
+HISTORY_IDLE_SECONDS = 3600
+HISTORY_SWEEP_SECONDS = 60
+
+RESYNC = {"type": "resync"}
+
+
+class Subscriber:
+    def __init__(self, owner_id: int):
+        self.owner_id = owner_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def deliver(self, event: Dict[str, Any]):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too slow: drop the backlog and make the client refetch
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+
+class VisitFeedHub:
+    def __init__(self):
+        self.worker_id = uuid.uuid4().hex[:12]
+        self.next_seq = 1
+        self.subscribers: Dict[int, Set[Subscriber]] = {}
+        self.history: Dict[int, deque] = {}
+        # owner_id -> newest sequence no longer in history
+        self.evicted: Dict[int, int] = {}
+        # owner_id -> monotonic time of the last event or subscriber
+        self.last_active: Dict[int, float] = {}
+        # Newest sequence when idle histories were last dropped
+        self.forgotten_seq = 0
+        self._last_sweep = time.monotonic()
+
+    def _sequence_of(self, cursor: str) -> Optional[int]:
+        """Sequence number of a cursor issued by this worker, None for anything else"""
+        worker_id, _, seq = cursor.partition(":")
+        if worker_id != self.worker_id or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def publish(self, event: Dict[str, Any]):
+        owner_id = event["owner_id"]
+        seq = self.next_seq
+        self.next_seq += 1
+        event = {**event, "cursor": f"{self.worker_id}:{seq}"}
+
+        if owner_id not in self.history and self.forgotten_seq:
+            # The owner's earlier history may have been dropped
+            self.evicted[owner_id] = self.forgotten_seq
+        history = self.history.setdefault(owner_id, deque())
+        if len(history) == HISTORY_PER_OWNER:
+            self.evicted[owner_id] = history.popleft()[0]
+        history.append((seq, event))
+
+        for subscriber in self.subscribers.get(owner_id, ()):
+            subscriber.deliver(event)
+        self._touch(owner_id)
+
+    def subscribe(self, owner_id: int, cursor: Optional[str] = None) -> Tuple[Subscriber, Optional[List[Dict[str, Any]]]]:
+        """Register a subscriber, returns (subscriber, events to replay or None when a resync is needed)"""
+        subscriber = Subscriber(owner_id)
+        self.subscribers.setdefault(owner_id, set()).add(subscriber)
+
+        if cursor is None:
+            return subscriber, []
+        seq = self._sequence_of(cursor)
+        # Without history, the owner's events up to forgotten_seq may have been dropped
+        floor = self.evicted.get(owner_id, 0 if owner_id in self.history else self.forgotten_seq)
+        if seq is None or seq < floor or seq >= self.next_seq:
+            return subscriber, None
+        return subscriber, [event for event_seq, event in self.history.get(owner_id, ()) if event_seq > seq]
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscribers = self.subscribers.get(subscriber.owner_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.subscribers[subscriber.owner_id]
+                self._touch(subscriber.owner_id)
+
+    def _touch(self, owner_id: int):
+        now = time.monotonic()
+        self.last_active[owner_id] = now
+        if now - self._last_sweep >= HISTORY_SWEEP_SECONDS:
+            self._last_sweep = now
+            self.drop_idle_history(now)
+
+    def drop_idle_history(self, now: float):
+        """Forget the history of owners with no subscribers and no events for HISTORY_IDLE_SECONDS"""
+        idle = [
+            owner_id for owner_id, active in self.last_active.items()
+            if now - active >= HISTORY_IDLE_SECONDS and owner_id not in self.subscribers
+        ]
+        if idle:
+            self.forgotten_seq = self.next_seq - 1
+        for owner_id in idle:
+            self.history.pop(owner_id, None)
+            self.evicted.pop(owner_id, None)
+            del self.last_active[owner_id]
+
+    def connection_count(self) -> int:
+        return sum(len(s) for s in self.subscribers.values())
+
+
+hub = VisitFeedHub()
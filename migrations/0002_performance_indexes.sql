@@ -0,0 +1,31 @@
+-- 0002 indexes for the hot queries.
+-- Plain CREATE INDEX (not CONCURRENTLY) because migrations run inside a
+-- transaction; on large tables run this file by hand with CONCURRENTLY.
+
+-- Owner visit listings: WHERE owner_id = $1 ORDER BY timestamp DESC, id DESC
+CREATE INDEX IF NOT EXISTS idx_visits_owner_timestamp
+    ON visits (owner_id, timestamp DESC, id DESC);
+
+-- Pending visits per owner, stays tiny because decided visits drop out
+CREATE INDEX IF NOT EXISTS idx_visits_owner_pending
+    ON visits (owner_id, timestamp DESC, id DESC)
+    WHERE status = 'pending';
+
+-- One row per (owner, push token); keep the newest row of any duplicates
+DELETE FROM device_tokens a
+    USING device_tokens b
+    WHERE a.owner_id = b.owner_id
+      AND a.expo_push_token = b.expo_push_token
+      AND a.id < b.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_device_tokens_owner_token
+    ON device_tokens (owner_id, expo_push_token);
+
+-- Active tokens per owner (notification fan-out)
+CREATE INDEX IF NOT EXISTS idx_device_tokens_owner_active
+    ON device_tokens (owner_id)
+    WHERE is_active;
+
+-- Visitor lookup by recognised name
+CREATE INDEX IF NOT EXISTS idx_visitors_name
+    ON visitors (name);
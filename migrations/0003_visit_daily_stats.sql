@@ -0,0 +1,74 @@
+-- 0003 per-owner, per-day visit counters.
+-- Maintained by triggers so every writer (CRUD layer, the detect endpoint's
+-- direct INSERT, manual SQL) keeps them exact. Days are UTC dates.
+
+CREATE TABLE IF NOT EXISTS visit_daily_stats (
+    owner_id INTEGER NOT NULL REFERENCES owners (id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    total_visits INTEGER NOT NULL DEFAULT 0,
+    pending_visits INTEGER NOT NULL DEFAULT 0,
+    granted_visits INTEGER NOT NULL DEFAULT 0,
+    denied_visits INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (owner_id, day)
+);
+
+CREATE OR REPLACE FUNCTION visit_daily_stats_apply(p_owner_id INTEGER, p_ts TIMESTAMPTZ, p_status TEXT, p_sign INTEGER)
+RETURNS void AS $$
+BEGIN
+    INSERT INTO visit_daily_stats AS s (owner_id, day, total_visits, pending_visits, granted_visits, denied_visits)
+    VALUES (
+        p_owner_id,
+        (COALESCE(p_ts, CURRENT_TIMESTAMP) AT TIME ZONE 'UTC')::date,
+        p_sign,
+        CASE WHEN p_status = 'pending' THEN p_sign ELSE 0 END,
+        CASE WHEN p_status = 'granted' THEN p_sign ELSE 0 END,
+        CASE WHEN p_status = 'denied' THEN p_sign ELSE 0 END
+    )
+    ON CONFLICT (owner_id, day) DO UPDATE SET
+        total_visits = s.total_visits + EXCLUDED.total_visits,
+        pending_visits = s.pending_visits + EXCLUDED.pending_visits,
+        granted_visits = s.granted_visits + EXCLUDED.granted_visits,
+        denied_visits = s.denied_visits + EXCLUDED.denied_visits;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION visits_rollup_trigger()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM visit_daily_stats_apply(OLD.owner_id, OLD.timestamp, OLD.status, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM visit_daily_stats_apply(NEW.owner_id, NEW.timestamp, NEW.status, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS visits_rollup_insert_delete ON visits;
+CREATE TRIGGER visits_rollup_insert_delete
+    AFTER INSERT OR DELETE ON visits
+    FOR EACH ROW EXECUTE FUNCTION visits_rollup_trigger();
+
+DROP TRIGGER IF EXISTS visits_rollup_update ON visits;
+CREATE TRIGGER visits_rollup_update
+    AFTER UPDATE OF status, owner_id, timestamp ON visits
+    FOR EACH ROW
+    WHEN (OLD.status IS DISTINCT FROM NEW.status
+          OR OLD.owner_id IS DISTINCT FROM NEW.owner_id
+          OR OLD.timestamp IS DISTINCT FROM NEW.timestamp)
+    EXECUTE FUNCTION visits_rollup_trigger();
+
+-- Backfill with writers blocked so no visit is counted twice or missed
+LOCK TABLE visits IN SHARE ROW EXCLUSIVE MODE;
+DELETE FROM visit_daily_stats;
+INSERT INTO visit_daily_stats (owner_id, day, total_visits, pending_visits, granted_visits, denied_visits)
+SELECT
+    owner_id,
+    (COALESCE(timestamp, CURRENT_TIMESTAMP) AT TIME ZONE 'UTC')::date,
+    COUNT(*),
+    COUNT(*) FILTER (WHERE status = 'pending'),
+    COUNT(*) FILTER (WHERE status = 'granted'),
+    COUNT(*) FILTER (WHERE status = 'denied')
+FROM visits
+GROUP BY 1, 2;
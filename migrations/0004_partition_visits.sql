@@ -0,0 +1,91 @@
+-- 0004 monthly range partitions for visits, plus per-owner retention.
+-- visits is rebuilt as a table partitioned on timestamp (UTC months, named
+-- visits_pYYYYMM). Future months are created ahead of time by
+-- app.db.partitions; old months are archived to object storage and dropped.
+-- The primary key has to include the partition key, so it becomes
+-- (id, timestamp); ids still come from the same sequence and stay unique.
+-- Takes an exclusive lock on visits while rows are copied across.
+
+LOCK TABLE visits IN ACCESS EXCLUSIVE MODE;
+
+CREATE OR REPLACE FUNCTION ensure_visit_partition(p_month DATE)
+RETURNS TEXT AS $$
+DECLARE
+    month_start DATE := date_trunc('month', p_month)::date;
+    partition_name TEXT := 'visits_p' || to_char(month_start, 'YYYYMM');
+BEGIN
+    IF to_regclass(partition_name) IS NULL THEN
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF visits FOR VALUES FROM (%L) TO (%L)',
+            partition_name,
+            month_start::timestamp AT TIME ZONE 'UTC',
+            (month_start + INTERVAL '1 month')::timestamp AT TIME ZONE 'UTC'
+        );
+    END IF;
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+ALTER TABLE visits RENAME TO visits_unpartitioned;
+
+CREATE TABLE visits (
+    id INTEGER NOT NULL DEFAULT nextval('visits_id_seq'),
+    visitor_id INTEGER REFERENCES visitors (id) ON DELETE SET NULL,
+    owner_id INTEGER NOT NULL REFERENCES owners (id) ON DELETE CASCADE,
+    image_url TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    detected_label TEXT,
+    timestamp TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+-- Safety net for rows outside every monthly partition (e.g. a device with
+-- a wrong clock); should stay empty
+CREATE TABLE visits_default PARTITION OF visits DEFAULT;
+
+-- Every month from the oldest visit up to three months ahead
+SELECT ensure_visit_partition(month::date)
+FROM generate_series(
+    date_trunc('month', COALESCE(
+        (SELECT MIN(timestamp) FROM visits_unpartitioned), CURRENT_TIMESTAMP
+    ) AT TIME ZONE 'UTC'),
+    date_trunc('month', CURRENT_TIMESTAMP AT TIME ZONE 'UTC') + INTERVAL '3 months',
+    INTERVAL '1 month'
+) month;
+
+-- visit_daily_stats already counts these rows; the rollup triggers are
+-- only attached to the new table after the copy
+INSERT INTO visits (id, visitor_id, owner_id, image_url, status, detected_label, timestamp)
+SELECT id, visitor_id, owner_id, image_url, status, detected_label, COALESCE(timestamp, CURRENT_TIMESTAMP)
+FROM visits_unpartitioned;
+
+ALTER SEQUENCE visits_id_seq OWNED BY visits.id;
+DROP TABLE visits_unpartitioned;
+
+CREATE INDEX idx_visits_owner_timestamp
+    ON visits (owner_id, timestamp DESC, id DESC);
+
+CREATE INDEX idx_visits_owner_pending
+    ON visits (owner_id, timestamp DESC, id DESC)
+    WHERE status = 'pending';
+
+CREATE TRIGGER visits_rollup_insert_delete
+    AFTER INSERT OR DELETE ON visits
+    FOR EACH ROW EXECUTE FUNCTION visits_rollup_trigger();
+
+CREATE TRIGGER visits_rollup_update
+    AFTER UPDATE OF status, owner_id, timestamp ON visits
+    FOR EACH ROW
+    WHEN (OLD.status IS DISTINCT FROM NEW.status
+          OR OLD.owner_id IS DISTINCT FROM NEW.owner_id
+          OR OLD.timestamp IS DISTINCT FROM NEW.timestamp)
+    EXECUTE FUNCTION visits_rollup_trigger();
+
+-- Per-owner retention: visits older than retention_days are deleted by
+-- app.db.partitions. Owners without a row keep visits until their month
+-- is archived.
+CREATE TABLE IF NOT EXISTS owner_retention_policies (
+    owner_id INTEGER PRIMARY KEY REFERENCES owners (id) ON DELETE CASCADE,
+    retention_days INTEGER NOT NULL CHECK (retention_days > 0),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
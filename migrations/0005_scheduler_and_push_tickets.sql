@@ -0,0 +1,25 @@
+-- 0005 bookkeeping for the in-process maintenance scheduler and Expo
+-- push receipt reconciliation.
+
+-- Last run of every scheduled job across all workers. A worker only runs a
+-- job when it claims the job's lease on this row (lease_until, added in
+-- 0009) and the last finished run is older than the job's interval, so each
+-- job runs once per interval fleet-wide.
+CREATE TABLE IF NOT EXISTS scheduler_runs (
+    job TEXT PRIMARY KEY,
+    last_started_at TIMESTAMPTZ,
+    last_finished_at TIMESTAMPTZ,
+    last_duration_ms DOUBLE PRECISION,
+    last_error TEXT
+);
+
+-- Expo push tickets waiting for their delivery receipt. Receipts become
+-- available ~15 minutes after sending and expire after a day.
+CREATE TABLE IF NOT EXISTS push_tickets (
+    ticket_id TEXT PRIMARY KEY,
+    expo_push_token TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_push_tickets_created_at
+    ON push_tickets (created_at);
@@ -0,0 +1,17 @@
+-- 0006 trigram indexes for visitor / visit search.
+-- Search matches lower(...) so the expressions here must stay in sync with
+-- app/db/search.py. btree_gin lets owner_id share the GIN index with the
+-- label trigrams, so owner-scoped label searches stay on one index.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS btree_gin;
+
+CREATE INDEX IF NOT EXISTS idx_visitors_name_trgm
+    ON visitors USING gin (lower(name) gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_visits_owner_label_trgm
+    ON visits USING gin (owner_id, lower(detected_label) gin_trgm_ops);
+
+-- Visits of the visitors whose name matched, per owner
+CREATE INDEX IF NOT EXISTS idx_visits_visitor_owner
+    ON visits (visitor_id, owner_id);
@@ -0,0 +1,23 @@
+-- 0007 record when a pending visit was decided, for response-time analytics.
+-- Set by trigger on the first change away from 'pending', so every writer
+-- (approve / deny / PUT status / manual SQL) is covered. Visits created
+-- already decided (e.g. unlocked on the device) keep decided_at NULL and
+-- don't count towards response times.
+
+ALTER TABLE visits ADD COLUMN IF NOT EXISTS decided_at TIMESTAMPTZ;
+
+CREATE OR REPLACE FUNCTION visits_set_decided_at()
+RETURNS trigger AS $$
+BEGIN
+    IF OLD.status = 'pending' AND NEW.status <> 'pending' AND NEW.decided_at IS NULL THEN
+        NEW.decided_at := clock_timestamp();
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS visits_decided_at ON visits;
+CREATE TRIGGER visits_decided_at
+    BEFORE UPDATE OF status ON visits
+    FOR EACH ROW
+    EXECUTE FUNCTION visits_set_decided_at();
@@ -0,0 +1,30 @@
+-- 0008 per-owner edge recognition models.
+-- An owner enrols the visitors their lock should recognise on-device. Each
+-- enrolled visitor gets a small LBPH model of their own, so an owner's edge
+-- model is just the set of their visitors' models and a device only
+-- downloads the ones that changed.
+
+CREATE TABLE IF NOT EXISTS owner_edge_visitors (
+    owner_id INTEGER NOT NULL REFERENCES owners (id) ON DELETE CASCADE,
+    visitor_id INTEGER NOT NULL REFERENCES visitors (id) ON DELETE CASCADE,
+    -- Opt-in: a confident on-device match opens the lock without waiting
+    -- for the owner. The visit is recorded and the owner notified either way.
+    auto_unlock BOOLEAN NOT NULL DEFAULT FALSE,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (owner_id, visitor_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_owner_edge_visitors_visitor
+    ON owner_edge_visitors (visitor_id);
+
+-- Trained from the visitor's profile images; source_hash is md5 of the
+-- profile_image_url it was trained from, so a changed profile retrains.
+CREATE TABLE IF NOT EXISTS visitor_face_models (
+    visitor_id INTEGER PRIMARY KEY REFERENCES visitors (id) ON DELETE CASCADE,
+    model_gz BYTEA NOT NULL,
+    etag TEXT NOT NULL,
+    sample_count INTEGER NOT NULL,
+    source_hash TEXT NOT NULL,
+    trained_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
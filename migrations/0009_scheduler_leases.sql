@@ -0,0 +1,9 @@
+-- 0009 lease-based job claims for the maintenance scheduler.
+-- A worker claims a run by setting lease_until in one short statement and
+-- runs the job without holding a transaction open; the lease is cleared
+-- when the run is recorded. The lease is short and renewed while the job
+-- runs (SCHEDULER_LEASE_SECONDS), so a crashed worker's claim lapses soon.
+-- Replaces the advisory lock held for the whole run, which kept a pooled
+-- connection idle in a transaction meanwhile.
+
+ALTER TABLE scheduler_runs ADD COLUMN IF NOT EXISTS lease_until TIMESTAMPTZ;
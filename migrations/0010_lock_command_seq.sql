@@ -0,0 +1,7 @@
+-- 0010 fleet-wide sequence numbers for lock commands.
+-- Every worker numbers commands from this sequence, so numbers keep
+-- increasing across workers, restarts and clock steps. It starts above the
+-- millisecond timestamps commands were numbered with before, which devices
+-- may still hold as their last executed command.
+
+CREATE SEQUENCE IF NOT EXISTS lock_command_seq START WITH 10000000000000;
@@ -0,0 +1,59 @@
+import asyncio
+import os
+import asyncpg
+import pytest
+
+# =========================
+# Postgres test helpers
+# =========================
+# Tests that run SQL need a real Postgres: set TEST_DATABASE_URL. Tables are
+# created as TEMP tables, which shadow the real ones for the session, so the
+# database's own data is never touched.
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+requires_postgres = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL not set")
+
+
+async def connect(*setup: str) -> asyncpg.Connection:
+    """Connect in UTC and run each setup statement (normally CREATE TEMP TABLE ...)"""
+    conn = await asyncpg.connect(TEST_DATABASE_URL, server_settings={"timezone": "UTC"})
+    for statement in setup:
+        await conn.execute(statement)
+    return conn
+
+
+class _Acquire:
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def __aenter__(self):
+        await self.pool.lock.acquire()
+        return self.pool.conn
+
+    async def __aexit__(self, *exc):
+        self.pool.lock.release()
+        return False
+
+
+class OneConnectionPool:
+    """Hands out one connection, one user at a time (temp tables live on that connection)"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.lock = asyncio.Lock()
+
+    def acquire(self):
+        return _Acquire(self)
+
+
+def use_connection(monkeypatch, conn, *modules, attributes=("get_pool",)):
+    """Point each module's pool getters at conn"""
+    pool = OneConnectionPool(conn)
+
+    async def get_pool(*args):
+        return pool
+
+    for module in modules:
+        for attribute in attributes:
+            monkeypatch.setattr(module, attribute, get_pool)
+    return pool
@@ -0,0 +1,180 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+import pytest
+from app.core.cache import Cache, MemoryBackend
+from app.db import analytics
+from app.db.analytics import BUCKET_SIZES, CHUNK_BUCKETS, bucket_floor, bucket_ceil, chunk_floor, merge_buckets
+from tests.postgres import requires_postgres, connect, use_connection
+
+# =========================
+# Bucket boundaries
+# =========================
+MOMENT = datetime(2025, 3, 13, 14, 30, 5, tzinfo=timezone.utc)  # a Thursday
+
+
+@pytest.mark.parametrize("bucket, floor, ceil", [
+    ("hour", datetime(2025, 3, 13, 14, tzinfo=timezone.utc), datetime(2025, 3, 13, 15, tzinfo=timezone.utc)),
+    ("day", datetime(2025, 3, 13, tzinfo=timezone.utc), datetime(2025, 3, 14, tzinfo=timezone.utc)),
+    ("week", datetime(2025, 3, 10, tzinfo=timezone.utc), datetime(2025, 3, 17, tzinfo=timezone.utc)),
+])
+def test_bucket_floor_and_ceil(bucket, floor, ceil):
+    assert bucket_floor(MOMENT, bucket) == floor
+    assert bucket_ceil(MOMENT, bucket) == ceil
+    # A boundary is its own floor and ceil
+    assert bucket_floor(floor, bucket) == bucket_ceil(floor, bucket) == floor
+
+
+def test_bucket_floor_works_in_utc():
+    local = datetime(2025, 3, 10, 1, 0, tzinfo=timezone(timedelta(hours=2)))  # Sunday 23:00 UTC
+    assert bucket_floor(local, "day") == datetime(2025, 3, 9, tzinfo=timezone.utc)
+    assert bucket_floor(local, "week") == datetime(2025, 3, 3, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize("bucket", list(BUCKET_SIZES))
+def test_chunks_are_aligned_and_hold_whole_buckets(bucket):
+    span = BUCKET_SIZES[bucket] * CHUNK_BUCKETS
+    start = chunk_floor(MOMENT, bucket)
+
+    assert start <= MOMENT < start + span
+    assert bucket_floor(start, bucket) == start
+    assert chunk_floor(start + span, bucket) == start + span
+    assert chunk_floor(start + span - timedelta(microseconds=1), bucket) == start
+
+
+# =========================
+# Merging chunks
+# =========================
+def _row(start, total):
+    return {"bucket_start": start, "total_visits": total}
+
+
+def test_merge_computes_running_totals_across_parts():
+    hour = timedelta(hours=1)
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    parts = [[_row(base, 2), _row(base + hour, 0)], [], [_row(base + 2 * hour, 5)]]
+
+    merged = merge_buckets(parts)
+
+    assert [row["cumulative_visits"] for row in merged] == [2, 2, 7]
+    assert [row["change_from_previous"] for row in merged] == [None, -2, 5]
+    assert "cumulative_visits" not in parts[0][0]
+
+
+# =========================
+# Closed chunks cached, open chunk live
+# =========================
+class FakeBuckets:
+    """Stands in for _query_buckets: one visit per bucket, records every range asked for"""
+
+    def __init__(self):
+        self.queries = []
+
+    async def __call__(self, owner_id, bucket, start, end):
+        self.queries.append((start, end))
+        rows, moment = [], start
+        while moment < end:
+            rows.append({"bucket_start": moment, "total_visits": 1})
+            moment += BUCKET_SIZES[bucket]
+        return rows
+
+
+@pytest.fixture
+def buckets(monkeypatch):
+    fake = FakeBuckets()
+    monkeypatch.setattr(analytics, "_query_buckets", fake)
+    monkeypatch.setattr(analytics, "cache", Cache(MemoryBackend()))
+    return fake
+
+
+def test_closed_chunks_are_cached_and_the_open_chunk_is_queried_every_time(buckets):
+    now = datetime.now(timezone.utc)
+    start, end = now - timedelta(hours=60), now
+    open_chunk = chunk_floor(bucket_floor(now, "hour"), "hour")
+
+    first = asyncio.run(analytics.visit_analytics(1, "hour", start, end))
+    queried = list(buckets.queries)
+    second = asyncio.run(analytics.visit_analytics(1, "hour", start, end))
+
+    # Every bucket of the window once, in order, with a running total
+    assert [row["bucket_start"] for row in first] == [
+        bucket_floor(start, "hour") + timedelta(hours=n) for n in range(len(first))
+    ]
+    assert first[-1]["bucket_start"] == bucket_floor(now, "hour")
+    assert [row["cumulative_visits"] for row in first] == list(range(1, len(first) + 1))
+    assert second == first
+
+    # Closed chunks are whole chunks, the live query starts at the open chunk
+    assert all(end - start == BUCKET_SIZES["hour"] * CHUNK_BUCKETS for start, end in queried[:-1])
+    assert queried[-1][0] == open_chunk
+    # The second call only asked for the open chunk again
+    assert buckets.queries[len(queried):] == [queried[-1]]
+
+
+def test_owner_history_invalidation_reloads_closed_chunks(buckets):
+    now = datetime.now(timezone.utc)
+
+    async def scenario():
+        await analytics.visit_analytics(1, "day", now - timedelta(days=60), now)
+        before = len(buckets.queries)
+        await analytics.cache.invalidate("owner-history:1")
+        await analytics.visit_analytics(1, "day", now - timedelta(days=60), now)
+        return before, len(buckets.queries)
+
+    before, after = asyncio.run(scenario())
+    assert after == 2 * before
+
+
+def test_window_entirely_in_the_past_needs_no_live_query(buckets):
+    now = datetime.now(timezone.utc)
+    end = chunk_floor(now, "hour") - timedelta(hours=CHUNK_BUCKETS)
+
+    rows = asyncio.run(analytics.visit_analytics(1, "hour", end - timedelta(hours=5), end))
+
+    assert len(rows) == 5
+    assert buckets.queries[-1] == (end, end)
+
+
+# =========================
+# Bucket query
+# =========================
+VISITS = """
+    CREATE TEMP TABLE visits (
+        id SERIAL PRIMARY KEY,
+        visitor_id INTEGER,
+        owner_id INTEGER NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        timestamp TIMESTAMPTZ NOT NULL,
+        decided_at TIMESTAMPTZ
+    )
+"""
+
+
+@requires_postgres
+def test_query_fills_empty_buckets(monkeypatch):
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    async def scenario():
+        conn = await connect(VISITS)
+        use_connection(monkeypatch, conn, analytics, attributes=("get_read_pool",))
+        await conn.executemany(
+            "INSERT INTO visits (visitor_id, owner_id, status, timestamp, decided_at) VALUES ($1, $2, $3, $4, $5)",
+            [
+                (1, 1, "granted", base + timedelta(minutes=5), base + timedelta(minutes=5, seconds=10)),
+                (None, 1, "denied", base + timedelta(minutes=50), base + timedelta(minutes=50, seconds=30)),
+                (None, 1, "pending", base + timedelta(hours=2), None),
+                (1, 2, "granted", base + timedelta(hours=1), None),
+            ]
+        )
+        try:
+            return await analytics._query_buckets(1, "hour", base, base + timedelta(hours=3))
+        finally:
+            await conn.close()
+
+    rows = asyncio.run(scenario())
+
+    assert [row["bucket_start"] for row in rows] == [base + timedelta(hours=n) for n in range(3)]
+    assert [row["total_visits"] for row in rows] == [2, 0, 1]
+    assert (rows[0]["known_visits"], rows[0]["unknown_visits"]) == (1, 1)
+    assert (rows[0]["granted_visits"], rows[0]["denied_visits"], rows[2]["pending_visits"]) == (1, 1, 1)
+    assert rows[0]["median_response_seconds"] == 20
+    assert rows[1]["median_response_seconds"] is None
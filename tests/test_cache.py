@@ -0,0 +1,146 @@
+import asyncio
+import pytest
+from app.core import cache as cache_module
+from app.core.cache import Cache, MemoryBackend
+
+# =========================
+# Single-flight loading
+# =========================
+class CountingLoader:
+    """Stands in for a database read; waits for release() before answering"""
+
+    def __init__(self):
+        self.calls = 0
+        self.released = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.released.wait()
+        return {"call": self.calls}
+
+    def release(self):
+        self.released.set()
+
+
+def test_concurrent_misses_share_one_load():
+    async def scenario():
+        cache = Cache(MemoryBackend())
+        loader = CountingLoader()
+        readers = [asyncio.create_task(cache.get_or_load("t", "k", ["g"], 30, loader)) for _ in range(10)]
+        await asyncio.sleep(0)
+        loader.release()
+        values = await asyncio.gather(*readers)
+
+        # Served from the cache afterwards, still without a second load
+        assert await cache.get_or_load("t", "k", ["g"], 30, loader) == {"call": 1}
+        return loader.calls, values
+
+    calls, values = asyncio.run(scenario())
+
+    assert calls == 1
+    assert values == [{"call": 1}] * 10
+
+
+def test_load_error_reaches_every_waiter_and_is_not_cached():
+    async def scenario():
+        cache = Cache(MemoryBackend())
+        gate = asyncio.Event()
+
+        async def failing():
+            await gate.wait()
+            raise ValueError("db down")
+
+        readers = [asyncio.create_task(cache.get_or_load("t", "k", ["g"], 30, failing)) for _ in range(3)]
+        await asyncio.sleep(0)
+        gate.set()
+        results = await asyncio.gather(*readers, return_exceptions=True)
+
+        async def working():
+            return "ok"
+
+        return results, await cache.get_or_load("t", "k", ["g"], 30, working)
+
+    results, retried = asyncio.run(scenario())
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert retried == "ok"
+
+
+def test_waiter_loads_itself_when_the_shared_load_is_cancelled():
+    async def scenario():
+        cache = Cache(MemoryBackend())
+        loader = CountingLoader()
+        leader = asyncio.create_task(cache.get_or_load("t", "k", ["g"], 30, loader))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_load("t", "k", ["g"], 30, loader))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        await asyncio.sleep(0)
+        loader.release()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        value = await asyncio.wait_for(waiter, 1)
+        return loader.calls, value
+
+    calls, value = asyncio.run(scenario())
+
+    assert calls == 2
+    assert value == {"call": 2}
+
+
+# =========================
+# Group-version invalidation
+# =========================
+def test_invalidating_a_group_reloads_only_its_entries():
+    async def scenario():
+        cache = Cache(MemoryBackend())
+        loads = []
+
+        def loader(name):
+            async def load():
+                loads.append(name)
+                return f"{name}-{loads.count(name)}"
+            return load
+
+        assert await cache.get_or_load("t", "a", ["visit:1", "owner:7"], 30, loader("a")) == "a-1"
+        assert await cache.get_or_load("t", "b", ["visit:2", "owner:7"], 30, loader("b")) == "b-1"
+        assert await cache.get_or_load("t", "c", ["owner:8"], 30, loader("c")) == "c-1"
+
+        await cache.invalidate("owner:7")
+
+        return [
+            await cache.get_or_load("t", "a", ["visit:1", "owner:7"], 30, loader("a")),
+            await cache.get_or_load("t", "b", ["visit:2", "owner:7"], 30, loader("b")),
+            await cache.get_or_load("t", "c", ["owner:8"], 30, loader("c")),
+        ]
+
+    assert asyncio.run(scenario()) == ["a-2", "b-2", "c-1"]
+
+
+def test_idle_versions_are_forgotten():
+    async def scenario():
+        backend = MemoryBackend(version_ttl=0.05)
+        await backend.bump(["visit:1"])
+        await backend.bump(["visit:1"])
+        assert await backend.versions_of(["visit:1", "visit:2"]) == [2, 0]
+
+        await asyncio.sleep(0.1)
+        await backend.bump(["visit:2"])
+        # visit:1 went unbumped for longer than the TTL: dropped, back to 0
+        assert list(backend.versions) == ["visit:2"]
+        assert await backend.versions_of(["visit:1", "visit:2"]) == [0, 1]
+
+    asyncio.run(scenario())
+
+
+def test_memory_backend_evicts_least_recently_used():
+    async def scenario():
+        backend = MemoryBackend(max_entries=2)
+        await backend.set("a", 1, 30)
+        await backend.set("b", 2, 30)
+        await backend.get("a")
+        await backend.set("c", 3, 30)
+        return [await backend.get(key) for key in ("a", "b", "c")]
+
+    assert asyncio.run(scenario()) == [1, cache_module.MISSING, 3]
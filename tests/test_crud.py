@@ -0,0 +1,120 @@
+import asyncio
+from datetime import datetime, timezone
+import pytest
+from app.db import crud
+
+# =========================
+# Round-trip counting
+# =========================
+# The write paths below are single statements (upserts / RETURNING), so each
+# call must reach the database exactly once.
+NOW = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+class CountingConnection:
+    def __init__(self, row):
+        self.row = row
+        self.calls = []
+
+    async def fetch(self, query, *args):
+        self.calls.append("fetch")
+        return [self.row] if self.row else []
+
+    async def fetchrow(self, query, *args):
+        self.calls.append("fetchrow")
+        return self.row
+
+    async def fetchval(self, query, *args):
+        self.calls.append("fetchval")
+        return next(iter(self.row.values())) if self.row else None
+
+    async def execute(self, query, *args):
+        self.calls.append("execute")
+        return "UPDATE 1" if self.row else "UPDATE 0"
+
+
+class _Acquire:
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def __aenter__(self):
+        return self.conn
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class CountingPool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def acquire(self):
+        return _Acquire(self.conn)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """Route crud's primary pool to a counting connection; set db.row before the call"""
+    conn = CountingConnection(None)
+
+    async def get_pool():
+        return CountingPool(conn)
+
+    monkeypatch.setattr(crud, "get_pool", get_pool)
+    return conn
+
+
+def test_register_device_token_is_one_round_trip(db):
+    db.row = {
+        "id": 1, "owner_id": 7, "expo_push_token": "ExponentPushToken[abc]", "platform": "ios",
+        "device_name": "Phone", "app_version": "1.0", "is_active": True,
+        "created_at": NOW, "updated_at": NOW
+    }
+    device = asyncio.run(crud.register_device_token(7, "ExponentPushToken[abc]", "ios", "Phone", "1.0"))
+
+    assert device["expo_push_token"] == "ExponentPushToken[abc]"
+    assert db.calls == ["fetchrow"]
+
+
+def test_create_owner_is_one_round_trip(db):
+    db.row = {"id": 3, "name": "Sam", "email": "sam@example.com", "created_at": NOW}
+    owner = asyncio.run(crud.create_owner("Sam", "sam@example.com", "secret"))
+
+    assert owner["id"] == 3
+    assert db.calls == ["fetchrow"]
+
+
+def test_create_owner_existing_email_is_one_round_trip(db):
+    owner = asyncio.run(crud.create_owner("Sam", "sam@example.com", "secret"))
+
+    assert owner is None
+    assert db.calls == ["fetchrow"]
+
+
+def test_update_visitor_is_one_round_trip(db):
+    db.row = {"id": 5, "name": "Alex", "profile_image_url": None, "created_at": NOW}
+    visitor = asyncio.run(crud.update_visitor(5, name="Alex"))
+
+    assert visitor["name"] == "Alex"
+    assert db.calls == ["fetchrow"]
+
+
+def test_update_missing_visitor_is_one_round_trip(db):
+    visitor = asyncio.run(crud.update_visitor(404, name="Nobody"))
+
+    assert visitor is None
+    assert db.calls == ["fetchrow"]
+
+
+def test_update_missing_visitor_does_not_pin_reads(db, monkeypatch):
+    pins = []
+    monkeypatch.setattr(crud, "mark_write", lambda owner_id=None: pins.append(owner_id))
+    asyncio.run(crud.update_visitor(404, name="Nobody"))
+
+    assert pins == []
+
+
+def test_update_owner_password_is_one_round_trip(db):
+    db.row = {"id": 3}
+    assert asyncio.run(crud.update_owner_password(3, "new secret")) is True
+    assert db.calls == ["execute"]
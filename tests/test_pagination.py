@@ -0,0 +1,113 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+import pytest
+from app.db import crud
+from app.db.pagination import encode_cursor, decode_cursor, InvalidCursor
+from tests.postgres import requires_postgres, connect, use_connection
+
+# =========================
+# Cursor encoding
+# =========================
+def test_timestamp_cursor_round_trips_exactly():
+    moment = datetime(2025, 3, 9, 14, 30, 5, 123456, tzinfo=timezone.utc)
+    assert decode_cursor(encode_cursor(moment, 42)) == (moment, 42)
+
+
+def test_numeric_cursor_round_trips():
+    assert decode_cursor(encode_cursor(0.0759, 7)) == (0.0759, 7)
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor(datetime(2025, 1, 1, tzinfo=timezone.utc), 2 ** 40)
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", "WzFd", "eyJ0cyI6MX0", "WyJ4Il0"])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+# =========================
+# Keyset order and tiebreak
+# =========================
+VISITORS = """
+    CREATE TEMP TABLE visitors (
+        id SERIAL PRIMARY KEY,
+        name TEXT,
+        profile_image_url TEXT
+    )
+"""
+
+VISITS = """
+    CREATE TEMP TABLE visits (
+        id SERIAL PRIMARY KEY,
+        visitor_id INTEGER,
+        owner_id INTEGER NOT NULL,
+        image_url TEXT,
+        status TEXT NOT NULL DEFAULT 'pending',
+        detected_label TEXT,
+        timestamp TIMESTAMPTZ NOT NULL
+    )
+"""
+
+
+@requires_postgres
+def test_pages_split_rows_with_equal_timestamps_without_gaps(monkeypatch):
+    async def scenario():
+        conn = await connect(VISITORS, VISITS)
+        use_connection(monkeypatch, conn, crud, attributes=("get_read_pool",))
+        base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        # Runs of identical timestamps straddle every page boundary
+        moments = [base + timedelta(seconds=i // 3) for i in range(10)]
+        await conn.executemany(
+            "INSERT INTO visits (owner_id, image_url, timestamp) VALUES (1, 'x', $1)",
+            [(moment,) for moment in moments]
+        )
+        await conn.execute("INSERT INTO visits (owner_id, image_url, timestamp) VALUES (2, 'x', $1)", base)
+
+        try:
+            seen, cursor = [], None
+            while True:
+                page, cursor = await crud.get_visits_by_owner(1, limit=2, cursor=cursor)
+                seen.extend((row["timestamp"], row["id"]) for row in page)
+                if cursor is None:
+                    break
+        finally:
+            await conn.close()
+
+        assert len(seen) == 10
+        assert seen == sorted(seen, reverse=True)
+
+    asyncio.run(scenario())
+
+
+@requires_postgres
+def test_json_pages_match_row_pages(monkeypatch):
+    async def scenario():
+        conn = await connect(VISITORS, VISITS)
+        use_connection(monkeypatch, conn, crud, attributes=("get_read_pool",))
+        base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        await conn.executemany(
+            "INSERT INTO visits (owner_id, image_url, timestamp) VALUES (1, 'x', $1)",
+            [(base + timedelta(seconds=i // 2),) for i in range(7)]
+        )
+
+        try:
+            row_ids, json_ids = [], []
+            row_cursor = json_cursor = None
+            while True:
+                page, row_cursor = await crud.get_visits_by_owner(1, limit=3, cursor=row_cursor)
+                items, count, json_cursor = await crud.get_visits_by_owner_json(1, limit=3, cursor=json_cursor)
+                row_ids.extend(row["id"] for row in page)
+                json_ids.extend(item["id"] for item in json.loads(items))
+                assert count == len(page) and json_cursor == row_cursor
+                if row_cursor is None:
+                    break
+        finally:
+            await conn.close()
+
+        assert json_ids == row_ids and len(row_ids) == 7
+
+    asyncio.run(scenario())
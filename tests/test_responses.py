@@ -0,0 +1,71 @@
+import asyncio
+from datetime import datetime, timezone
+from decimal import Decimal
+import orjson
+import pytest
+from app.core.responses import dumps, splice_json, etag_matches
+from tests.postgres import requires_postgres, connect
+
+# =========================
+# splice_json
+# =========================
+def test_splice_embeds_raw_json_unchanged():
+    raw = '[{"id":1,"note":"caf\\u00e9"},{"id":2,"score":1.10}]'
+    body = splice_json({"status": "success", "count": 2}, "visits", raw)
+
+    assert body == b'{"status":"success","count":2,"visits":' + raw.encode() + b"}"
+    assert orjson.loads(body)["visits"][1]["score"] == 1.1
+
+
+def test_splice_accepts_bytes_and_replaces_the_key():
+    body = splice_json({"visits": "placeholder", "next_cursor": None}, "visits", b"[]")
+    assert orjson.loads(body) == {"visits": [], "next_cursor": None}
+
+
+def test_dumps_handles_decimals_and_int_keys():
+    assert orjson.loads(dumps({1: Decimal("2.5")})) == {"1": 2.5}
+
+
+# =========================
+# etag_matches
+# =========================
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ("", False),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"other", "abc"', True),
+    ('"other"', False),
+    ("*", True),
+    ("abc", False),
+])
+def test_etag_matches(header, expected):
+    assert etag_matches(header, '"abc"') is expected
+
+
+# =========================
+# Timestamp formats
+# =========================
+@requires_postgres
+def test_json_agg_timestamps_differ_from_orjson():
+    """Pages built by json_agg carry Postgres' timestamp format, not orjson's
+
+    Postgres trims trailing zeros from the fraction, orjson always writes
+    six digits. Both are ISO 8601 for the same instant; clients must parse
+    them rather than compare strings.
+    """
+    moment = datetime(2025, 1, 1, 12, 0, 0, 500000, tzinfo=timezone.utc)
+
+    async def scenario():
+        conn = await connect()
+        try:
+            return await conn.fetchval("SELECT json_agg(t)::text FROM (SELECT $1::timestamptz as timestamp) t", moment)
+        finally:
+            await conn.close()
+
+    from_postgres = orjson.loads(asyncio.run(scenario()))[0]["timestamp"]
+    from_orjson = orjson.loads(dumps({"timestamp": moment}))["timestamp"]
+
+    assert from_postgres == "2025-01-01T12:00:00.5+00:00"
+    assert from_orjson == "2025-01-01T12:00:00.500000+00:00"
+    assert datetime.fromisoformat(from_postgres) == datetime.fromisoformat(from_orjson) == moment
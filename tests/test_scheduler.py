@@ -0,0 +1,108 @@
+import asyncio
+from app.core import scheduler
+from app.core.scheduler import CLAIM_RUN, RENEW_LEASE, RELEASE_RUN, FINISH_RUN, Job, Scheduler
+from tests.postgres import requires_postgres, connect, use_connection
+
+# =========================
+# Lease claims
+# =========================
+# Runs the scheduler's SQL against a real Postgres, on a temporary
+# scheduler_runs table that shadows the real one.
+pytestmark = requires_postgres
+
+SCHEDULER_RUNS = """
+    CREATE TEMP TABLE scheduler_runs (
+        job TEXT PRIMARY KEY,
+        last_started_at TIMESTAMPTZ,
+        last_finished_at TIMESTAMPTZ,
+        last_duration_ms DOUBLE PRECISION,
+        last_error TEXT,
+        lease_until TIMESTAMPTZ
+    )
+"""
+
+
+async def _connect():
+    return await connect(SCHEDULER_RUNS)
+
+
+def test_claim_blocks_other_workers_until_the_lease_expires():
+    async def scenario():
+        conn = await _connect()
+        try:
+            claimed_at = await conn.fetchval(CLAIM_RUN, "job", 0.0, 0.2)
+            assert claimed_at is not None
+            # Another worker, while the lease is held
+            assert await conn.fetchval(CLAIM_RUN, "job", 0.0, 0.2) is None
+
+            # The first worker died without finishing: its lease lapses
+            await asyncio.sleep(0.3)
+            reclaimed_at = await conn.fetchval(CLAIM_RUN, "job", 0.0, 60.0)
+            assert reclaimed_at is not None and reclaimed_at != claimed_at
+
+            # The stale worker can no longer renew or finish the run
+            assert await conn.fetchval(RENEW_LEASE, "job", claimed_at, 60.0) is None
+            await conn.execute(FINISH_RUN, "job", claimed_at, 1.0, None)
+            row = await conn.fetchrow("SELECT * FROM scheduler_runs WHERE job = 'job'")
+            assert row["lease_until"] is not None and row["last_finished_at"] is None
+        finally:
+            await conn.close()
+
+    asyncio.run(scenario())
+
+
+def test_finished_run_is_not_claimed_again_within_the_interval():
+    async def scenario():
+        conn = await _connect()
+        try:
+            claimed_at = await conn.fetchval(CLAIM_RUN, "job", 3600.0, 60.0)
+            assert await conn.fetchval(RENEW_LEASE, "job", claimed_at, 60.0) == "job"
+            await conn.execute(FINISH_RUN, "job", claimed_at, 0.5, None)
+
+            row = await conn.fetchrow("SELECT * FROM scheduler_runs WHERE job = 'job'")
+            assert row["lease_until"] is None and row["last_duration_ms"] == 500
+            assert await conn.fetchval(CLAIM_RUN, "job", 3600.0, 60.0) is None
+            assert await conn.fetchval(CLAIM_RUN, "job", 0.0, 60.0) is not None
+        finally:
+            await conn.close()
+
+    asyncio.run(scenario())
+
+
+def test_released_run_can_be_claimed_right_away():
+    async def scenario():
+        conn = await _connect()
+        try:
+            claimed_at = await conn.fetchval(CLAIM_RUN, "job", 0.0, 60.0)
+            await conn.execute(RELEASE_RUN, "job", claimed_at)
+            assert await conn.fetchval(CLAIM_RUN, "job", 0.0, 60.0) is not None
+        finally:
+            await conn.close()
+
+    asyncio.run(scenario())
+
+
+def test_heartbeat_keeps_a_long_run_claimed(monkeypatch):
+    async def scenario():
+        conn = await _connect()
+
+        use_connection(monkeypatch, conn, scheduler)
+        runner = Scheduler(jitter=0, lease=0.3)
+        other = Scheduler(jitter=0, lease=0.3)
+        results = []
+
+        async def long_job():
+            # Outlives the lease several times over; the heartbeat keeps it
+            for _ in range(4):
+                await asyncio.sleep(0.25)
+                results.append(await other.run_once(Job("job", 0, long_job)))
+
+        try:
+            assert await runner.run_once(Job("job", 0, long_job)) == "ok"
+            assert results == ["skipped"] * 4
+            row = await conn.fetchrow("SELECT * FROM scheduler_runs WHERE job = 'job'")
+            assert row["lease_until"] is None and row["last_error"] is None
+        finally:
+            await conn.close()
+
+    asyncio.run(scenario())
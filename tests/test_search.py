@@ -0,0 +1,50 @@
+import asyncio
+from datetime import datetime, timezone
+import pytest
+from fastapi import HTTPException
+from app.api import routes_search
+from app.db import search
+from app.db.pagination import encode_cursor, InvalidCursor
+
+# =========================
+# Search cursors
+# =========================
+PARAMS = [7, "ann", "ann%"]
+
+
+def test_rank_cursor_becomes_a_keyset_condition():
+    page, params = search._page(PARAMS, 10, encode_cursor(1.25, 42))
+
+    assert params == PARAMS + [1.25, 42, 11]
+    assert page == "WHERE (rank, id) < ($4::float8, $5) ORDER BY rank DESC, id DESC LIMIT $6"
+
+
+def test_first_page_has_no_condition():
+    page, params = search._page(PARAMS, 10, None)
+
+    assert params == PARAMS + [11]
+    assert page.strip() == "ORDER BY rank DESC, id DESC LIMIT $4"
+
+
+@pytest.mark.parametrize("cursor", [
+    encode_cursor(datetime(2025, 1, 1, tzinfo=timezone.utc), 42),  # a visit listing cursor
+    encode_cursor("ann", 42),
+    encode_cursor(None, 42),
+    "not a cursor",
+])
+def test_cursor_without_a_rank_is_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        search._page(PARAMS, 10, cursor)
+
+
+def test_search_route_answers_400_for_a_listing_cursor(monkeypatch):
+    async def no_pool(*args):
+        raise AssertionError("a bad cursor must be rejected before any query")
+
+    monkeypatch.setattr(search, "get_read_pool", no_pool)
+    cursor = encode_cursor(datetime(2025, 1, 1, tzinfo=timezone.utc), 42)
+
+    for route in (routes_search.search_owner_visits, routes_search.search_owner_visitors):
+        with pytest.raises(HTTPException) as raised:
+            asyncio.run(route(7, "ann", mode="fuzzy", limit=10, cursor=cursor, current_user_id=7))
+        assert raised.value.status_code == 400
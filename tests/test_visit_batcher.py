@@ -0,0 +1,110 @@
+import asyncio
+import pytest
+from app.db import visit_batcher
+from app.db.visit_batcher import VisitBatcher, BatcherStopped
+from tests.postgres import requires_postgres, connect, use_connection
+
+# =========================
+# Shutdown flush
+# =========================
+class RecordingConnection:
+    """Answers INSERT_BATCH like Postgres would, numbering rows as they arrive"""
+
+    def __init__(self):
+        self.next_id = 1
+        self.batches = []
+
+    async def fetch(self, query, *columns):
+        rows = []
+        for ord, record in enumerate(zip(*columns), start=1):
+            visitor_id, owner_id, image_url, status, detected_label = record
+            rows.append({"ord": ord, "id": self.next_id, "owner_id": owner_id, "image_url": image_url})
+            self.next_id += 1
+        self.batches.append(len(rows))
+        # RETURNING order is not guaranteed, the batcher must match on ord
+        return list(reversed(rows))
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    conn = RecordingConnection()
+    use_connection(monkeypatch, conn, visit_batcher)
+    return conn
+
+
+def _record(n):
+    return (None, 1, f"image-{n}", "pending", None)
+
+
+@pytest.mark.parametrize("yields", [1, 2, 3, 4])
+def test_stop_flushes_rows_from_producers_blocked_on_a_full_queue(conn, yields):
+    async def scenario():
+        batcher = VisitBatcher(max_rows=4, max_delay_ms=50, queue_size=2)
+        batcher.start()
+        producers = [asyncio.create_task(batcher.submit(_record(n))) for n in range(20)]
+        # stop() lands at a different point of the producers' hand-off each time
+        for _ in range(yields):
+            await asyncio.sleep(0)
+        # A lost row leaves its producer waiting forever
+        await asyncio.wait_for(batcher.stop(), 1)
+        return await asyncio.wait_for(asyncio.gather(*producers), 1)
+
+    visits = asyncio.run(scenario())
+
+    assert [visit["image_url"] for visit in visits] == [f"image-{n}" for n in range(20)]
+    assert sum(conn.batches) == 20
+    assert max(conn.batches) <= 4
+
+
+def test_submit_after_stop_is_refused(conn):
+    async def scenario():
+        batcher = VisitBatcher()
+        batcher.start()
+        await batcher.stop()
+        with pytest.raises(BatcherStopped):
+            await batcher.submit(_record(0))
+
+    asyncio.run(scenario())
+
+
+def test_module_submit_without_a_batcher_is_refused(monkeypatch):
+    monkeypatch.setattr(visit_batcher, "batcher", None)
+    with pytest.raises(BatcherStopped):
+        asyncio.run(visit_batcher.submit(_record(0)))
+
+
+# =========================
+# INSERT_BATCH
+# =========================
+VISITS = """
+    CREATE TEMP TABLE visits (
+        id SERIAL PRIMARY KEY,
+        visitor_id INTEGER,
+        owner_id INTEGER NOT NULL,
+        image_url TEXT,
+        status TEXT NOT NULL DEFAULT 'pending',
+        detected_label TEXT,
+        timestamp TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+@requires_postgres
+def test_each_caller_gets_its_own_row(monkeypatch):
+    async def scenario():
+        db = await connect(VISITS)
+        use_connection(monkeypatch, db, visit_batcher)
+        try:
+            batcher = VisitBatcher(max_rows=50, max_delay_ms=20)
+            batcher.start()
+            visits = await asyncio.gather(*(batcher.submit((None, n, f"image-{n}", "pending", None)) for n in range(30)))
+            await batcher.stop()
+            return visits, await db.fetchval("SELECT COUNT(*) FROM visits")
+        finally:
+            await db.close()
+
+    visits, stored = asyncio.run(scenario())
+
+    assert stored == 30
+    assert [(visit["owner_id"], visit["image_url"]) for visit in visits] == [(n, f"image-{n}") for n in range(30)]
+    assert len({visit["id"] for visit in visits}) == 30